@@ -1,6 +1,7 @@
 # Importamos las clases necesarias de LangGraph
 from langgraph.graph import StateGraph, END
 from typing_extensions import TypedDict
+from instrumentacion import instrumentar  # Métricas por nodo si METRICAS_GRAFO está definida
 
 # Definimos el "estado" que compartirá el grafo usando TypedDict
 # TypedDict permite a LangGraph conocer exactamente qué campos pueden existir
@@ -37,7 +38,7 @@ def nodo_b(state: Estado):
 
 # --- Construcción del grafo ---
 # Creamos un grafo de estado usando la clase Estado definida anteriormente
-workflow = StateGraph(Estado)
+workflow = instrumentar(StateGraph(Estado))
 
 # Agregamos los nodos al grafo
 # Cada nodo se identifica con un nombre único ("A", "B")
@@ -53,8 +54,9 @@ workflow.add_edge("B", END)      # Después del nodo "B", terminar el grafo
 # Compilamos el workflow para crear un grafo ejecutable
 grafo = workflow.compile()
 
-print("=== Ejecutando el grafo ===")
-# Ejecutamos el grafo con un estado inicial vacío
-# El estado se va pasando y modificando entre nodos
-final_state = grafo.invoke(Estado())
-print("📌 Estado final:", final_state)
+if __name__ == "__main__":
+    print("=== Ejecutando el grafo ===")
+    # Ejecutamos el grafo con un estado inicial vacío
+    # El estado se va pasando y modificando entre nodos
+    final_state = grafo.invoke(Estado())
+    print("📌 Estado final:", final_state)
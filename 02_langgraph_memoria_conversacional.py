@@ -1,63 +1,111 @@
+import argparse
+import sqlite3
+from typing import TypedDict
+
+from langgraph.errors import GraphRecursionError
 from langgraph.graph import StateGraph, END
+# Checkpointer en SQLite (paquete langgraph-checkpoint-sqlite)
+from langgraph.checkpoint.sqlite import SqliteSaver
+# El historial completo va a una tabla de solo inserción, compartida con los ejemplos 05 y 06
+from memoria_sqlite import inicializar_db, ColaEscritura, SESION_POR_DEFECTO, guardar_mensaje, obtener_ventana
+# La cola de escritura no va en el estado: los nodos la reciben en config
+from recursos import Recursos, recursos_de
+from instrumentacion import instrumentar
+
+# Definimos el "estado" compartido con TypedDict: cada clave es un canal y el
+# checkpointer solo guarda lo que cambia. El historial NO está en el estado:
+# cada paso añade sus mensajes (el delta) a la tabla `historial`, así el
+# checkpoint de cada paso tiene tamaño constante aunque la conversación crezca.
+class Estado(TypedDict, total=False):
+    ultimo_input: str  # Último mensaje del usuario (controla la salida del bucle)
+    mensajes: int      # Mensajes guardados en el historial de este hilo
 
-# Definimos el "estado" compartido como un diccionario
-# Aquí podrías usar TypedDict para mayor robustez, pero para este ejemplo usamos dict
-class Estado(dict):
-    pass  # El estado guardará el historial de la conversación y el último input
+# Pasos máximos de una ejecución: cada turno son dos (input y llm), así que
+# unos 50.000 turnos. Al llegar se sale y el hilo se retoma con --hilo
+LIMITE_PASOS = 100_000
 
 # --- Nodos ---
-# Nodo encargado de recibir el input del usuario y actualizar el historial
-def nodo_input(state: Estado):
+# Nodo encargado de recibir el input del usuario y añadirlo al historial
+def nodo_input(state: Estado, config):
     user_input = input("👤 Usuario: ")  # Solicita entrada al usuario
-    # Si no existe el historial, lo crea como lista vacía
-    state.setdefault("historial", [])
-    # Añade el mensaje del usuario al historial
-    state["historial"].append({"role": "user", "content": user_input})
+    if es_salida(user_input):
+        return {"ultimo_input": user_input}  # 'exit' no se guarda en el historial
+    # Añade el mensaje del usuario al historial (tabla de SQLite, por hilo)
+    guardar_mensaje(recursos_de(config).cola, "user", user_input, config["configurable"]["thread_id"])
     # Guarda el último input para poder controlar la salida del bucle
-    state["ultimo_input"] = user_input
-    return state  # Devuelve el estado actualizado
+    return {"ultimo_input": user_input, "mensajes": state.get("mensajes", 0) + 1}
 
 # Nodo que simula la respuesta de un modelo LLM usando el historial
-def nodo_llm(state: Estado):
-    # Obtiene el historial de la conversación
-    historial = state.get("historial", [])
-    # Toma la última pregunta del usuario (si existe)
-    ult_pregunta = historial[-1]["content"] if historial else ""
+def nodo_llm(state: Estado, config):
+    # Toma la última pregunta del usuario y el tamaño del historial, sin leerlo
+    ult_pregunta = state.get("ultimo_input", "")
+    mensajes = state.get("mensajes", 0)
     # Genera una respuesta simulada usando la última pregunta y el tamaño del historial
-    respuesta = f"🤖 LLM responde a: '{ult_pregunta}' teniendo en cuenta el historial ({len(historial)} turnos)."
+    respuesta = f"🤖 LLM responde a: '{ult_pregunta}' teniendo en cuenta el historial ({mensajes} turnos)."
     # Añade la respuesta del asistente al historial
-    historial.append({"role": "assistant", "content": respuesta})
-    state["historial"] = historial  # Actualiza el historial en el estado
+    guardar_mensaje(recursos_de(config).cola, "assistant", respuesta, config["configurable"]["thread_id"])
     print(respuesta)  # Muestra la respuesta por pantalla
-    return state  # Devuelve el estado actualizado
+    return {"mensajes": mensajes + 1}  # Solo se devuelve lo que cambia
+
+def es_salida(texto):
+    return texto.strip().lower() == "exit"
 
 # --- Grafo ---
-workflow = StateGraph(Estado)
+def construir_grafo(checkpointer=None):
+    """
+    El bucle de la conversación vive dentro del grafo: input -> llm -> input,
+    con una arista condicional que termina cuando el usuario escribe 'exit'.
+    """
+    workflow = instrumentar(StateGraph(Estado))
 
-workflow.add_node("input", nodo_input)
-workflow.add_node("llm", nodo_llm)
+    workflow.add_node("input", nodo_input)
+    workflow.add_node("llm", nodo_llm)
 
-workflow.set_entry_point("input")
-workflow.add_edge("input", "llm")
-workflow.add_edge("llm", "input")  # bucle para conversación
-workflow.add_edge("input", END)    # permite salir si se corta
+    workflow.set_entry_point("input")
+    workflow.add_conditional_edges(
+        "input",
+        lambda state: END if es_salida(state.get("ultimo_input", "")) else "llm",
+        {"llm": "llm", END: END},
+    )
+    workflow.add_edge("llm", "input")  # bucle para conversación
 
-# Compilamos el grafo (aunque en este ejemplo ejecutamos los nodos manualmente)
-grafo = workflow.compile()
+    # Con checkpointer, cada paso se guarda y el hilo puede retomarse más tarde
+    return workflow.compile(checkpointer=checkpointer)
+
+def abrir_checkpointer(ruta):
+    """SqliteSaver sobre su propia conexión (LangGraph puede usarla desde otros hilos)."""
+    return SqliteSaver(sqlite3.connect(ruta, check_same_thread=False))
 
 # --- Ejecución principal del chat ---
-print("=== Chat con memoria (LangGraph) ===")
-# Inicializamos el estado con un historial vacío
-estado = Estado(historial=[])
-print("(Escribe 'exit' para salir)")
-while True:
-    # 1. Pedimos input al usuario y lo guardamos en el historial
-    estado = nodo_input(estado)
-    # 2. Si el usuario escribe 'exit', terminamos la conversación
-    if estado.get("ultimo_input", "").strip().lower() == "exit":
-        print("👋 Conversación finalizada.")
-        break
-    # 3. El "modelo" responde usando el historial actualizado
-    estado = nodo_llm(estado)
-
-print("📌 Historial final:", estado["historial"])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat con memoria (LangGraph)")
+    parser.add_argument("--hilo", default=SESION_POR_DEFECTO, help="Hilo de la conversación (se retoma si ya existe)")
+    args = parser.parse_args()
+
+    print("=== Chat con memoria (LangGraph) ===")
+    conn = inicializar_db("02_memoria.db")  # Historial (de solo inserción) y checkpoints en el mismo fichero
+    recursos = Recursos(cola=ColaEscritura("02_memoria.db"))
+    grafo = construir_grafo(abrir_checkpointer("02_memoria.db"))
+    config = recursos.config(args.hilo, recursion_limit=LIMITE_PASOS)
+    # Retomar un hilo solo carga su último checkpoint (unos pocos bytes), no el historial
+    previo = grafo.get_state(config).values
+    if previo.get("mensajes"):
+        print(f"↩️ Retomando el hilo '{args.hilo}' ({previo['mensajes']} mensajes)")
+    print("(Escribe 'exit' para salir)")
+    try:
+        try:
+            grafo.invoke({}, config)  # El bucle input -> llm se ejecuta dentro del grafo
+            print("👋 Conversación finalizada.")
+        except GraphRecursionError:
+            # Cada paso ya está en el checkpoint: la conversación sigue donde se quedó
+            print(f"\n⏸️ Límite de {LIMITE_PASOS} pasos por ejecución alcanzado. "
+                  f"Continúa con: python 02_langgraph_memoria_conversacional.py --hilo {args.hilo}")
+        except (KeyboardInterrupt, EOFError):
+            print("\n👋 Conversación interrumpida.")
+        recursos.cola.flush()
+        # Solo los últimos mensajes: leer el historial completo costaría O(historial)
+        print("📌 Historial final:", [(rol, contenido) for _, rol, contenido in obtener_ventana(conn, args.hilo)])
+    finally:
+        # Aunque el turno falle o se interrumpa, lo que queda en la cola se escribe al cerrarla
+        recursos.cerrar()
+        conn.close()
@@ -3,11 +3,20 @@
 # según el input del usuario. Es ideal para tutoriales y aprendizaje.
 
 from langgraph.graph import StateGraph, END  # Importamos las clases principales de LangGraph
+from enrutador import ENRUTADOR, EstadoRutas  # Tabla de rutas compilada, compartida con los ejemplos 04–06
+from instrumentacion import instrumentar  # Métricas por nodo si METRICAS_GRAFO está definida
 
 # Definimos el estado compartido como un diccionario (puede ser TypedDict en proyectos grandes)
 class Estado(dict):
     pass  # Aquí se almacenarán los datos que pasan entre nodos
 
+# Mensaje de la decisión para cada ruta del enrutador
+RESPUESTAS = {
+    "finanzas": "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'.",
+    "clima": "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'.",
+    "general": "🤖 El agente no entiende bien la intención. Te responde de forma genérica.",
+}
+
 # --- Definición de nodos ---
 # Nodo de decisión: analiza el input y decide la ruta
 
@@ -17,36 +26,38 @@ def nodo_llm(state: Estado):
     El input debe estar en state['ultimo_input'].
     """
     pregunta = state.get("ultimo_input", "")  # Recupera el input del usuario
-    # Analiza el input y decide la ruta
-    if "precio" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'."
-        state["ruta"] = "finanzas"  # Marca la ruta a seguir
-    elif "clima" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'."
-        state["ruta"] = "clima"
-    else:
-        respuesta = "🤖 El agente no entiende bien la intención. Te responde de forma genérica."
-        state["ruta"] = "general"
-    print(respuesta)  # Muestra la decisión tomada
+    # Analiza el input y decide las rutas: puede haber varias ("precio del paraguas si hace mal clima")
+    state["rutas"] = ENRUTADOR.clasificar_todas(pregunta)
+    state["ruta"] = state["rutas"][0]  # Ruta principal
+    state["respuestas"] = None  # Vacía las respuestas del turno anterior
+    for ruta in state["rutas"]:
+        print(RESPUESTAS[ruta])  # Muestra la decisión tomada
     return state  # Devuelve el estado actualizado
 
-# Nodo de finanzas: responde si la ruta es 'finanzas'
+# Las ramas pueden ejecutarse a la vez: cada una devuelve solo su respuesta,
+# y el reducer del canal 'respuestas' las junta en el estado
+
+# Nodo de finanzas: responde si una de las rutas es 'finanzas'
 def nodo_finanzas(state: Estado):
-    print("📈 Respuesta del módulo de finanzas: el precio de BTC está en 42k (ejemplo).")
-    return state
+    respuesta = "📈 Respuesta del módulo de finanzas: el precio de BTC está en 42k (ejemplo)."
+    print(respuesta)
+    return {"respuestas": {"finanzas": respuesta}}
 
-# Nodo de clima: responde si la ruta es 'clima'
+# Nodo de clima: responde si una de las rutas es 'clima'
 def nodo_clima(state: Estado):
-    print("🌦️ Respuesta del módulo de clima: hoy está soleado con 25°C (ejemplo).")
-    return state
+    respuesta = "🌦️ Respuesta del módulo de clima: hoy está soleado con 25°C (ejemplo)."
+    print(respuesta)
+    return {"respuestas": {"clima": respuesta}}
 
 # Nodo general: responde si la ruta es 'general'
 def nodo_general(state: Estado):
-    print("💬 Respuesta general: gracias por tu pregunta.")
-    return state
+    respuesta = "💬 Respuesta general: gracias por tu pregunta."
+    print(respuesta)
+    return {"respuestas": {"general": respuesta}}
 
 # --- Construcción del grafo ---
-workflow = StateGraph(Estado)  # Creamos el grafo de estado
+# EstadoRutas declara los canales del estado; 'respuestas' tiene un reducer para las ramas en paralelo
+workflow = instrumentar(StateGraph(EstadoRutas))
 
 # Añadimos los nodos al grafo
 workflow.add_node("llm", nodo_llm)         # Nodo de decisión
@@ -57,15 +68,11 @@ workflow.add_node("general", nodo_general)    # Nodo general
 # Definimos el punto de entrada del grafo (primer nodo a ejecutar)
 workflow.set_entry_point("llm")
 
-# Añadimos las ramas condicionales: según el valor de state['ruta'], el grafo sigue una ruta
+# Añadimos las ramas condicionales: el grafo sigue todas las rutas de state['rutas'], en paralelo
 workflow.add_conditional_edges(
     "llm",  # Nodo desde el que se ramifica
-    lambda state: state["ruta"],  # Función que decide la ruta según el estado
-    {
-        "finanzas": "finanzas",  # Si ruta es 'finanzas', va al nodo_finanzas
-        "clima": "clima",        # Si ruta es 'clima', va al nodo_clima
-        "general": "general",    # Si ruta es 'general', va al nodo_general
-    },
+    ENRUTADOR.condicion_varias,  # Decide las rutas según el estado (state['rutas'])
+    ENRUTADOR.destinos(),  # Cada ruta va al nodo del mismo nombre: finanzas, clima, general
 )
 
 # Todas las ramas terminan en END (fin del grafo)
@@ -77,10 +84,11 @@ workflow.add_edge("general", END)
 grafo = workflow.compile()
 
 # --- Ejecución del grafo ---
-print("=== Condicionales en LangGraph ===")
-# Pedimos input al usuario antes de ejecutar el grafo
-user_input = input("👤 Usuario: ")  # El usuario escribe su pregunta
-# Creamos el estado inicial con el input del usuario
-estado = Estado(ultimo_input=user_input)
-# Ejecutamos el grafo: él decide la ruta y ejecuta el nodo correspondiente
-grafo.invoke(estado)
+if __name__ == "__main__":
+    print("=== Condicionales en LangGraph ===")
+    # Pedimos input al usuario antes de ejecutar el grafo
+    user_input = input("👤 Usuario: ")  # El usuario escribe su pregunta
+    # Creamos el estado inicial con el input del usuario
+    estado = Estado(ultimo_input=user_input)
+    # Ejecutamos el grafo: él decide las rutas y ejecuta sus nodos
+    grafo.invoke(estado)
@@ -4,98 +4,114 @@
 # Es ideal para tutoriales y aprendizaje.
 
 from langgraph.graph import StateGraph, END  # Importamos las clases principales de LangGraph
+from enrutador import ENRUTADOR, EstadoRutas, respuestas_en_orden  # Tabla de rutas compilada, compartida con 03–06
+from historial import HistorialAcotado  # Historial acotado con desbordamiento a disco
+from instrumentacion import instrumentar  # Métricas por nodo si METRICAS_GRAFO está definida
+
+VENTANA_HISTORIAL = 50  # Mensajes que se mantienen en memoria
 
 # Definimos el estado compartido como un diccionario
 class Estado(dict):
     """Estado que guarda historial de interacciones"""
     def __init__(self):
         super().__init__()
-        self["historial"] = []
+        self["historial"] = HistorialAcotado(VENTANA_HISTORIAL)
         self["ultimo_input"] = None
         self["ruta"] = None
 
+# Canales del grafo: los de EstadoRutas (rutas y respuestas de las ramas) más el historial
+class EstadoGrafo(EstadoRutas):
+    historial: HistorialAcotado
+
+# Mensaje de la decisión para cada ruta del enrutador
+RESPUESTAS = {
+    "finanzas": "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'.",
+    "clima": "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'.",
+    "general": "🤖 El agente no entiende bien la intención. Te responde de forma genérica.",
+}
+
 # --- Nodo de decisión y memoria ---
 def nodo_llm(state):
     """
     Nodo que añade el input al historial y decide la ruta según el input.
     """
     pregunta = state.get("ultimo_input", "")  # Recupera el input del usuario
-    state.setdefault("historial", [])  # Asegura que 'historial' existe
-    state["historial"].append({"rol": "usuario", "contenido": pregunta})  # Guarda el input en el historial
-    # Analiza el input y decide la ruta
-    if "precio" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'."
-        state["ruta"] = "finanzas"
-    elif "clima" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'."
-        state["ruta"] = "clima"
-    else:
-        respuesta = "🤖 El agente no entiende bien la intención. Te responde de forma genérica."
-        state["ruta"] = "general"
-    print(respuesta)  # Muestra la decisión tomada
+    if "historial" not in state:  # Asegura que 'historial' existe
+        state["historial"] = HistorialAcotado(VENTANA_HISTORIAL)
+    state["historial"].append("usuario", pregunta)  # Guarda el input en el historial
+    # Analiza el input y decide las rutas (una o varias intenciones)
+    state["rutas"] = ENRUTADOR.clasificar_todas(pregunta)
+    state["ruta"] = state["rutas"][0]  # Ruta principal
+    state["respuestas"] = None  # Vacía las respuestas del turno anterior
+    for ruta in state["rutas"]:
+        print(RESPUESTAS[ruta])  # Muestra la decisión tomada
     return state  # Devuelve el estado actualizado
 
+# Las ramas se ejecutan en paralelo si hay varias rutas: no tocan el historial
+# (no es seguro entre hilos) y devuelven solo su respuesta; nodo_combinar la añade
+
 # --- Nodo de finanzas ---
 def nodo_finanzas(state: Estado):
-    # Responde si la ruta es 'finanzas'
+    # Responde si una de las rutas es 'finanzas'
     respuesta = "📈 Respuesta del módulo de finanzas: el precio de BTC está en 42k (ejemplo)."
     print(respuesta)
-    state.setdefault("historial", [])
-    state["historial"].append({"rol": "agente", "contenido": respuesta})  # Añade la respuesta al historial
-    return state
+    return {"respuestas": {"finanzas": respuesta}}
 
 # --- Nodo de clima ---
 def nodo_clima(state: Estado):
-    # Responde si la ruta es 'clima'
+    # Responde si una de las rutas es 'clima'
     respuesta = "🌦️ Respuesta del módulo de clima: hoy está soleado con 25°C (ejemplo)."
     print(respuesta)
-    state.setdefault("historial", [])
-    state["historial"].append({"rol": "agente", "contenido": respuesta})  # Añade la respuesta al historial
-    return state
+    return {"respuestas": {"clima": respuesta}}
 
 # --- Nodo general ---
 def nodo_general(state: Estado):
     # Responde si la ruta es 'general'
     respuesta = "💬 Respuesta general: gracias por tu pregunta."
     print(respuesta)
-    state.setdefault("historial", [])
-    state["historial"].append({"rol": "agente", "contenido": respuesta})  # Añade la respuesta al historial
+    return {"respuestas": {"general": respuesta}}
+
+# --- Nodo que junta las ramas ---
+def nodo_combinar(state: Estado):
+    # Añade las respuestas al historial en el orden de las rutas, no en el que terminaron
+    for respuesta in respuestas_en_orden(state):
+        state["historial"].append("agente", respuesta)
     return state
 
 def nodo_memoria(state: Estado):
     print("\n📜 Historial de conversación:")
     for i, h in enumerate(state["historial"], 1):
-        print(f"{i}. {h['rol']}: {h['contenido']}")
+        print(f"{i}. {h.rol}: {h.contenido}")
     return state
 
 # --- Construcción del grafo ---
-workflow = StateGraph(Estado)  # Creamos el grafo de estado
+workflow = instrumentar(StateGraph(EstadoGrafo))  # Creamos el grafo con los canales declarados
 workflow.add_node("llm", nodo_llm)         # Nodo de decisión y memoria
 workflow.add_node("finanzas", nodo_finanzas)  # Nodo de finanzas
 workflow.add_node("clima", nodo_clima)        # Nodo de clima
 workflow.add_node("general", nodo_general)    # Nodo general
+workflow.add_node("combinar", nodo_combinar)  # Junta las respuestas de las ramas en el historial
 workflow.set_entry_point("llm")  # El grafo empieza en el nodo de decisión
 workflow.add_conditional_edges(
     "llm",  # Nodo desde el que se ramifica
-    lambda state: state["ruta"],  # Función que decide la ruta según el estado
-    {
-        "finanzas": "finanzas",  # Si ruta es 'finanzas', va al nodo_finanzas
-        "clima": "clima",        # Si ruta es 'clima', va al nodo_clima
-        "general": "general",    # Si ruta es 'general', va al nodo_general
-    },
+    ENRUTADOR.condicion_varias,  # Decide las rutas según el estado (state['rutas']), en paralelo
+    ENRUTADOR.destinos(),  # Cada ruta va al nodo del mismo nombre: finanzas, clima, general
 )
-workflow.add_edge("finanzas", END)  # Todas las ramas terminan en END
-workflow.add_edge("clima", END)
-workflow.add_edge("general", END)
+workflow.add_edge("finanzas", "combinar")  # Todas las ramas se juntan antes de terminar
+workflow.add_edge("clima", "combinar")
+workflow.add_edge("general", "combinar")
+workflow.add_edge("combinar", END)
 grafo = workflow.compile()  # Compilamos el grafo para poder ejecutarlo
 
 # --- Ejecución del grafo ---
-print("=== LangGraph: memoria + condicionales ===")
-# Pedimos input al usuario antes de ejecutar el grafo
-user_input = input("👤 Usuario: ")  # El usuario escribe su pregunta
-# Creamos el estado inicial con el input y el historial vacío
-estado = Estado()
-estado["ultimo_input"] = user_input
-estado["historial"] = []
-# Ejecutamos el grafo: él decide la ruta, responde y guarda todo en el historial
-grafo.invoke(estado)
+if __name__ == "__main__":
+    print("=== LangGraph: memoria + condicionales ===")
+    # Pedimos input al usuario antes de ejecutar el grafo
+    user_input = input("👤 Usuario: ")  # El usuario escribe su pregunta
+    # Creamos el estado inicial con el input y el historial vacío
+    estado = Estado()
+    estado["ultimo_input"] = user_input
+    estado["historial"] = HistorialAcotado(VENTANA_HISTORIAL)
+    # Ejecutamos el grafo: él decide las rutas, responde y guarda todo en el historial
+    final = grafo.invoke(estado)
+    nodo_memoria(final)
@@ -3,125 +3,173 @@
 # en una base de datos SQLite y aplicar lógica condicional en un grafo.
 # Ideal para tutoriales y aprendizaje.
 
-import sqlite3
+import argparse
+import asyncio
 from langgraph.graph import StateGraph, END  # Importamos las clases principales de LangGraph
+# Funciones de memoria persistente compartidas con el ejemplo 06
+from memoria_sqlite import (inicializar_db, ColaEscritura, PoolConexiones, SESION_POR_DEFECTO,
+                            guardar_mensaje, historial_nuevo)
+from enrutador import ENRUTADOR, EstadoRutas, respuestas_en_orden  # Tabla de rutas compilada, compartida con 03–06
+# Conexiones, cola y lector no van en el estado: los nodos los reciben en config
+from recursos import Recursos, recursos_de
+from instrumentacion import instrumentar  # Métricas por nodo si METRICAS_GRAFO está definida
 
-# --- Funciones de memoria persistente ---
-def inicializar_db():
-    """
-    Inicializa la base de datos y la tabla de historial si no existen.
-    Devuelve la conexión SQLite.
-    """
-    conn = sqlite3.connect("05_memoria.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS historial (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            rol TEXT,
-            contenido TEXT
-        )
-    """)
-    conn.commit()
-    return conn
-
-def guardar_mensaje(conn, rol, contenido):
-    """
-    Guarda un mensaje en la base de datos.
-    """
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO historial (rol, contenido) VALUES (?, ?)", (rol, contenido))
-    conn.commit()
+# Canales del grafo: los de EstadoRutas (rutas y respuestas de las ramas) más la sesión y el cursor
+class Estado(EstadoRutas):
+    session_id: str
+    ultimo_id_visto: int
 
-def obtener_historial(conn):
-    """
-    Recupera el historial completo de la base de datos.
-    """
-    cursor = conn.cursor()
-    cursor.execute("SELECT rol, contenido FROM historial ORDER BY id ASC")
-    return cursor.fetchall()
+# Mensaje de la decisión para cada ruta del enrutador
+RESPUESTAS = {
+    "finanzas": "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'.",
+    "clima": "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'.",
+    "general": "🤖 El agente no entiende bien la intención. Te responde de forma genérica.",
+}
 
 # --- Nodos del grafo ---
-def nodo_llm(state):
+def nodo_llm(state, config):
     """
     Nodo que guarda el input en la base y decide la ruta.
     """
     pregunta = state.get("ultimo_input", "")  # Recupera el input del usuario
-    guardar_mensaje(state["db"], "usuario", pregunta)  # Guarda el input en la base
-    # Lógica condicional para decidir la ruta
-    if "precio" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por precios. Te redirige a la ruta de 'consultas financieras'."
-        state["ruta"] = "finanzas"
-    elif "clima" in pregunta.lower():
-        respuesta = "🤖 El agente detecta que preguntas por el clima. Te redirige a la ruta de 'consultas meteorológicas'."
-        state["ruta"] = "clima"
-    else:
-        respuesta = "🤖 El agente no entiende bien la intención. Te responde de forma genérica."
-        state["ruta"] = "general"
-    print(respuesta)
+    guardar_mensaje(recursos_de(config).cola, "usuario", pregunta, state["session_id"])  # Guarda el input en la base
+    # El enrutador compilado decide las rutas (una o varias) en una sola pasada sobre el texto
+    state["rutas"] = ENRUTADOR.clasificar_todas(pregunta)
+    state["ruta"] = state["rutas"][0]  # Ruta principal
+    state["respuestas"] = None  # Vacía las respuestas del turno anterior
+    for ruta in state["rutas"]:
+        print(RESPUESTAS[ruta])
     return state
 
-def nodo_finanzas(state):
+# Con varias rutas las ramas se ejecutan en paralelo: cada una devuelve solo su
+# respuesta (el reducer de 'respuestas' las junta) y nodo_memoria las guarda en
+# la base en el orden de las rutas
+
+def nodo_finanzas(state, config):
     """
-    Nodo que responde a preguntas financieras y guarda la respuesta en la base.
+    Nodo que responde a preguntas financieras.
     """
     respuesta = "📈 Respuesta del módulo de finanzas: el precio de BTC está en 42k (ejemplo)."
     print(respuesta)
-    guardar_mensaje(state["db"], "agente", respuesta)
-    return state
+    return {"respuestas": {"finanzas": respuesta}}
 
-def nodo_clima(state):
+def nodo_clima(state, config):
     """
-    Nodo que responde a preguntas sobre el clima y guarda la respuesta en la base.
+    Nodo que responde a preguntas sobre el clima.
     """
     respuesta = "🌦️ Respuesta del módulo de clima: hoy está soleado con 25°C (ejemplo)."
     print(respuesta)
-    guardar_mensaje(state["db"], "agente", respuesta)
-    return state
+    return {"respuestas": {"clima": respuesta}}
 
-def nodo_general(state):
+def nodo_general(state, config):
     """
-    Nodo que responde de forma genérica y guarda la respuesta en la base.
+    Nodo que responde de forma genérica.
     """
     respuesta = "💬 Respuesta general: gracias por tu pregunta."
     print(respuesta)
-    guardar_mensaje(state["db"], "agente", respuesta)
-    return state
+    return {"respuestas": {"general": respuesta}}
 
-def nodo_memoria(state):
+def guardar_respuestas(state, cola):
+    """Encola las respuestas de las ramas en el orden de las rutas."""
+    for respuesta in respuestas_en_orden(state):
+        guardar_mensaje(cola, "agente", respuesta, state["session_id"])
+
+def mostrar_historial(state, filas):
     """
-    Nodo que muestra el historial completo guardado en la base de datos.
+    Imprime los mensajes recibidos y avanza el cursor state["ultimo_id_visto"].
     """
-    print("🗂️ Historial completo:")
-    for rol, contenido in obtener_historial(state["db"]):
+    print("🗂️ Historial:")
+    for fila_id, rol, contenido in filas:
         print(f"{rol}: {contenido}")
+        state["ultimo_id_visto"] = fila_id
     return state
 
+def nodo_memoria(state, config):
+    """
+    Nodo que muestra el historial guardado en la base de datos. Solo lee los
+    mensajes posteriores al cursor (la primera vez, los más recientes), así el
+    coste por turno no crece con el tamaño de la tabla.
+    """
+    recursos = recursos_de(config)
+    guardar_respuestas(state, recursos.cola)
+    recursos.cola.flush()  # Fin de turno: los mensajes pendientes quedan escritos en disco
+    filas = historial_nuevo(recursos.db.conexion(), state["session_id"], state.get("ultimo_id_visto"))
+    return mostrar_historial(state, filas)
+
+# --- Versión asíncrona de los nodos (para grafo_async.ainvoke / astream) ---
+# Las escrituras ya son no bloqueantes (van a la cola), así que esos nodos se
+# reutilizan tal cual. El flush y la lectura del historial no bloquean el bucle
+# de eventos: se esperan como futures y la lectura va a un ejecutor acotado.
+async def anodo_llm(state, config):
+    return nodo_llm(state, config)
+
+async def anodo_finanzas(state, config):
+    return nodo_finanzas(state, config)
+
+async def anodo_clima(state, config):
+    return nodo_clima(state, config)
+
+async def anodo_general(state, config):
+    return nodo_general(state, config)
+
+async def anodo_memoria(state, config):
+    """
+    Igual que nodo_memoria, sin bloquear: espera el commit agrupado y lee el
+    historial en un hilo del LectorSQLite (recursos.lector).
+    """
+    recursos = recursos_de(config)
+    guardar_respuestas(state, recursos.cola)
+    await asyncio.wrap_future(recursos.cola.marcar())
+    filas = await asyncio.wrap_future(recursos.lector.enviar(
+        lambda conn: list(historial_nuevo(conn, state["session_id"], state.get("ultimo_id_visto")))
+    ))
+    return mostrar_historial(state, filas)
+
 # --- Construcción del grafo ---
-workflow = StateGraph(dict)  # Usamos dict estándar como estado
-workflow.add_node("llm", nodo_llm)         # Nodo de decisión y memoria
-workflow.add_node("finanzas", nodo_finanzas)  # Nodo de finanzas
-workflow.add_node("clima", nodo_clima)        # Nodo de clima
-workflow.add_node("general", nodo_general)    # Nodo general
-workflow.add_node("memoria", nodo_memoria)    # Nodo que muestra el historial
-workflow.set_entry_point("llm")  # El grafo empieza en el nodo de decisión
-workflow.add_conditional_edges(
-    "llm",  # Nodo desde el que se ramifica
-    lambda state: state["ruta"],  # Función que decide la ruta según el estado
-    {
-        "finanzas": "finanzas",  # Si ruta es 'finanzas', va al nodo_finanzas
-        "clima": "clima",        # Si ruta es 'clima', va al nodo_clima
-        "general": "general",    # Si ruta es 'general', va al nodo_general
-    },
-)
-workflow.add_edge("finanzas", "memoria")  # Todas las ramas terminan mostrando el historial
-workflow.add_edge("clima", "memoria")
-workflow.add_edge("general", "memoria")
-workflow.add_edge("memoria", END)
-grafo = workflow.compile()  # Compilamos el grafo para poder ejecutarlo
+def construir_grafo(asincrono=False, checkpointer=None):
+    """
+    Construye y compila el grafo. Con asincrono=True usa los nodos async,
+    pensados para atender muchas conversaciones a la vez con ainvoke.
+    Como el estado ya no lleva conexiones ni colas, admite un checkpointer.
+    """
+    nodos = (anodo_llm, anodo_finanzas, anodo_clima, anodo_general, anodo_memoria) if asincrono else (
+        nodo_llm, nodo_finanzas, nodo_clima, nodo_general, nodo_memoria)
+    llm, finanzas, clima, general, memoria = nodos
+    workflow = instrumentar(StateGraph(Estado))  # Canales declarados; 'respuestas' con reducer
+    workflow.add_node("llm", llm)            # Nodo de decisión y memoria
+    workflow.add_node("finanzas", finanzas)  # Nodo de finanzas
+    workflow.add_node("clima", clima)        # Nodo de clima
+    workflow.add_node("general", general)    # Nodo general
+    workflow.add_node("memoria", memoria)    # Nodo que muestra el historial
+    workflow.set_entry_point("llm")  # El grafo empieza en el nodo de decisión
+    workflow.add_conditional_edges(
+        "llm",  # Nodo desde el que se ramifica
+        ENRUTADOR.condicion_varias,  # Decide las rutas según el estado (state['rutas']), en paralelo
+        ENRUTADOR.destinos(),  # Cada ruta va al nodo del mismo nombre: finanzas, clima, general
+    )
+    workflow.add_edge("finanzas", "memoria")  # Todas las ramas se juntan en memoria (una sola vez)
+    workflow.add_edge("clima", "memoria")
+    workflow.add_edge("general", "memoria")
+    workflow.add_edge("memoria", END)
+    return workflow.compile(checkpointer=checkpointer)  # Compilamos el grafo para poder ejecutarlo
+
+grafo = construir_grafo()
+grafo_async = construir_grafo(asincrono=True)
 
 # --- Ejecución principal ---
-print("=== LangGraph: Memoria a largo plazo (SQLite) ===")
-db = inicializar_db()  # Inicializa la base y la tabla correctamente
-user_input = input("👤 Usuario: ")  # Recoge el input antes de invocar el grafo
-estado = {"db": db, "ultimo_input": user_input}  # Estado inicial con conexión y input
-grafo.invoke(estado)  # Ejecuta el grafo completo
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria a largo plazo (SQLite)")
+    parser.add_argument("--sesion", default=SESION_POR_DEFECTO, help="Sesión (usuario o hilo) de la conversación")
+    args = parser.parse_args()
+
+    print("=== LangGraph: Memoria a largo plazo (SQLite) ===")
+    inicializar_db("05_memoria.db").close()  # Crea (o migra) la base y la tabla correctamente
+    recursos = Recursos(
+        db=PoolConexiones("05_memoria.db"),  # Una conexión por hilo, pedida con db.conexion()
+        cola=ColaEscritura("05_memoria.db"),  # Escritor en segundo plano con commit agrupado
+    )
+    user_input = input("👤 Usuario: ")  # Recoge el input antes de invocar el grafo
+    # Estado inicial: solo datos pequeños y serializables (sesión, cursor del historial e input)
+    estado = {"session_id": args.sesion, "ultimo_id_visto": None, "ultimo_input": user_input}
+    grafo.invoke(estado, recursos.config())  # Ejecuta el grafo completo con los recursos inyectados
+    recursos.cerrar()  # Escribe lo que quede pendiente en la cola y cierra las conexiones
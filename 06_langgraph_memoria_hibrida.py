@@ -1,8 +1,18 @@
-import sqlite3
+import argparse
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 from langgraph.graph import StateGraph, END
-from sentence_transformers import SentenceTransformer
-import faiss
-import numpy as np
+from memoria_sqlite import (inicializar_db, ColaEscritura, LectorSQLite, PoolConexiones,
+                            SESION_POR_DEFECTO, buscar_lexico, guardar_mensaje, historial_nuevo, obtener_textos)
+# sentence_transformers, faiss y numpy se importan en el primer uso (arranque rápido)
+from embeddings import CacheEmbeddings, PlanificadorEmbeddings, cargar_modelo
+from enrutador import ENRUTADOR, EJEMPLOS, EnrutadorSemantico, EstadoRutas, respuestas_en_orden
+# Modelo, índice FAISS, conexiones y ejecutores no van en el estado: los nodos los reciben en config
+from recursos import Recursos, recursos_de
+from instrumentacion import instrumentar
+from compactacion import Compactador
+from cache_respuestas import CacheRespuestas
+from herramientas import herramientas_simuladas
 
 class Estado(dict):
     """Estado con memoria híbrida"""
@@ -11,143 +21,331 @@ class Estado(dict):
         self["ultimo_input"] = None
         self["ruta"] = None
 
-# --- Inicialización ---
-def inicializar_db():
-    conn = sqlite3.connect("06_memoria.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS historial (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            rol TEXT,
-            contenido TEXT
-        )
-    """)
-    conn.commit()
-    return conn
-
-def guardar_mensaje(conn, rol, contenido):
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO historial (rol, contenido) VALUES (?, ?)", (rol, contenido))
-    conn.commit()
-
-def obtener_historial(conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT rol, contenido FROM historial ORDER BY id ASC")
-    return cursor.fetchall()
+# Canales del grafo: los de EstadoRutas (rutas y respuestas de las ramas) más la sesión y el cursor
+class EstadoGrafo(EstadoRutas):
+    session_id: str
+    ultimo_id_visto: int
 
 # --- Inicialización de FAISS ---
-def inicializar_faiss():
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+def inicializar_faiss(conn, ruta="06_memoria.faiss", codificacion="float32"):
+    from memoria_vectorial import cargar_memoria  # Importa faiss y numpy
+    # El modelo se carga en el primer encode, o se usa el proceso anfitrión si
+    # EMBEDDINGS_HOST está definida. El planificador agrupa en un solo lote los
+    # encodes de conversaciones concurrentes, y la caché hace que indexar y buscar
+    # el mismo texto lo codifique una sola vez (ruta="06_memoria.db" añade un nivel en SQLite)
+    model = CacheEmbeddings(PlanificadorEmbeddings(cargar_modelo("all-MiniLM-L6-v2")))
     dimension = model.get_sentence_embedding_dimension()
-    index = faiss.IndexFlatL2(dimension)
-    return model, index, []
+    # Abre el snapshot guardado y codifica solo los mensajes añadidos desde entonces.
+    # Búsqueda exacta hasta 50k mensajes; a partir de ahí se promociona a HNSW.
+    # El índice solo guarda ids de fila y vectores (en la codificación elegida)
+    memoria = cargar_memoria(ruta, dimension, codificacion)
+    memoria.sincronizar(conn, model)
+    return model, memoria
 
-def indexar_texto(model, index, textos, nuevo_texto):
+def indexar_texto(model, memoria, fila_id, nuevo_texto, session_id):
     vector = model.encode([nuevo_texto])
-    index.add(np.array(vector).astype("float32"))
-    textos.append(nuevo_texto)
-    return textos
+    memoria.agregar([fila_id], vector, [session_id])  # El texto ya está en SQLite
 
-def buscar_similar(model, index, textos, query, k=2):
-    if len(textos) == 0:
+def buscar_similar(memoria, conn, vector, session_id, k=2):
+    if len(memoria) == 0:
         return []
+    ids = memoria.buscar(vector, k, session_id)  # Solo mensajes de la misma sesión
+    textos = obtener_textos(conn, ids)  # Solo se leen de SQLite los k resultados
+    return [textos[i] for i in ids if i in textos]
+
+# Candidatos que aporta cada búsqueda (FAISS y BM25) antes de fusionarlas
+CANDIDATOS = 10
+
+def fusionar_rrf(rankings, k, constante=60):
+    """
+    Reciprocal rank fusion: cada id suma 1 / (constante + posición) por cada
+    ranking en el que aparece. No compara distancias L2 con puntuaciones BM25,
+    solo posiciones, así que no hace falta normalizarlas.
+    """
+    puntuaciones = {}
+    for ranking in rankings:
+        for posicion, fila_id in enumerate(ranking, start=1):
+            puntuaciones[fila_id] = puntuaciones.get(fila_id, 0.0) + 1.0 / (constante + posicion)
+    return sorted(puntuaciones, key=puntuaciones.get, reverse=True)[:k]
+
+def buscar_hibrido(memoria, conn, vector, lexicos, session_id, k=2):
+    """
+    Fusiona los vecinos de FAISS con los resultados de BM25 (`lexicos`, pares
+    (id, contenido) de buscar_lexico). Los términos exactos (tickers, ids) los
+    encuentra BM25; las paráfrasis, FAISS.
+    """
+    ids_vector = memoria.buscar(vector, CANDIDATOS, session_id) if len(memoria) else []
+    textos = dict(lexicos)
+    ids = fusionar_rrf([ids_vector, list(textos)], k)
+    textos.update(obtener_textos(conn, [i for i in ids if i not in textos]))
+    return [textos[i] for i in ids if i in textos]
+
+def consultar(model, memoria, db, query, session_id, lexicos=None):
+    """
+    Vector de la pregunta (acierto de caché: nodo_input ya lo codificó) y mensajes
+    similares, con los textos leídos de SQLite (`db`, el pool de conexiones).
+    El mismo vector sirve después para el enrutado semántico.
+    Con `lexicos` (resultados de BM25, o un Future que se resuelve mientras se
+    codifica la pregunta) la búsqueda es híbrida.
+    """
     vector = model.encode([query])
-    D, I = index.search(np.array(vector).astype("float32"), k)
-    return [textos[i] for i in I[0] if i < len(textos)]
+    if lexicos is None:
+        return vector, buscar_similar(memoria, db.conexion(), vector, session_id)
+    if isinstance(lexicos, Future):
+        lexicos = lexicos.result()
+    return vector, buscar_hibrido(memoria, db.conexion(), vector, lexicos, session_id)
+
+def busqueda_hibrida(recursos):
+    """La búsqueda es híbrida salvo con --busqueda vectorial."""
+    return recursos.get("busqueda", "hibrida") == "hibrida"
 
 # --- Nodos ---
-def nodo_input(state: Estado):
+def nodo_input(state: Estado, config):
+    recursos = recursos_de(config)
     user_input = input("👤 Usuario: ")
     state["ultimo_input"] = user_input
-    guardar_mensaje(state["db"], "usuario", user_input)
-    state["textos"] = indexar_texto(state["model"], state["index"], state["textos"], user_input)
+    # El vector se indexa con el id de la fila en SQLite: urgente, se escribe sin esperar a la ventana
+    fila_id = guardar_mensaje(recursos.cola, "usuario", user_input, state["session_id"], urgente=True).result()
+    indexar_texto(recursos.model, recursos.memoria, fila_id, user_input, state["session_id"])
     return state
 
-def nodo_llm(state: Estado):
+def nodo_llm(state: Estado, config):
+    recursos = recursos_de(config)
     pregunta = state["ultimo_input"]
 
-    # Búsqueda semántica en memoria
-    similares = buscar_similar(state["model"], state["index"], state["textos"], pregunta)
+    # Búsqueda en memoria: BM25 sobre SQLite (FTS5) fusionado con FAISS
+    lexicos = buscar_lexico(recursos.db.conexion(), pregunta, state["session_id"], CANDIDATOS, rol="usuario") \
+        if busqueda_hibrida(recursos) else None
+    vector, similares = consultar(recursos.model, recursos.memoria, recursos.db, pregunta, state["session_id"], lexicos)
+    return responder(state, recursos, similares, vector)
+
+# Mensaje de la decisión para cada ruta del enrutador ({contexto}: mensajes similares)
+RESPUESTAS = {
+    "finanzas": "📈 Pregunta detectada: finanzas. Contexto: {contexto}",
+    "clima": "🌦️ Pregunta detectada: clima. Contexto: {contexto}",
+    "general": "💬 Respuesta general. Contexto: {contexto}",
+}
+
+def responder(state: Estado, recursos, similares, vector=None):
+    """
+    Decide las rutas con el contexto recuperado (compartido por nodo_llm y anodo_llm).
+    Con recursos.enrutador (EnrutadorSemantico) se enruta por similitud del vector
+    de la pregunta; si no, o si no hay confianza suficiente, por palabras clave.
+    Si la pregunta tiene varias intenciones, sus ramas se ejecutan en paralelo.
+    """
+    pregunta = state["ultimo_input"]
     contexto = " | ".join(similares)
 
-    if "precio" in pregunta.lower():
-        respuesta = f"📈 Pregunta detectada: finanzas. Contexto: {contexto}"
-        state["ruta"] = "finanzas"
-    elif "clima" in pregunta.lower():
-        respuesta = f"🌦️ Pregunta detectada: clima. Contexto: {contexto}"
-        state["ruta"] = "clima"
+    enrutador = recursos.get("enrutador") or ENRUTADOR
+    if vector is not None and isinstance(enrutador, EnrutadorSemantico):
+        state["rutas"] = enrutador.clasificar_todas(pregunta, vector)
     else:
-        respuesta = f"💬 Respuesta general. Contexto: {contexto}"
-        state["ruta"] = "general"
+        state["rutas"] = enrutador.clasificar_todas(pregunta)
+    state["ruta"] = state["rutas"][0]  # Ruta principal
+    state["respuestas"] = None  # Vacía las respuestas del turno anterior
+    respuesta = "\n".join(RESPUESTAS[ruta].format(contexto=contexto) for ruta in state["rutas"])
 
-    guardar_mensaje(state["db"], "agente", respuesta)
+    guardar_mensaje(recursos.cola, "agente", respuesta, state["session_id"])
     print(respuesta)
     return state
 
-def nodo_finanzas(state: Estado):
-    respuesta = "📊 Precio BTC: 42k (ejemplo)."
-    guardar_mensaje(state["db"], "agente", respuesta)
-    print(respuesta)
-    return state
+# Herramienta de cada rama (simuladas; recursos.herramientas las sustituye)
+HERRAMIENTAS = herramientas_simuladas()
+# Segundos que vale en la caché la respuesta de cada ruta: el precio cambia enseguida
+TTL_RESPUESTAS = {"finanzas": 60, "clima": 1800, "general": 86400}
 
-def nodo_clima(state: Estado):
-    respuesta = "☀️ Hoy soleado con 25°C (ejemplo)."
-    guardar_mensaje(state["db"], "agente", respuesta)
+def ejecutar_rama(ruta, state: Estado, config):
+    """
+    Llama a la herramienta de `ruta` o, con recursos.cache_respuestas, responde
+    con la respuesta guardada de la misma pregunta o de una paráfrasis.
+    Las ramas pueden ejecutarse en paralelo: devuelven solo su respuesta (el
+    reducer de 'respuestas' las junta) y la memoria las guarda en orden.
+    """
+    recursos = recursos_de(config)
+    herramienta = (recursos.get("herramientas") or HERRAMIENTAS)[ruta]
+    cache = recursos.get("cache_respuestas")
+    pregunta = state["ultimo_input"]
+    respuesta = cache.obtener(ruta, pregunta, herramienta) if cache is not None else herramienta(pregunta)
     print(respuesta)
-    return state
+    return {"respuestas": {ruta: respuesta}}
 
-def nodo_general(state: Estado):
-    respuesta = "🤖 Gracias por tu consulta."
-    guardar_mensaje(state["db"], "agente", respuesta)
-    print(respuesta)
-    return state
+def nodo_finanzas(state: Estado, config):
+    return ejecutar_rama("finanzas", state, config)
 
-def nodo_memoria(state: Estado):
+def nodo_clima(state: Estado, config):
+    return ejecutar_rama("clima", state, config)
+
+def nodo_general(state: Estado, config):
+    return ejecutar_rama("general", state, config)
+
+def guardar_respuestas(state: Estado, cola):
+    """Encola las respuestas de las ramas en el orden de las rutas."""
+    for respuesta in respuestas_en_orden(state):
+        guardar_mensaje(cola, "agente", respuesta, state["session_id"])
+
+def mostrar_historial(state: Estado, filas):
+    """Imprime los mensajes recibidos y avanza el cursor state["ultimo_id_visto"]."""
     print("\n📜 Historial persistente (SQLite):")
-    historial = obtener_historial(state["db"])
-    for i, (rol, contenido) in enumerate(historial, 1):
-        print(f"{i}. {rol}: {contenido}")
+    for fila_id, rol, contenido in filas:
+        print(f"{fila_id}. {rol}: {contenido}")
+        state["ultimo_id_visto"] = fila_id
+    return state
+
+def nodo_memoria(state: Estado, config):
+    recursos = recursos_de(config)
+    guardar_respuestas(state, recursos.cola)
+    recursos.cola.flush()  # Fin de turno: escritura agrupada y durable
+    # Solo los mensajes posteriores al cursor (la primera vez, la ventana más reciente)
+    filas = historial_nuevo(recursos.db.conexion(), state["session_id"], state.get("ultimo_id_visto"))
+    return mostrar_historial(state, filas)
+
+# --- Versión asíncrona de los nodos (para grafo_async.ainvoke / astream) ---
+# El input llega de una fuente async (recursos.entrada), el id de la fila se
+# espera como future del commit agrupado, los embeddings y FAISS se ejecutan en
+# un ejecutor acotado (recursos.ejecutor) y las lecturas en el LectorSQLite
+# (recursos.lector). Los nodos que solo encolan escrituras se reutilizan tal cual;
+# las ramas, que llaman a herramientas lentas, también van al ejecutor.
+async def leer_consola():
+    """Fuente de entrada por defecto: input() en un hilo, sin bloquear el bucle."""
+    return await asyncio.to_thread(input, "👤 Usuario: ")
+
+async def anodo_input(state: Estado, config):
+    recursos = recursos_de(config)
+    user_input = await recursos.entrada()
+    state["ultimo_input"] = user_input
+    fila_id = await asyncio.wrap_future(
+        guardar_mensaje(recursos.cola, "usuario", user_input, state["session_id"], urgente=True))
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        recursos.ejecutor, indexar_texto, recursos.model, recursos.memoria, fila_id, user_input, state["session_id"]
+    )
     return state
 
+async def anodo_llm(state: Estado, config):
+    recursos = recursos_de(config)
+    loop = asyncio.get_running_loop()
+    # BM25 corre en el lector mientras el ejecutor codifica la pregunta y busca en FAISS
+    lexicos = recursos.lector.enviar(
+        buscar_lexico, state["ultimo_input"], state["session_id"], CANDIDATOS, "usuario"
+    ) if busqueda_hibrida(recursos) else None
+    vector, similares = await loop.run_in_executor(
+        recursos.ejecutor, consultar, recursos.model, recursos.memoria, recursos.db, state["ultimo_input"],
+        state["session_id"], lexicos
+    )
+    return responder(state, recursos, similares, vector)
+
+async def anodo_rama(ruta, state: Estado, config):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(recursos_de(config).ejecutor, ejecutar_rama, ruta, state, config)
+
+async def anodo_finanzas(state: Estado, config):
+    return await anodo_rama("finanzas", state, config)
+
+async def anodo_clima(state: Estado, config):
+    return await anodo_rama("clima", state, config)
+
+async def anodo_general(state: Estado, config):
+    return await anodo_rama("general", state, config)
+
+async def anodo_memoria(state: Estado, config):
+    recursos = recursos_de(config)
+    guardar_respuestas(state, recursos.cola)
+    await asyncio.wrap_future(recursos.cola.marcar())  # Fin de turno sin bloquear
+    filas = await asyncio.wrap_future(recursos.lector.enviar(
+        lambda conn: list(historial_nuevo(conn, state["session_id"], state.get("ultimo_id_visto")))
+    ))
+    return mostrar_historial(state, filas)
+
 # --- Grafo ---
-workflow = StateGraph(dict)
-
-workflow.add_node("input", nodo_input)
-workflow.add_node("llm", nodo_llm)
-workflow.add_node("finanzas", nodo_finanzas)
-workflow.add_node("clima", nodo_clima)
-workflow.add_node("general", nodo_general)
-workflow.add_node("memoria", nodo_memoria)
-
-workflow.set_entry_point("input")
-workflow.add_edge("input", "llm")
-
-workflow.add_conditional_edges(
-    "llm",
-    lambda state: state["ruta"],
-    {
-        "finanzas": "finanzas",
-        "clima": "clima",
-        "general": "general",
-    },
-)
-
-workflow.add_edge("finanzas", "memoria")
-workflow.add_edge("clima", "memoria")
-workflow.add_edge("general", "memoria")
-workflow.add_edge("memoria", END)
-
-grafo = workflow.compile()
+def construir_grafo(asincrono=False, checkpointer=None):
+    # El estado solo lleva datos de la conversación: admite un checkpointer
+    nodos = (anodo_input, anodo_llm, anodo_finanzas, anodo_clima, anodo_general, anodo_memoria) if asincrono else (
+        nodo_input, nodo_llm, nodo_finanzas, nodo_clima, nodo_general, nodo_memoria)
+    entrada, llm, finanzas, clima, general, memoria = nodos
+    workflow = instrumentar(StateGraph(EstadoGrafo))  # Canales declarados; 'respuestas' con reducer
+
+    workflow.add_node("input", entrada)
+    workflow.add_node("llm", llm)
+    workflow.add_node("finanzas", finanzas)
+    workflow.add_node("clima", clima)
+    workflow.add_node("general", general)
+    workflow.add_node("memoria", memoria)
+
+    workflow.set_entry_point("input")
+    workflow.add_edge("input", "llm")
+
+    # Todas las rutas de state['rutas']: con varias, sus nodos se ejecutan en paralelo
+    workflow.add_conditional_edges("llm", ENRUTADOR.condicion_varias, ENRUTADOR.destinos())
+
+    workflow.add_edge("finanzas", "memoria")
+    workflow.add_edge("clima", "memoria")
+    workflow.add_edge("general", "memoria")
+    workflow.add_edge("memoria", END)
+
+    return workflow.compile(checkpointer=checkpointer)
+
+grafo = construir_grafo()
+grafo_async = construir_grafo(asincrono=True)
 
 # --- Ejecución ---
-print("=== LangGraph: Memoria híbrida (SQLite + FAISS) ===")
-estado = {
-    "db": inicializar_db(),
-    "model": None,
-    "index": None,
-    "textos": [],
-    "ultimo_input": None,
-    "ruta": None
-}
-estado["model"], estado["index"], estado["textos"] = inicializar_faiss()
-grafo.invoke(estado)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria híbrida (SQLite + FAISS)")
+    parser.add_argument("--sesion", default=SESION_POR_DEFECTO, help="Sesión (usuario o hilo) de la conversación")
+    parser.add_argument("--async", dest="asincrono", action="store_true", help="Ejecuta el turno con ainvoke")
+    parser.add_argument("--umbral", type=float, default=0.5,
+                        help="Similitud mínima del enrutado semántico (por debajo, palabras clave)")
+    parser.add_argument("--margen", type=float, default=0.1,
+                        help="Distancia máxima a la mejor ruta para repartir la pregunta entre varias")
+    parser.add_argument("--busqueda", choices=("hibrida", "vectorial"), default="hibrida",
+                        help="Contexto con BM25 + FAISS (RRF) o solo con FAISS")
+    parser.add_argument("--codificacion", choices=("float32", "fp16", "sq8", "pq"), default="float32",
+                        help="Cómo se guardan los vectores en FAISS (menos memoria a cambio de algo de recall)")
+    parser.add_argument("--retener-dias", type=float, help="Borra en segundo plano los mensajes con más de estos días")
+    parser.add_argument("--retener-mensajes", type=int, help="Mensajes más recientes que se conservan por sesión")
+    parser.add_argument("--cache-respuestas", type=float, metavar="UMBRAL",
+                        help="Reutiliza respuestas de las ramas para preguntas con al menos esta similitud")
+    parser.add_argument("--latencia-herramientas", type=float, default=0.0,
+                        help="Segundos que tarda cada herramienta simulada")
+    args = parser.parse_args()
+
+    print("=== LangGraph: Memoria híbrida (SQLite + FAISS) ===")
+    inicializar_db("06_memoria.db").close()  # Crea (o migra) el esquema
+    # Recursos pesados, compartidos por todos los turnos e inyectados en config
+    recursos = Recursos(
+        db=PoolConexiones("06_memoria.db"),  # Una conexión por hilo
+        cola=ColaEscritura("06_memoria.db"),
+    )
+    recursos.model, recursos.memoria = inicializar_faiss(recursos.db.conexion(), codificacion=args.codificacion)
+    # Enrutado semántico: mismo vector que la búsqueda, sin encodes extra por turno
+    recursos.enrutador = EnrutadorSemantico(recursos.model, EJEMPLOS, umbral=args.umbral, respaldo=ENRUTADOR,
+                                            margen=args.margen)
+    recursos.busqueda = args.busqueda
+    recursos.herramientas = herramientas_simuladas(args.latencia_herramientas)
+    if args.cache_respuestas is not None:
+        # Exactas y paráfrasis, con el mismo modelo (y la misma caché de embeddings) que la memoria
+        recursos.cache_respuestas = CacheRespuestas(recursos.model, TTL_RESPUESTAS, umbral=args.cache_respuestas)
+    if args.retener_dias is not None or args.retener_mensajes is not None:
+        # Retención, plegado de duplicados y reconstrucción del índice mientras se atiende el turno
+        recursos.compactador = Compactador("06_memoria.db", recursos.memoria, args.retener_dias,
+                                           args.retener_mensajes).iniciar()
+    # El estado solo lleva datos pequeños y serializables de la conversación
+    estado = {
+        "session_id": args.sesion,
+        "ultimo_id_visto": None,  # Cursor del historial ya mostrado
+        "ultimo_input": None,
+        "ruta": None
+    }
+    if args.asincrono:
+        # Mismo turno por el camino asíncrono (ainvoke)
+        recursos.entrada = leer_consola
+        recursos.lector = LectorSQLite("06_memoria.db")
+        recursos.ejecutor = ThreadPoolExecutor(8)
+        asyncio.run(grafo_async.ainvoke(estado, recursos.config()))
+    else:
+        grafo.invoke(estado, recursos.config())
+    recursos.cola.flush()
+    recursos.memoria.guardar()  # Snapshot del índice para el próximo arranque
+    print("🧠 Caché de embeddings:", recursos.model.estadisticas())
+    if "cache_respuestas" in recursos:
+        print("🗂️ Caché de respuestas:", recursos.cache_respuestas.estadisticas())
+    recursos.cerrar()  # Ejecutores, lector, cola y conexiones
@@ -0,0 +1,72 @@
+# === Benchmark: recall vs latencia de la búsqueda vectorial ===
+# Compara la búsqueda exacta (Flat) con los índices a los que se promociona
+# IndiceAdaptativo (IVF y HNSW) sobre corpus sintéticos de distintos tamaños,
+# barriendo nprobe / efSearch. La latencia es por consulta individual, como en
+# `buscar_similar`.
+#
+# Uso: python benchmarks/bench_ann.py [--tamanos 10000,100000,1000000] [--dimension 384]
+
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memoria_vectorial import IndiceAdaptativo, ajustar_busqueda
+
+
+def corpus_sintetico(n, dimension):
+    """Vectores normalizados agrupados en clusters (más realista que ruido uniforme)."""
+    rng = np.random.default_rng(0)
+    centros = rng.normal(size=(max(1, n // 100), dimension)).astype("float32")
+    vectores = centros[rng.integers(0, len(centros), n)] + 0.3 * rng.normal(size=(n, dimension)).astype("float32")
+    vectores /= np.linalg.norm(vectores, axis=1, keepdims=True)
+    return vectores.astype("float32")
+
+
+def medir(indice, consultas, verdad, k):
+    """Devuelve (recall@k, latencia media en ms) consultando de una en una."""
+    aciertos = 0
+    inicio = time.perf_counter()
+    for consulta, esperado in zip(consultas, verdad):
+        _, I = indice.search(consulta.reshape(1, -1), k)
+        aciertos += len(set(I[0]) & set(esperado))
+    segundos = time.perf_counter() - inicio
+    return aciertos / (len(consultas) * k), 1000 * segundos / len(consultas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de recall vs latencia")
+    parser.add_argument("--tamanos", default="10000,100000,1000000")
+    parser.add_argument("--dimension", type=int, default=384)  # all-MiniLM-L6-v2
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # Una consulta = un hilo, como en el grafo
+    for n in (int(t) for t in args.tamanos.split(",")):
+        # Las consultas salen de la misma distribución que el corpus
+        todos = corpus_sintetico(n + args.consultas, args.dimension)
+        vectores, consultas = todos[:n], todos[n:]
+        ids = np.arange(n, dtype="int64")
+
+        exacto = IndiceAdaptativo(args.dimension, umbral=n + 1)  # Nunca se promociona
+        exacto.add_with_ids(vectores, ids)
+        _, verdad = exacto.search(consultas, args.k)
+        recall, ms = medir(exacto, consultas, verdad, args.k)
+        print(f"\n=== {n} vectores de dimensión {args.dimension} ===")
+        print(f"{'flat':>6} {'':>12}  recall@{args.k}={recall:.3f}  {ms:8.3f} ms/consulta")
+
+        for tipo, parametro, valores in (("ivf", "nprobe", (1, 4, 16, 64)), ("hnsw", "ef_search", (16, 32, 64, 128))):
+            inicio = time.perf_counter()
+            indice = IndiceAdaptativo(args.dimension, tipo=tipo, umbral=n)
+            indice.add_with_ids(vectores, ids)  # Al llegar al umbral se promociona
+            construccion = time.perf_counter() - inicio
+            print(f"{tipo:>6} construido en {construccion:.1f} s")
+            for valor in valores:
+                ajustar_busqueda(indice.indice, **{parametro: valor})
+                recall, ms = medir(indice, consultas, verdad, args.k)
+                print(f"{tipo:>6} {parametro}={valor:<4}  recall@{args.k}={recall:.3f}  {ms:8.3f} ms/consulta")
@@ -0,0 +1,110 @@
+# === Prueba de carga: camino síncrono vs asíncrono de los ejemplos 05 y 06 ===
+# Un cliente simulado abre muchas conversaciones a la vez; cada mensaje del
+# usuario tarda `--latencia` segundos en llegar. El camino síncrono atiende las
+# conversaciones de una en una con grafo.invoke; el asíncrono las atiende todas
+# a la vez con grafo_async.ainvoke en un único hilo de eventos.
+#
+# Uso: python benchmarks/bench_async.py [--conversaciones 200] [--turnos 3] [--latencia 0.01]
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import ModeloSimulado, cargar_ejemplo
+from embeddings import CacheEmbeddings, PlanificadorEmbeddings
+from memoria_sqlite import inicializar_db, ColaEscritura, LectorSQLite, PoolConexiones
+from memoria_vectorial import MemoriaVectorial
+from recursos import Recursos
+
+PREGUNTAS = ["¿qué precio tiene BTC?", "¿cómo estará el clima?", "cuéntame algo", "precio del oro"]
+
+
+def mensaje(conversacion, turno):
+    return f"{PREGUNTAS[(conversacion + turno) % len(PREGUNTAS)]} (conversación {conversacion}, turno {turno})"
+
+
+def crear_recursos(numero, directorio):
+    """Registro con los recursos compartidos por todas las conversaciones."""
+    ruta = os.path.join(directorio, f"{numero:02d}_carga.db")
+    inicializar_db(ruta).close()
+    recursos = Recursos(db=PoolConexiones(ruta), cola=ColaEscritura(ruta), lector=LectorSQLite(ruta, max_hilos=8))
+    if numero == 6:
+        modelo = ModeloSimulado(fijo=0.002, por_texto=0.00005)
+        recursos.model = CacheEmbeddings(PlanificadorEmbeddings(modelo))
+        recursos.memoria = MemoriaVectorial(modelo.get_sentence_embedding_dimension())
+        recursos.ejecutor = ThreadPoolExecutor(64)
+    return recursos
+
+
+def carga_sincrona(ejemplo, numero, base, conversaciones, turnos, latencia):
+    original = builtins.input
+    try:
+        for c in range(conversaciones):
+            cursor = None  # Cursor del historial ya mostrado, se conserva entre turnos
+            for t in range(turnos):
+                time.sleep(latencia)  # El mensaje del usuario tarda en llegar
+                texto = mensaje(c, t)
+                builtins.input = lambda _="", texto=texto: texto
+                final = ejemplo.grafo.invoke(
+                    {"session_id": f"c{c}", "ultimo_id_visto": cursor, "ultimo_input": texto, "ruta": None},
+                    base.config(),
+                )
+                cursor = final["ultimo_id_visto"]
+    finally:
+        builtins.input = original
+
+
+async def carga_asincrona(ejemplo, numero, base, conversaciones, turnos, latencia):
+    async def conversacion(c):
+        cursor = None
+        for t in range(turnos):
+            texto = mensaje(c, t)
+
+            async def entrada(texto=texto):
+                await asyncio.sleep(latencia)
+                return texto
+
+            if numero == 5:  # En 05 el input se lee antes de invocar el grafo
+                await asyncio.sleep(latencia)
+            final = await ejemplo.grafo_async.ainvoke(
+                {"session_id": f"c{c}", "ultimo_id_visto": cursor, "ultimo_input": texto, "ruta": None},
+                base.derivar(entrada=entrada).config(),  # La fuente de entrada es propia de cada conversación
+            )
+            cursor = final["ultimo_id_visto"]
+
+    await asyncio.gather(*(conversacion(c) for c in range(conversaciones)))
+
+
+def medir(numero, modo, args):
+    ejemplo = cargar_ejemplo(numero)
+    with tempfile.TemporaryDirectory() as directorio:
+        base = crear_recursos(numero, directorio)
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # Los nodos imprimen cada turno
+            if modo == "sync":
+                carga_sincrona(ejemplo, numero, base, args.conversaciones, args.turnos, args.latencia)
+            else:
+                asyncio.run(carga_asincrona(ejemplo, numero, base, args.conversaciones, args.turnos, args.latencia))
+        segundos = time.perf_counter() - inicio
+        base.cerrar()
+    return args.conversaciones * args.turnos / segundos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga sync vs async")
+    parser.add_argument("--conversaciones", type=int, default=200)
+    parser.add_argument("--turnos", type=int, default=3)
+    parser.add_argument("--latencia", type=float, default=0.01, help="Segundos que tarda cada mensaje del cliente")
+    args = parser.parse_args()
+
+    print(f"=== {args.conversaciones} conversaciones x {args.turnos} turnos, latencia de cliente {args.latencia * 1000:.0f} ms ===")
+    for numero in (5, 6):
+        sincrono = medir(numero, "sync", args)
+        asincrono = medir(numero, "async", args)
+        print(f"Ejemplo {numero:02d}: invoke {sincrono:8.1f} turnos/s | ainvoke {asincrono:8.1f} turnos/s (x{asincrono / sincrono:.1f})")
@@ -0,0 +1,103 @@
+# === Benchmark: caché de respuestas de las ramas (exacta y semántica) ===
+# Un flujo de preguntas de finanzas, clima y general en el que unas pocas
+# entidades (tickers, ciudades) se repiten mucho y cada pregunta se formula con
+# una de varias plantillas, como las paráfrasis de usuarios distintos. Cada
+# rama llama a una herramienta simulada con `--latencia` ms de espera y una
+# respuesta que depende de la entidad, así se cuentan también las respuestas
+# incorrectas (un acierto semántico de otra entidad: "precio de ETH" por "BTC").
+#
+# Compara sin caché, solo aciertos exactos y exactos + semánticos con varios
+# umbrales (y el último sin exigir las mismas entidades): tasa de aciertos,
+# llamadas a herramientas, latencia por pregunta y respuestas incorrectas. El
+# reloj es simulado (`--cadencia` s entre preguntas) para que caduquen los TTL
+# por ruta de 06 (finanzas 60 s, clima 30 min).
+#
+# Uso: python benchmarks/bench_cache_respuestas.py [--preguntas 3000] [--latencia 50] [--umbrales 0.95,0.9,0.85,0.8] [--real]
+
+import argparse
+import random
+import time
+
+from comun import ModeloSimulado, cargar_ejemplo, percentil
+from cache_respuestas import CacheRespuestas
+from embeddings import CacheEmbeddings, ModeloPerezoso
+from herramientas import HerramientaSimulada
+
+PLANTILLAS = {
+    "finanzas": ["¿qué precio tiene {}?", "¿Qué precio tiene {} hoy?", "dime el precio de {}",
+                 "precio de {} ahora mismo", "¿cuál es el precio de {}?"],
+    "clima": ["¿qué clima hace en {}?", "¿Qué clima hará hoy en {}?", "dime el clima de {}",
+              "clima en {} ahora", "¿cómo está el clima en {}?"],
+    "general": ["cuéntame algo sobre {}", "¿qué sabes de {}?", "háblame de {}", "información sobre {}"],
+}
+ENTIDADES = {
+    "finanzas": ["BTC", "ETH", "SOL", "ADA", "XRP", "DOGE", "DOT", "LTC", "oro", "plata"],
+    "clima": ["Madrid", "Sevilla", "Bilbao", "Valencia", "Málaga", "Murcia", "Oviedo", "Vigo"],
+    "general": ["LangGraph", "FAISS", "SQLite", "Python", "historia de Roma", "la fotosíntesis"],
+}
+
+
+def flujo(n, semilla=0):
+    """(ruta, pregunta, entidad) con popularidad de Zipf por entidad."""
+    rng = random.Random(semilla)
+    preguntas = []
+    for _ in range(n):
+        ruta = rng.choices(list(PLANTILLAS), weights=[5, 3, 2])[0]
+        entidades = ENTIDADES[ruta]
+        entidad = rng.choices(entidades, weights=[1 / (i + 1) for i in range(len(entidades))])[0]
+        preguntas.append((ruta, rng.choice(PLANTILLAS[ruta]).format(entidad), entidad))
+    return preguntas
+
+
+def herramientas(latencia):
+    """Una herramienta por ruta que responde según la entidad de la pregunta."""
+    def responder(ruta):
+        def respuesta(pregunta):
+            return f"{ruta}: " + next(e for e in ENTIDADES[ruta] if e in pregunta)
+        return respuesta
+    return {ruta: HerramientaSimulada(responder(ruta), latencia) for ruta in PLANTILLAS}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caché de respuestas: exacta vs semántica")
+    parser.add_argument("--preguntas", type=int, default=3000)
+    parser.add_argument("--latencia", type=float, default=50, help="ms de cada llamada a una herramienta")
+    parser.add_argument("--cadencia", type=float, default=1.0, help="Segundos simulados entre preguntas")
+    parser.add_argument("--umbrales", default="0.95,0.9,0.85,0.8")
+    parser.add_argument("--real", action="store_true", help="Usa all-MiniLM-L6-v2 en lugar del modelo simulado")
+    args = parser.parse_args()
+
+    ejemplo = cargar_ejemplo(6)
+    # Como en 06: la pregunta ya se ha codificado en el turno, la caché de respuestas la reutiliza
+    modelo = CacheEmbeddings(ModeloPerezoso() if args.real else ModeloSimulado())
+    preguntas = flujo(args.preguntas)
+    modelo.encode([p for _, p, _ in preguntas])
+    umbrales = [float(u) for u in args.umbrales.split(",")]
+    # (nombre, umbral, exigir las mismas entidades); la última sin comprobarlas, para ver qué evita
+    configuraciones = [("sin caché", None, True), ("exacta", 1.01, True)] + [
+        (f"semántica {u}", u, True) for u in umbrales] + [(f"{umbrales[-1]} sin entidades", umbrales[-1], False)]
+
+    print(f"{len(preguntas)} preguntas, herramientas de {args.latencia:.0f} ms, TTL {ejemplo.TTL_RESPUESTAS}\n")
+    print(f"{'caché':>19} | {'aciertos':>8} | {'exactos':>7} | {'semánt.':>7} | {'caducados':>9} | "
+          f"{'llamadas':>8} | {'ms p50':>7} | {'ms media':>8} | {'incorrectas':>11}")
+    for nombre, umbral, mismas_entidades in configuraciones:
+        reloj = [0.0]
+        cache = None if umbral is None else CacheRespuestas(
+            modelo, ejemplo.TTL_RESPUESTAS, umbral=umbral, mismas_entidades=mismas_entidades, reloj=lambda: reloj[0])
+        tools = herramientas(args.latencia / 1000)
+        tiempos, incorrectas = [], 0
+        for ruta, pregunta, entidad in preguntas:
+            reloj[0] += args.cadencia
+            inicio = time.perf_counter()
+            if cache is None:
+                respuesta = tools[ruta](pregunta)
+            else:
+                respuesta = cache.obtener(ruta, pregunta, tools[ruta])
+            tiempos.append(time.perf_counter() - inicio)
+            incorrectas += respuesta != f"{ruta}: {entidad}"
+        llamadas = sum(t.llamadas for t in tools.values())
+        e = cache.estadisticas() if cache is not None else dict.fromkeys(
+            ("tasa_aciertos", "exacto", "semantico", "caducado"), 0)
+        print(f"{nombre:>19} | {e['tasa_aciertos']:>8.1%} | {e['exacto']:>7} | {e['semantico']:>7} | "
+              f"{e['caducado']:>9} | {llamadas:>8} | {1000 * percentil(tiempos, 50):>7.2f} | "
+              f"{1000 * sum(tiempos) / len(tiempos):>8.2f} | {incorrectas:>11}")
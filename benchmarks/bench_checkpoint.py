@@ -0,0 +1,138 @@
+# === Benchmark: tamaño y latencia de los checkpoints según crece el historial ===
+# Compara dos formas de persistir la conversación del ejemplo 02 con SqliteSaver:
+#
+# - "historial en el estado": la lista de mensajes es un canal del estado
+#   (reducer operator.add), así que cada checkpoint la vuelve a serializar entera.
+# - "02 (deltas)": el estado solo lleva el último input y un contador; cada paso
+#   añade sus mensajes a la tabla `historial` de solo inserción.
+#
+# Para cada longitud de historial mide los bytes escritos por turno, la latencia
+# por turno y lo que cuesta retomar el hilo (abrir el checkpointer y get_state).
+#
+# Uso: python benchmarks/bench_checkpoint.py [--longitudes 100,1000,10000] [--turnos 20]
+
+import argparse
+import builtins
+import contextlib
+import io
+import operator
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+from comun import cargar_ejemplo
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph, END
+from memoria_sqlite import inicializar_db, ColaEscritura
+from recursos import Recursos
+
+ejemplo = cargar_ejemplo(2)
+
+
+class EstadoCompleto(TypedDict, total=False):
+    historial: Annotated[list, operator.add]
+    ultimo_input: str
+
+
+def grafo_historial_en_estado(checkpointer):
+    """El mismo bucle que el ejemplo 02, con el historial dentro del estado."""
+    def nodo_input(state):
+        texto = input("👤 Usuario: ")
+        if ejemplo.es_salida(texto):
+            return {"ultimo_input": texto}
+        return {"ultimo_input": texto, "historial": [{"role": "user", "content": texto}]}
+
+    def nodo_llm(state):
+        respuesta = f"🤖 LLM responde a: '{state['ultimo_input']}' ({len(state['historial'])} turnos)."
+        return {"historial": [{"role": "assistant", "content": respuesta}]}
+
+    workflow = StateGraph(EstadoCompleto)
+    workflow.add_node("input", nodo_input)
+    workflow.add_node("llm", nodo_llm)
+    workflow.set_entry_point("input")
+    workflow.add_conditional_edges(
+        "input", lambda state: END if ejemplo.es_salida(state.get("ultimo_input", "")) else "llm",
+        {"llm": "llm", END: END},
+    )
+    workflow.add_edge("llm", "input")
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def bytes_guardados(conn):
+    """Bytes de checkpoints y escrituras pendientes guardados hasta ahora."""
+    checkpoints = conn.execute("SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints")
+    escrituras = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes")
+    historial = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(contenido) + LENGTH(rol)), 0) FROM historial"
+    ) if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'historial'").fetchone() else [(0,)]
+    return next(iter(checkpoints))[0] + next(iter(escrituras))[0] + next(iter(historial))[0]
+
+
+def conversar(grafo, config, turnos, desde):
+    """Ejecuta `turnos` turnos en una sola invocación del grafo (input simulado)."""
+    textos = iter([f"mensaje {desde + i} del usuario" for i in range(turnos)] + ["exit"])
+    original = builtins.input
+    builtins.input = lambda _="": next(textos)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            grafo.invoke({}, config)
+    finally:
+        builtins.input = original
+
+
+def medir(variante, longitudes, turnos, directorio):
+    ruta = os.path.join(directorio, f"{variante}.db")
+    conn = sqlite3.connect(ruta, check_same_thread=False)
+    recursos, cola = Recursos(), None
+    if variante == "deltas":
+        inicializar_db(ruta).close()
+        cola = recursos.cola = ColaEscritura(ruta)
+        grafo = ejemplo.construir_grafo(SqliteSaver(conn))
+    else:
+        grafo = grafo_historial_en_estado(SqliteSaver(conn))
+    config = recursos.config("bench", recursion_limit=ejemplo.LIMITE_PASOS)
+
+    resultados, mensajes = [], 0
+    for longitud in longitudes:
+        # Rellena hasta `longitud` mensajes (cada turno son dos)
+        conversar(grafo, config, (longitud - mensajes) // 2, mensajes)
+        if cola:
+            cola.flush()
+        mensajes = longitud
+        antes = bytes_guardados(conn)
+        inicio = time.perf_counter()
+        conversar(grafo, config, turnos, mensajes)
+        if cola:
+            cola.flush()
+        por_turno = (time.perf_counter() - inicio) / turnos
+        escritos = (bytes_guardados(conn) - antes) / turnos
+        mensajes += 2 * turnos
+        # Retomar: checkpointer nuevo (como un proceso nuevo) y leer el estado del hilo
+        inicio = time.perf_counter()
+        otra = sqlite3.connect(ruta, check_same_thread=False)
+        grafo_nuevo = ejemplo.construir_grafo(SqliteSaver(otra)) if variante == "deltas" else \
+            grafo_historial_en_estado(SqliteSaver(otra))
+        grafo_nuevo.get_state(config)
+        retomar = time.perf_counter() - inicio
+        otra.close()
+        resultados.append((longitud, escritos, 1000 * por_turno, 1000 * retomar))
+    if cola:
+        cola.cerrar()
+    conn.close()
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de checkpoints del ejemplo 02")
+    parser.add_argument("--longitudes", default="100,1000,10000", help="Mensajes en el historial")
+    parser.add_argument("--turnos", type=int, default=20, help="Turnos medidos en cada longitud")
+    args = parser.parse_args()
+    longitudes = [int(n) for n in args.longitudes.split(",")]
+
+    print(f"{'variante':>22} | {'mensajes':>8} | {'bytes/turno':>11} | {'ms/turno':>8} | {'retomar ms':>10}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for variante, nombre in (("estado", "historial en el estado"), ("deltas", "02 (deltas)")):
+            for longitud, escritos, por_turno, retomar in medir(variante, longitudes, args.turnos, directorio):
+                print(f"{nombre:>22} | {longitud:>8} | {escritos:>11.0f} | {por_turno:>8.2f} | {retomar:>10.2f}")
@@ -0,0 +1,139 @@
+# === Benchmark: retención y compactación de la memoria del ejemplo 06 ===
+# Genera un historial con la forma de uno de larga duración (mensajes de hace
+# más de `--dias` días y respuestas del agente casi siempre iguales), con los
+# mensajes de usuario en FAISS, y mide:
+#
+# - tamaño de la base SQLite y del snapshot FAISS antes y después de compactar,
+# - latencia de la consulta de 06 (BM25 + FAISS + textos de SQLite) y de leer
+#   la ventana del historial, antes, durante y después de la compactación,
+# - latencia del commit de la cola de escritura sin compactar y mientras se
+#   compacta (urgente, como nodo_input de 06: sin esperar a la ventana).
+#
+# La compactación corre en su hilo (Compactador) mientras otro hilo consulta y
+# otro escribe, como el grafo en marcha.
+#
+# Uso: python benchmarks/bench_compactacion.py [--turnos 50000] [--dias 90] [--max-mensajes 2000]
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from comun import ModeloSimulado, cargar_ejemplo, percentil
+from compactacion import Compactador
+from memoria_sqlite import inicializar_db, ColaEscritura, buscar_lexico, guardar_mensaje, obtener_ventana
+from memoria_vectorial import cargar_memoria
+
+SESIONES = 20
+RESPUESTAS = ["📊 Precio BTC: 42k (ejemplo).", "☀️ Hoy soleado con 25°C (ejemplo).", "🤖 Gracias por tu consulta."]
+TEMAS = ["precio de BTC", "clima en Madrid", "pedido {}", "factura de la luz", "contraseña de mi cuenta"]
+
+
+def poblar(ruta_db, ruta_faiss, modelo, turnos, dias, semilla=0):
+    """Turnos de usuario + agente; el 60 % con más de `dias` días y un 20 % de preguntas repetidas."""
+    rng = random.Random(semilla)
+    ahora = time.time()
+    conn = inicializar_db(ruta_db)
+    filas = []
+    for i in range(turnos):
+        sesion = f"s{i % SESIONES}"
+        creado = ahora - (dias + 30 if i < 0.6 * turnos else rng.uniform(0, dias)) * 86400
+        tema = rng.choice(TEMAS).format(rng.randrange(10 ** 5))
+        pregunta = f"¿Qué hay del {tema}?" if rng.random() < 0.2 else f"consulta {i} sobre {tema}"
+        filas += [("usuario", pregunta, sesion, creado), ("agente", rng.choice(RESPUESTAS), sesion, creado)]
+    with conn:
+        conn.executemany("INSERT INTO historial (rol, contenido, session_id, creado_en) VALUES (?, ?, ?, ?)", filas)
+    memoria = cargar_memoria(ruta_faiss, modelo.get_sentence_embedding_dimension())
+    memoria.sincronizar(conn, modelo, lote=5000)
+    memoria.guardar()
+    conn.close()
+    return memoria
+
+
+def consultar(ejemplo, memoria, conn, vector, sesion):
+    """Lo que hace nodo_llm de 06 (sin codificar: el vector ya está hecho) y la ventana de nodo_memoria."""
+    lexicos = buscar_lexico(conn, "¿qué precio tiene BTC?", sesion, ejemplo.CANDIDATOS, rol="usuario")
+    ejemplo.buscar_hibrido(memoria, conn, vector, lexicos, sesion, 2)
+    obtener_ventana(conn, sesion)
+
+
+def medir_consultas(ejemplo, memoria, ruta_db, vectores, mientras=None):
+    """Latencias de consulta en bucle: `len(vectores)` consultas o, con `mientras`, hasta que termine."""
+    conn = sqlite3.connect(ruta_db)
+    tiempos, i = [], 0
+    while (mientras is None and i < len(vectores)) or (mientras is not None and mientras.is_alive()):
+        inicio = time.perf_counter()
+        consultar(ejemplo, memoria, conn, vectores[i % len(vectores)], f"s{i % SESIONES}")
+        tiempos.append(time.perf_counter() - inicio)
+        i += 1
+    conn.close()
+    return tiempos
+
+
+def escribir_mientras(ruta_db, hilo, tiempos):
+    """Un mensaje cada 10 ms por la cola de escritura; mide lo que tarda en confirmarse."""
+    cola = ColaEscritura(ruta_db)
+    while hilo.is_alive():
+        inicio = time.perf_counter()
+        guardar_mensaje(cola, "usuario", "mensaje nuevo durante la compactación", "s0", urgente=True).result()
+        tiempos.append(time.perf_counter() - inicio)
+        time.sleep(0.01)
+    cola.cerrar()
+
+
+def fila(nombre, tiempos):
+    print(f"{nombre:>30} | {len(tiempos):>9} | {1000 * percentil(tiempos, 50):>7.2f} | "
+          f"{1000 * percentil(tiempos, 99):>7.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retención y compactación de la memoria del ejemplo 06")
+    parser.add_argument("--turnos", type=int, default=50_000)
+    parser.add_argument("--dias", type=float, default=90)
+    parser.add_argument("--max-mensajes", type=int, default=2000, help="Mensajes que se conservan por sesión")
+    parser.add_argument("--consultas", type=int, default=500)
+    args = parser.parse_args()
+
+    ejemplo = cargar_ejemplo(6)
+    modelo = ModeloSimulado()
+    vectores = modelo.encode([f"consulta {i} sobre {TEMAS[i % 2]}" for i in range(args.consultas)])
+    vectores = vectores.reshape(len(vectores), 1, -1)
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_db, ruta_faiss = os.path.join(directorio, "06.db"), os.path.join(directorio, "06.faiss")
+        memoria = poblar(ruta_db, ruta_faiss, modelo, args.turnos, args.dias)
+        conn = sqlite3.connect(ruta_db)
+        antes = (conn.execute("SELECT count(*) FROM historial").fetchone()[0], os.path.getsize(ruta_db),
+                 os.path.getsize(ruta_faiss))
+        conn.close()
+
+        print(f"{'consulta de 06 + ventana':>30} | {'consultas':>9} | {'ms p50':>7} | {'ms p99':>7}")
+        fila("antes", medir_consultas(ejemplo, memoria, ruta_db, vectores))
+        reposo, escrituras_reposo = threading.Thread(target=time.sleep, args=(2,)), []
+        reposo.start()
+        escribir_mientras(ruta_db, reposo, escrituras_reposo)
+        compactador = Compactador(ruta_db, memoria, args.dias, args.max_mensajes, informe=lambda _: None)
+        hilo = threading.Thread(target=compactador.ejecutar)
+        escrituras = []
+        hilo.start()
+        escritor = threading.Thread(target=escribir_mientras, args=(ruta_db, hilo, escrituras))
+        escritor.start()
+        fila("durante la compactación", medir_consultas(ejemplo, memoria, ruta_db, vectores, mientras=hilo))
+        hilo.join()
+        escritor.join()
+        fila("después", medir_consultas(ejemplo, memoria, ruta_db, vectores))
+        fila("commit sin compactar", escrituras_reposo)
+        fila("commit durante la compactación", escrituras)
+
+        e = compactador.ultima
+        conn = sqlite3.connect(ruta_db)
+        despues = (conn.execute("SELECT count(*) FROM historial").fetchone()[0], os.path.getsize(ruta_db),
+                   os.path.getsize(ruta_faiss))
+        conn.close()
+        print(f"\nCompactación en {e['segundos']:.1f} s: {e['caducados']} caducados, {e['plegados']} plegados, "
+              f"{e['vectores']} vectores descartados\n")
+        print(f"{'':>12} | {'mensajes':>9} | {'MB SQLite':>9} | {'MB FAISS':>9}")
+        for nombre, (mensajes, sqlite_bytes, faiss_bytes) in (("antes", antes), ("después", despues)):
+            print(f"{nombre:>12} | {mensajes:>9} | {sqlite_bytes / 1e6:>9.1f} | {faiss_bytes / 1e6:>9.1f}")
@@ -0,0 +1,97 @@
+# === Benchmark: memoria por mensaje y recall según la codificación de los vectores ===
+# Compara cómo guardaba 06 cada mensaje (texto en un dict de Python y vector
+# float32 en un IndexIDMap2 Flat) con el índice que solo guarda ids de fila y
+# vectores en float32, float16, SQ8 o PQ, para búsqueda exacta, HNSW e IVF.
+#
+# Para cada combinación mide los bytes por mensaje del índice (serializado: lo
+# que ocupa en disco y, una vez cargado, en RAM), el recall@k respecto a la
+# búsqueda exacta en float32 y la latencia por consulta.
+#
+# Uso: python benchmarks/bench_cuantizacion.py [--mensajes 100000] [--dimension 384] [--k 10] [--pq-m 48,96]
+
+import argparse
+import random
+import sys
+import time
+from array import array
+
+import faiss
+import numpy as np
+
+from bench_ann import corpus_sintetico
+from memoria_vectorial import IndiceAdaptativo
+
+COMBINACIONES = [
+    ("exacto", "float32"), ("exacto", "fp16"), ("exacto", "sq8"), ("exacto", "pq"),
+    ("hnsw", "float32"), ("hnsw", "fp16"), ("hnsw", "sq8"), ("hnsw", "pq"),
+    ("ivf", "float32"), ("ivf", "sq8"), ("ivf", "pq"),
+]  # "pq" se repite con cada valor de --pq-m
+
+
+def bytes_textos(n, semilla=0):
+    """Bytes por mensaje de guardar los textos en un dict {id: texto} (mensajes de 40-160 caracteres)."""
+    rng = random.Random(semilla)
+    palabras = "hola qué precio tiene BTC cómo estará el clima mañana en Madrid cuéntame algo sobre".split()
+    textos = {}
+    for i in range(min(n, 20_000)):  # Con una muestra basta para el coste medio
+        texto = ""
+        while len(texto) < rng.randint(40, 160):
+            texto += rng.choice(palabras) + " "
+        textos[i + 1] = texto.strip()
+    total = sys.getsizeof(textos) + sum(sys.getsizeof(t) + sys.getsizeof(i) for i, t in textos.items())
+    return total / len(textos)
+
+
+def recall_y_latencia(indice, consultas, verdad, k):
+    aciertos = 0
+    inicio = time.perf_counter()
+    for consulta, esperado in zip(consultas, verdad):
+        _, I = indice.search(consulta.reshape(1, -1), k)
+        aciertos += len(set(I[0]) & set(esperado))
+    return aciertos / (len(consultas) * k), 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria por mensaje y recall según la codificación")
+    parser.add_argument("--mensajes", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=384)  # all-MiniLM-L6-v2
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", default="48,96", help="Subvectores de PQ (bytes por vector) a probar")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # Una consulta = un hilo, como en el grafo
+    n, d, k = args.mensajes, args.dimension, args.k
+    todos = corpus_sintetico(n + args.consultas, d)
+    vectores, consultas = todos[:n], todos[n:]
+    ids = np.arange(1, n + 1, dtype="int64")
+
+    exacto = faiss.IndexFlatL2(d)
+    exacto.add(vectores)
+    _, verdad = exacto.search(consultas, k)
+    verdad = verdad + 1  # Posiciones -> ids de fila
+
+    # Antes: IndexIDMap2 Flat (el mapa inverso de ids no se serializa y no se cuenta) + textos en RAM
+    antes = faiss.IndexIDMap2(faiss.IndexFlatL2(d))
+    antes.add_with_ids(vectores, ids)
+    por_texto = bytes_textos(n)
+    indice_antes = faiss.serialize_index(antes).nbytes / n
+    # ids_por_sesion: antes un int de Python en una lista, ahora 8 bytes en un array("q")
+    ids_sesion_antes, ids_sesion = sys.getsizeof(n) + 8, array("q").itemsize
+    print(f"{n} mensajes de dimensión {d}, recall@{k} respecto a la búsqueda exacta en float32\n")
+    print(f"{'índice':>8} | {'codificación':>12} | {'B/msg índice':>12} | {'B/msg total':>11} | "
+          f"{f'recall@{k}':>9} | {'ms/consulta':>11}")
+    recall, ms = recall_y_latencia(antes, consultas, verdad, k)
+    print(f"{'antes':>8} | {'float32':>12} | {indice_antes:>12.0f} | "
+          f"{indice_antes + por_texto + ids_sesion_antes:>11.0f} | {recall:>9.3f} | {ms:>11.3f}")
+
+    for tipo, codificacion in COMBINACIONES:
+        for pq_m in [int(m) for m in args.pq_m.split(",")] if codificacion == "pq" else [None]:
+            # umbral = n: se promociona (y se entrena SQ8/PQ) con el corpus completo
+            indice = IndiceAdaptativo(d, tipo=tipo, umbral=n, codificacion=codificacion, pq_m=pq_m)
+            indice.add_with_ids(vectores, ids)
+            por_mensaje = faiss.serialize_index(indice.indice).nbytes / n
+            recall, ms = recall_y_latencia(indice, consultas, verdad, k)
+            nombre = f"pq (m={pq_m})" if pq_m else codificacion
+            print(f"{tipo:>8} | {nombre:>12} | {por_mensaje:>12.0f} | {por_mensaje + ids_sesion:>11.0f} | "
+                  f"{recall:>9.3f} | {ms:>11.3f}")
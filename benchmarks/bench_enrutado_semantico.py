@@ -0,0 +1,130 @@
+# === Benchmark: enrutado semántico con centroides frente a palabras clave ===
+# Mide la precisión de enrutado sobre un conjunto de preguntas etiquetadas (que
+# no están entre las frases de ejemplo) para el enrutador de palabras clave y
+# para el semántico con varios umbrales, y la latencia de decidir la ruta a
+# partir de un vector ya calculado con 10, 100 y 1000 rutas.
+#
+# También mide `clasificar_todas`, que es lo que usa 06 para despachar: con
+# cada umbral y margen, cuántas preguntas de una sola intención se reparten
+# entre varias rutas (deberían ser 0) y en cuántas de dos intenciones salen
+# las dos rutas.
+#
+# Uso: python benchmarks/bench_enrutado_semantico.py [--umbrales 0.3,0.4,0.5,0.6] [--margenes 0,0.02,0.05,0.1,1] [--real]
+
+import argparse
+import time
+
+import numpy as np
+
+from comun import ModeloSimulado, percentil
+from embeddings import ModeloPerezoso
+from enrutador import ENRUTADOR, EJEMPLOS, EnrutadorSemantico
+
+# (pregunta, ruta esperada)
+ETIQUETADAS = [
+    ("¿qué precio tiene BTC?", "finanzas"),
+    ("¿cuánto cuesta un ethereum?", "finanzas"),
+    ("¿cuánto vale el dólar hoy?", "finanzas"),
+    ("¿a cuánto cotiza el euro?", "finanzas"),
+    ("¿cómo va la bolsa de Madrid?", "finanzas"),
+    ("¿me conviene comprar acciones de Tesla?", "finanzas"),
+    ("¿ha bajado el bitcoin?", "finanzas"),
+    ("dime el precio del oro", "finanzas"),
+    ("¿qué clima hace en Sevilla?", "clima"),
+    ("¿lloverá esta noche?", "clima"),
+    ("¿qué temperatura hace en Bilbao?", "clima"),
+    ("¿hace calor hoy?", "clima"),
+    ("¿va a nevar el domingo?", "clima"),
+    ("¿saco el paraguas?", "clima"),
+    ("previsión del tiempo para mañana", "clima"),
+    ("¿estará nublado el lunes?", "clima"),
+    ("cuéntame un chiste", "general"),
+    ("hola, ¿quién eres?", "general"),
+    ("¿qué puedes hacer?", "general"),
+    ("recomiéndame un libro", "general"),
+    ("gracias por la ayuda", "general"),
+    ("¿cómo se dice hola en francés?", "general"),
+]
+
+# (pregunta, rutas esperadas): dos intenciones en la misma pregunta
+VARIAS_INTENCIONES = [
+    ("¿cuánto vale el bitcoin y va a llover mañana?", {"finanzas", "clima"}),
+    ("¿a cuánto cotiza el euro y qué temperatura hace en Madrid?", {"finanzas", "clima"}),
+    ("¿ha subido el oro? ¿y hará sol el sábado?", {"finanzas", "clima"}),
+    ("¿cómo va la bolsa hoy y necesito paraguas?", {"finanzas", "clima"}),
+    ("dime la cotización del ethereum y la previsión del tiempo", {"finanzas", "clima"}),
+    ("¿qué tiempo hace en Bilbao y cuánto cuesta un dólar?", {"finanzas", "clima"}),
+    ("¿hace frío fuera? ¿y cómo van las acciones de Tesla?", {"finanzas", "clima"}),
+    ("¿lloverá el domingo y conviene invertir en criptomonedas?", {"finanzas", "clima"}),
+]
+
+
+def precision(rutas):
+    return sum(r == esperada for r, (_, esperada) in zip(rutas, ETIQUETADAS)) / len(ETIQUETADAS)
+
+
+def reparto(semantico, vectores_una, vectores_varias):
+    """(% de una intención repartidas en varias rutas, % de dos intenciones con las dos rutas)."""
+    una = [semantico.clasificar_todas(t, v) for (t, _), v in zip(ETIQUETADAS, vectores_una)]
+    varias = [semantico.clasificar_todas(t, v) for (t, _), v in zip(VARIAS_INTENCIONES, vectores_varias)]
+    repartidas = sum(len(rutas) > 1 for rutas in una) / len(una)
+    recuperadas = sum(esperadas <= set(rutas) for rutas, (_, esperadas) in zip(varias, VARIAS_INTENCIONES))
+    return repartidas, recuperadas / len(varias)
+
+
+def latencia_centroides(rutas, dimension, consultas=2000):
+    """µs (media y p99) de decidir una ruta con `rutas` centroides sintéticos."""
+    azar = np.random.default_rng(0)
+    ejemplos = {f"ruta{i}": [f"ejemplo {i}"] for i in range(rutas)}
+    enrutador = EnrutadorSemantico(None, ejemplos, umbral=0.0)
+    centroides = azar.standard_normal((rutas, dimension)).astype("float32")
+    enrutador._centroides = centroides / np.linalg.norm(centroides, axis=1, keepdims=True)
+    vectores = azar.standard_normal((consultas, dimension)).astype("float32")
+    tiempos = []
+    for vector in vectores:
+        inicio = time.perf_counter()
+        enrutador.clasificar("", vector)
+        tiempos.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    enrutador.clasificar_lote([""] * consultas, vectores)
+    lote = (time.perf_counter() - inicio) / consultas
+    return 1e6 * sum(tiempos) / len(tiempos), 1e6 * percentil(tiempos, 99), 1e6 * lote
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de enrutado semántico")
+    parser.add_argument("--umbrales", default="0.3,0.4,0.5,0.6")
+    parser.add_argument("--margenes", default="0,0.02,0.05,0.1,1", help="1 equivale a no exigir margen")
+    parser.add_argument("--rutas", default="10,100,1000")
+    parser.add_argument("--real", action="store_true", help="Usa all-MiniLM-L6-v2 en lugar del modelo simulado")
+    args = parser.parse_args()
+
+    modelo = ModeloPerezoso() if args.real else ModeloSimulado()
+    textos = [t for t, _ in ETIQUETADAS]
+    vectores = np.asarray(modelo.encode(textos), dtype="float32")  # En 06 ya vienen de la búsqueda
+
+    print(f"{'enrutador':>22} | {'precisión':>9} | {'por similitud':>13}")
+    print(f"{'palabras clave':>22} | {precision([ENRUTADOR.clasificar(t) for t in textos]):>9.0%} | {'-':>13}")
+    for umbral in (float(u) for u in args.umbrales.split(",")):
+        semantico = EnrutadorSemantico(modelo, EJEMPLOS, umbral=umbral, respaldo=ENRUTADOR)
+        rutas = semantico.clasificar_lote(textos, vectores)
+        print(f"{f'semántico umbral {umbral:.2f}':>22} | {precision(rutas):>9.0%} | "
+              f"{semantico.semanticas / len(textos):>13.0%}")
+
+    vectores_varias = np.asarray(modelo.encode([t for t, _ in VARIAS_INTENCIONES]), dtype="float32")
+    print(f"\n{'clasificar_todas':>22} | {'margen':>6} | {'1 intención en varias rutas':>27} | "
+          f"{'2 intenciones completas':>23}")
+    print(f"{'palabras clave':>22} | {'-':>6} | "
+          f"{sum(len(ENRUTADOR.clasificar_todas(t)) > 1 for t in textos) / len(textos):>27.0%} | "
+          f"{sum(e <= set(ENRUTADOR.clasificar_todas(t)) for t, e in VARIAS_INTENCIONES) / len(VARIAS_INTENCIONES):>23.0%}")
+    for umbral in (float(u) for u in args.umbrales.split(",")):
+        for margen in (float(m) for m in args.margenes.split(",")):
+            semantico = EnrutadorSemantico(modelo, EJEMPLOS, umbral=umbral, respaldo=ENRUTADOR, margen=margen)
+            repartidas, recuperadas = reparto(semantico, vectores, vectores_varias)
+            print(f"{f'umbral {umbral:.2f}':>22} | {margen:>6.2f} | {repartidas:>27.0%} | {recuperadas:>23.0%}")
+
+    dimension = modelo.get_sentence_embedding_dimension()
+    print(f"\n{'rutas':>6} | {'µs/consulta':>11} | {'p99 µs':>7} | {'µs/consulta en lote':>19}")
+    for n in (int(r) for r in args.rutas.split(",")):
+        media, p99, lote = latencia_centroides(n, dimension)
+        print(f"{n:>6} | {media:>11.1f} | {p99:>7.1f} | {lote:>19.2f}")
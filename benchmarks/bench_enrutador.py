@@ -0,0 +1,88 @@
+# === Benchmark: enrutador compilado frente a la cadena if/elif ===
+# Genera tablas de 10, 100 y 1000 rutas sintéticas (varias palabras clave por
+# ruta, con prefijos compartidos) y compara la cadena original, que vuelve a
+# pasar el texto a minúsculas en cada rama, con el Enrutador compilado.
+# Comprueba además que ambos eligen la misma ruta para cada mensaje.
+#
+# Uso: python benchmarks/bench_enrutador.py [--rutas 10,100,1000] [--mensajes 2000]
+
+import argparse
+import random
+import time
+
+import comun  # noqa: F401  (añade la raíz del proyecto al path)
+from enrutador import Enrutador, Ruta
+
+SILABAS = ["pre", "cio", "cli", "ma", "sal", "do", "fac", "tu", "ra", "en", "vi", "o", "re", "ser", "va", "ta"]
+RELLENO = "hola quiero saber algo sobre mi cuenta y también sobre otras cosas del servicio".split()
+
+
+def tabla_sintetica(n, palabras_por_ruta=3, semilla=0):
+    """`n` rutas con palabras clave inventadas (muchas comparten prefijo)."""
+    azar = random.Random(semilla)
+    usadas, rutas = set(), []
+    for i in range(n):
+        palabras = []
+        while len(palabras) < palabras_por_ruta:
+            palabra = "".join(azar.choice(SILABAS) for _ in range(azar.randint(3, 5)))
+            if palabra not in usadas:
+                usadas.add(palabra)
+                palabras.append(palabra)
+        rutas.append(Ruta(f"ruta{i}", palabras=palabras))
+    return rutas
+
+
+def mensajes_sinteticos(rutas, n, semilla=1):
+    """Mensajes realistas: la mitad sin intención conocida, el resto con una palabra clave."""
+    azar = random.Random(semilla)
+    mensajes = []
+    for _ in range(n):
+        palabras = azar.sample(RELLENO, 8)
+        if azar.random() < 0.5:
+            palabras.insert(azar.randint(0, 8), azar.choice(azar.choice(rutas).palabras).upper())
+        mensajes.append(" ".join(palabras))
+    return mensajes
+
+
+def cadena_if_elif(rutas, por_defecto="general"):
+    """Emula la cadena de nodo_llm: una rama por palabra, con .lower() en cada una."""
+    def clasificar(pregunta):
+        for ruta in rutas:
+            for palabra in ruta.palabras:
+                if palabra in pregunta.lower():
+                    return ruta.nombre
+        return por_defecto
+    return clasificar
+
+
+def medir(clasificar, mensajes, repeticiones=3):
+    """Mejor tiempo medio por mensaje (µs) de varias pasadas."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for mensaje in mensajes:
+            clasificar(mensaje)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return 1e6 * mejor / len(mensajes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del enrutador de intenciones")
+    parser.add_argument("--rutas", default="10,100,1000")
+    parser.add_argument("--mensajes", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'rutas':>6} | {'compilar ms':>11} | {'if/elif µs':>10} | {'enrutador µs':>12} | {'mejora':>7}")
+    for n in (int(r) for r in args.rutas.split(",")):
+        rutas = tabla_sintetica(n)
+        mensajes = mensajes_sinteticos(rutas, args.mensajes)
+        inicio = time.perf_counter()
+        enrutador = Enrutador(rutas)
+        compilar = 1000 * (time.perf_counter() - inicio)
+        cadena = cadena_if_elif(rutas)
+        distintos = sum(cadena(m) != enrutador.clasificar(m) for m in mensajes)
+        if distintos:
+            raise SystemExit(f"❌ {distintos} mensajes enrutados de forma distinta con {n} rutas")
+        lineal = medir(cadena, mensajes)
+        compilado = medir(enrutador.clasificar, mensajes)
+        print(f"{n:>6} | {compilar:>11.1f} | {lineal:>10.1f} | {compilado:>12.1f} | {lineal / compilado:>6.1f}x")
@@ -0,0 +1,88 @@
+# === Benchmark: escritura de mensajes en SQLite ===
+# Compara filas/segundo de `guardar_mensaje` con un commit por INSERT (versión
+# original de los ejemplos 05 y 06) frente a la cola de escritura con commit agrupado.
+#
+# Uso: python benchmarks/bench_escritura.py [--mensajes 2000] [--hilos 4]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memoria_sqlite import inicializar_db, ColaEscritura, guardar_mensaje
+
+
+def crear_db_original(ruta):
+    """Crea la tabla como lo hacía la versión original (modo de journal por defecto)."""
+    conn = sqlite3.connect(ruta, check_same_thread=False)
+    conn.execute("CREATE TABLE historial (id INTEGER PRIMARY KEY AUTOINCREMENT, rol TEXT, contenido TEXT)")
+    conn.commit()
+    return conn
+
+
+def guardar_mensaje_original(conn, rol, contenido):
+    """Versión original: un INSERT y un commit por mensaje."""
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO historial (rol, contenido) VALUES (?, ?)", (rol, contenido))
+    conn.commit()
+
+
+def repartir(total, hilos, trabajo):
+    """Lanza `hilos` productores que se reparten `total` mensajes y mide el tiempo."""
+    por_hilo = total // hilos
+    inicio = time.perf_counter()
+    productores = [threading.Thread(target=trabajo, args=(por_hilo,)) for _ in range(hilos)]
+    for p in productores:
+        p.start()
+    for p in productores:
+        p.join()
+    return por_hilo * hilos, time.perf_counter() - inicio
+
+
+def medir_original(directorio, total, hilos):
+    conn = crear_db_original(os.path.join(directorio, "original.db"))
+    candado = threading.Lock()  # La conexión compartida no admite escrituras concurrentes
+
+    def trabajo(n):
+        for i in range(n):
+            with candado:
+                guardar_mensaje_original(conn, "usuario", f"mensaje {i}")
+
+    filas, segundos = repartir(total, hilos, trabajo)
+    conn.close()
+    return filas / segundos
+
+
+def medir_cola(directorio, total, hilos):
+    ruta = os.path.join(directorio, "cola.db")
+    inicializar_db(ruta).close()
+    cola = ColaEscritura(ruta)
+
+    def trabajo(n):
+        for i in range(n):
+            guardar_mensaje(cola, "usuario", f"mensaje {i}")
+            if i % 3 == 2:
+                cola.flush()  # Un flush durable por turno (~3 mensajes por turno)
+
+    filas, segundos = repartir(total, hilos, trabajo)
+    cola.cerrar()
+    return filas / segundos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escritura en SQLite")
+    parser.add_argument("--mensajes", type=int, default=2000)
+    parser.add_argument("--hilos", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        original = medir_original(directorio, args.mensajes, args.hilos)
+        agrupado = medir_cola(directorio, args.mensajes, args.hilos)
+
+    print(f"=== Escritura de {args.mensajes} mensajes con {args.hilos} hilos ===")
+    print(f"Commit por mensaje : {original:10.0f} filas/s")
+    print(f"Cola + WAL agrupado: {agrupado:10.0f} filas/s  (x{agrupado / original:.1f})")
@@ -0,0 +1,118 @@
+# === Benchmark: tamaño y coste de copia del estado por paso ===
+# Compara el estado de los ejemplos 05/06 tal y como era (con la conexión, la
+# cola, el modelo y el índice FAISS dentro) con el estado actual,
+# que solo lleva datos de la conversación porque los recursos llegan en config.
+#
+# Para cada uno mide el tamaño alcanzable desde el estado, lo que cuesta una
+# copia profunda y una serialización con el serializador de los checkpointers
+# de LangGraph, y el tiempo por turno del grafo de 05 con un checkpointer en
+# memoria (que serializa el estado en cada paso).
+#
+# Uso: python benchmarks/bench_estado.py [--mensajes 10000] [--real]
+
+import argparse
+import contextlib
+import copy
+import gc
+import io
+import itertools
+import os
+import sys
+import tempfile
+import time
+import types
+
+import faiss
+
+from comun import ModeloSimulado, cargar_ejemplo
+from embeddings import CacheEmbeddings, ModeloPerezoso, PlanificadorEmbeddings
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from memoria_sqlite import inicializar_db, ColaEscritura, PoolConexiones
+from memoria_vectorial import MemoriaVectorial
+from recursos import Recursos
+
+
+def tamano_profundo(objeto):
+    """Bytes alcanzables desde `objeto` (los índices FAISS cuentan lo que ocupan serializados)."""
+    vistos, total, pila = set(), 0, [objeto]
+    while pila:
+        actual = pila.pop()
+        if id(actual) in vistos or isinstance(actual, (type, types.ModuleType, types.FunctionType)):
+            continue
+        vistos.add(id(actual))
+        if isinstance(actual, faiss.Index):
+            total += faiss.serialize_index(actual).nbytes
+            continue
+        total += sys.getsizeof(actual)
+        pila.extend(gc.get_referents(actual))
+    return total
+
+
+def medir_tiempo(funcion, repeticiones=20):
+    """µs por llamada, o el nombre del error si no se puede."""
+    try:
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        return f"{1e6 * (time.perf_counter() - inicio) / repeticiones:.0f}"
+    except Exception as error:
+        return f"✗ {type(error).__name__}"
+
+
+def memoria_rellena(modelo, mensajes):
+    dimension = modelo.get_sentence_embedding_dimension()
+    memoria = MemoriaVectorial(dimension)
+    textos = [f"mensaje número {i} de la conversación" for i in range(mensajes)]
+    for inicio in range(0, mensajes, 1000):
+        bloque = textos[inicio:inicio + 1000]
+        ids = list(range(inicio + 1, inicio + 1 + len(bloque)))
+        memoria.agregar(ids, modelo.encode(bloque), ["s"] * len(bloque))
+    return memoria
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tamaño y coste de copia del estado")
+    parser.add_argument("--mensajes", type=int, default=10_000, help="Mensajes indexados en la memoria vectorial")
+    parser.add_argument("--real", action="store_true", help="Usa all-MiniLM-L6-v2 en lugar del modelo simulado")
+    args = parser.parse_args()
+
+    serializador = JsonPlusSerializer()
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "estado.db")
+        inicializar_db(ruta).close()
+        modelo = ModeloPerezoso() if args.real else ModeloSimulado()
+        recursos = Recursos(db=PoolConexiones(ruta), cola=ColaEscritura(ruta))
+        recursos.model = CacheEmbeddings(PlanificadorEmbeddings(modelo))
+        recursos.memoria = memoria_rellena(modelo, args.mensajes)
+        conversacion = {"session_id": "s", "ultimo_id_visto": 42, "ultimo_input": "¿qué precio tiene BTC?", "ruta": "finanzas"}
+
+        estados = {
+            "antes (recursos en el estado)": {**conversacion, **{n: getattr(recursos, n) for n in ("db", "cola", "model", "memoria")}},
+            "después (recursos en config)": conversacion,
+        }
+        print(f"{'estado':>30} | {'tamaño KB':>10} | {'deepcopy µs':>13} | {'serializar µs':>14} | {'bytes':>6}")
+        for nombre, estado in estados.items():
+            try:
+                serializado = str(len(serializador.dumps_typed(estado)[1]))
+            except Exception:
+                serializado = "✗"
+            print(f"{nombre:>30} | {tamano_profundo(estado) / 1024:>10.1f} | "
+                  f"{medir_tiempo(lambda: copy.deepcopy(estado)):>13} | "
+                  f"{medir_tiempo(lambda: serializador.dumps_typed(estado)):>14} | {serializado:>6}")
+
+        # Turno completo de 05 con un checkpointer, que serializa el estado en cada paso
+        ejemplo = cargar_ejemplo(5)
+        grafo = ejemplo.construir_grafo(checkpointer=InMemorySaver())
+        print(f"\n{'turno de 05 con checkpointer':>30} | {'ms/turno':>10}")
+        hilos = itertools.count()  # Un hilo de checkpoints por turno
+        for nombre, estado in estados.items():
+
+            def ejecutar():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    grafo.invoke(dict(estado), recursos.config(f"t{next(hilos)}"))
+
+            resultado = medir_tiempo(ejecutar)
+            ms = f"{float(resultado) / 1000:.2f}" if resultado[0].isdigit() else resultado
+            print(f"{nombre:>30} | {ms:>10}")
+        recursos.cerrar()
@@ -0,0 +1,144 @@
+# === Benchmark: búsqueda híbrida (BM25 + FAISS) vs solo vectorial ===
+# Corpus sintético de mensajes de usuario: una frase de un tema más una entidad
+# exacta (un ticker o un número de pedido). Se consulta de dos formas:
+#
+# - "exactas": por la entidad ("¿novedades del pedido 48213?"); solo es
+#   relevante el mensaje que la contiene. Es el caso en que gana BM25.
+# - "paráfrasis": el tema dicho con otras palabras ("inversiones solares" para
+#   "quiero invertir en energía solar"); es relevante cualquier mensaje del tema.
+#
+# Para cada búsqueda (vectorial, léxica, híbrida, e híbrida con BM25 en paralelo
+# como en anodo_llm) mide acierto@k, MRR y latencia por consulta, con los
+# mensajes en SQLite (FTS5) y en FAISS tal y como los guarda el ejemplo 06.
+#
+# Uso: python benchmarks/bench_hibrida.py [--mensajes 20000] [--k 5] [--real]
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import ModeloSimulado, cargar_ejemplo, percentil
+from embeddings import ModeloPerezoso
+from memoria_sqlite import inicializar_db, buscar_lexico
+from memoria_vectorial import MemoriaVectorial
+
+# (frase del mensaje, paráfrasis sin palabras en común)
+TEMAS = [
+    ("quiero invertir en energía solar", "inversiones solares"),
+    ("mi vuelo a Madrid se ha retrasado", "retrasos aéreos madrileños"),
+    ("la factura de la luz ha subido mucho", "facturación eléctrica subiendo"),
+    ("necesito cambiar la contraseña de mi cuenta", "cambios contraseñas cuentas"),
+    ("el paquete llegó dañado", "paquetería dañada"),
+    ("me interesa comprar criptomonedas", "compras cripto"),
+    ("mañana va a llover en Sevilla", "lluvias sevillanas"),
+    ("busco recetas de cocina vegetariana", "receta vegetariano cocinar"),
+    ("la aplicación se cierra al arrancar", "aplicaciones cerrándose arranque"),
+    ("quiero devolver unas zapatillas", "devoluciones zapatilla"),
+    ("el tipo de interés de la hipoteca", "intereses hipotecarios"),
+    ("recomiéndame una película de terror", "películas terroríficas recomendadas"),
+]
+SESIONES = 10
+
+
+def corpus(mensajes, semilla=0):
+    """(id, texto, session_id, tema, entidad) con entidades únicas."""
+    rng = random.Random(semilla)
+    tickers = rng.sample([a + b + c for a in "ABCDEFGHJKLMNPRSTVXZ" for b in "ABCDEFGHJKLMNPRSTVXZ"
+                          for c in "ABCDEFGHJKLMNPRSTVXZ"], min(mensajes, 8000))
+    pedidos = rng.sample(range(10_000, 100_000), mensajes)
+    filas = []
+    for i in range(mensajes):
+        tema = rng.randrange(len(TEMAS))
+        entidad = f"acción {tickers[i]}" if i < len(tickers) and i % 2 else f"pedido {pedidos[i]}"
+        filas.append((i + 1, f"{TEMAS[tema][0]} ({entidad})", f"s{i % SESIONES}", tema, entidad))
+    return filas
+
+
+def consultas(filas, n, semilla=1):
+    """(texto, session_id, es_relevante(texto), tipo)."""
+    rng = random.Random(semilla)
+    resultado = []
+    for _ in range(n // 2):
+        _, _, sesion, _, entidad = rng.choice(filas)
+        resultado.append((f"¿novedades del {entidad}?", sesion, lambda t, e=entidad: f"({e})" in t, "exactas"))
+    for _ in range(n - n // 2):
+        tema = rng.randrange(len(TEMAS))
+        resultado.append((TEMAS[tema][1], f"s{rng.randrange(SESIONES)}",
+                          lambda t, f=TEMAS[tema][0]: t.startswith(f), "paráfrasis"))
+    return resultado
+
+
+def preparar(directorio, filas, modelo):
+    ruta = os.path.join(directorio, "hibrida.db")
+    conn = inicializar_db(ruta)  # Con el índice FTS5 y sus triggers
+    with conn:
+        conn.executemany("INSERT INTO historial (id, rol, contenido, session_id) VALUES (?, 'usuario', ?, ?)",
+                         [(i, texto, sesion) for i, texto, sesion, _, _ in filas])
+    memoria = MemoriaVectorial(modelo.get_sentence_embedding_dimension(), umbral=10 ** 9)
+    for inicio in range(0, len(filas), 1000):
+        bloque = filas[inicio:inicio + 1000]
+        memoria.agregar([f[0] for f in bloque], modelo.encode([f[1] for f in bloque]), [f[2] for f in bloque])
+    return conn, memoria
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Búsqueda híbrida vs solo vectorial")
+    parser.add_argument("--mensajes", type=int, default=20_000)
+    parser.add_argument("--consultas", type=int, default=400)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--real", action="store_true", help="Usa all-MiniLM-L6-v2 en lugar del modelo simulado")
+    args = parser.parse_args()
+
+    ejemplo = cargar_ejemplo(6)
+    # El simulado cuesta lo que un modelo pequeño en CPU, para que se note el paralelismo
+    modelo = ModeloPerezoso() if args.real else ModeloSimulado(fijo=0.002, por_texto=0.00005)
+    filas = corpus(args.mensajes)
+    lector = ThreadPoolExecutor(1)
+    with tempfile.TemporaryDirectory() as directorio:
+        conn, memoria = preparar(directorio, filas, modelo)
+        lectura = sqlite3.connect(os.path.join(directorio, "hibrida.db"), check_same_thread=False)
+        k = args.k
+
+        def vectorial(texto, sesion):
+            return ejemplo.buscar_similar(memoria, conn, modelo.encode([texto]), sesion, k)
+
+        def lexica(texto, sesion):
+            return [t for _, t in buscar_lexico(conn, texto, sesion, k, rol="usuario")]
+
+        def hibrida(texto, sesion):
+            lexicos = buscar_lexico(conn, texto, sesion, ejemplo.CANDIDATOS, rol="usuario")
+            return ejemplo.buscar_hibrido(memoria, conn, modelo.encode([texto]), lexicos, sesion, k)
+
+        def hibrida_paralela(texto, sesion):
+            # BM25 en otro hilo (otra conexión) mientras se codifica y se busca en FAISS
+            futuro = lector.submit(buscar_lexico, lectura, texto, sesion, ejemplo.CANDIDATOS, "usuario")
+            vector = modelo.encode([texto])
+            return ejemplo.buscar_hibrido(memoria, conn, vector, futuro.result(), sesion, k)
+
+        busquedas = {"vectorial": vectorial, "léxica (BM25)": lexica,
+                     "híbrida (RRF)": hibrida, "híbrida, BM25 en paralelo": hibrida_paralela}
+        casos = consultas(filas, args.consultas)
+        print(f"{args.mensajes} mensajes en {SESIONES} sesiones, {len(casos)} consultas, k={k}\n")
+        print(f"{'búsqueda':>26} | {'tipo':>10} | {f'acierto@{k}':>10} | {'MRR':>5} | {'ms p50':>7} | {'ms p99':>7}")
+        for nombre, buscar in busquedas.items():
+            for tipo in ("exactas", "paráfrasis"):
+                aciertos, rangos, tiempos = 0, 0.0, []
+                seleccion = [c for c in casos if c[3] == tipo]
+                for texto, sesion, relevante, _ in seleccion:
+                    inicio = time.perf_counter()
+                    resultados = buscar(texto, sesion)
+                    tiempos.append(time.perf_counter() - inicio)
+                    posicion = next((i for i, t in enumerate(resultados, start=1) if relevante(t)), None)
+                    if posicion:
+                        aciertos += 1
+                        rangos += 1 / posicion
+                print(f"{nombre:>26} | {tipo:>10} | {aciertos / len(seleccion):>10.2f} | "
+                      f"{rangos / len(seleccion):>5.2f} | {1000 * percentil(tiempos, 50):>7.2f} | "
+                      f"{1000 * percentil(tiempos, 99):>7.2f}")
+        conn.close()
+        lectura.close()
+    lector.shutdown()
@@ -0,0 +1,64 @@
+# === Benchmark: memoria del historial en el estado ===
+# Compara la lista de diccionarios original de state["historial"] con
+# HistorialAcotado: todo en memoria (solo el ahorro de __slots__) y con ventana
+# deslizante y desbordamiento a disco. Mide la memoria retenida (tracemalloc)
+# después de N mensajes, el tiempo por append y el de leer el último mensaje.
+#
+# Uso: python benchmarks/bench_historial.py [--mensajes 10000,100000,1000000] [--ventana 50]
+
+import argparse
+import time
+import tracemalloc
+
+import comun  # noqa: F401  (añade la raíz del proyecto al path)
+from historial import HistorialAcotado
+
+
+def lista_dicts(n):
+    historial = []
+    for i in range(n):
+        historial.append({"rol": ("usuario", "agente")[i % 2], "contenido": f"mensaje número {i} de la conversación"})
+    return historial, lambda: historial[-1]["contenido"]
+
+
+def acotado(n, **opciones):
+    historial = HistorialAcotado(**opciones)
+    for i in range(n):
+        historial.append(("usuario", "agente")[i % 2], f"mensaje número {i} de la conversación")
+    historial.volcar()
+    return historial, lambda: historial[-1].contenido
+
+
+def medir(construir, n):
+    """(MB retenidos, µs por append, µs por lectura del último mensaje)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    historial, ultimo = construir(n)
+    append = 1e6 * (time.perf_counter() - inicio) / n
+    retenido = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    inicio = time.perf_counter()
+    for _ in range(100_000):
+        ultimo()
+    lectura = 1e6 * (time.perf_counter() - inicio) / 100_000
+    if hasattr(historial, "cerrar"):
+        historial.cerrar()
+    return retenido / 1e6, append, lectura
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de memoria del historial")
+    parser.add_argument("--mensajes", default="10000,100000,1000000")
+    parser.add_argument("--ventana", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'mensajes':>9} | {'contenedor':>28} | {'MB':>8} | {'B/mensaje':>9} | {'µs/append':>9} | {'µs/último':>9}")
+    for n in (int(m) for m in args.mensajes.split(",")):
+        variantes = [
+            ("lista de dicts", lista_dicts),
+            ("__slots__ sin ventana", lambda n: acotado(n, ventana=n, desbordar=False)),
+            (f"ventana {args.ventana} + disco", lambda n: acotado(n, ventana=args.ventana)),
+        ]
+        for nombre, construir in variantes:
+            mb, append, lectura = medir(construir, n)
+            print(f"{n:>9} | {nombre:>28} | {mb:>8.1f} | {1e6 * mb / n:>9.0f} | {append:>9.2f} | {lectura:>9.3f}")
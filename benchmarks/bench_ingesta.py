@@ -0,0 +1,74 @@
+# === Benchmark: ingesta masiva vs un mensaje por turno ===
+# Mide mensajes/s al cargar un historial en SQLite + FAISS de dos formas:
+#
+# - "uno a uno": lo que hace el ejemplo 06 en cada turno (guardar_mensaje,
+#   esperar el id y indexar_texto con un encode de un texto).
+# - `ingesta.ingerir`: lotes de executemany y encodes de `--lote-encode` textos
+#   repartidos entre 0 (en el propio proceso), 2 y 4 procesos.
+#
+# El modelo simulado cuesta `fijo` por llamada más `por_texto` por texto, como
+# un modelo en CPU, y cada proceso tiene el suyo.
+#
+# Uso: python benchmarks/bench_ingesta.py [--mensajes 50000] [--procesos 0,2,4]
+
+import argparse
+import functools
+import json
+import os
+import tempfile
+import time
+
+from comun import ModeloSimulado, cargar_ejemplo
+from ingesta import ingerir
+from memoria_sqlite import inicializar_db, ColaEscritura, guardar_mensaje
+from memoria_vectorial import MemoriaVectorial
+
+fabrica = functools.partial(ModeloSimulado, fijo=0.002, por_texto=0.0001)
+
+
+def escribir_jsonl(ruta, mensajes):
+    with open(ruta, "w", encoding="utf-8") as fichero:
+        for i in range(mensajes):
+            registro = {"rol": "usuario" if i % 2 == 0 else "agente", "session_id": f"s{i % 100}",
+                        "contenido": f"mensaje {i}: ¿qué precio tiene BTC hoy?" if i % 2 == 0 else f"respuesta {i}"}
+            fichero.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def uno_a_uno(ruta_db, ruta_jsonl, mensajes):
+    ejemplo = cargar_ejemplo(6)
+    inicializar_db(ruta_db).close()
+    cola = ColaEscritura(ruta_db)
+    modelo = fabrica()
+    memoria = MemoriaVectorial(modelo.get_sentence_embedding_dimension())
+    inicio = time.perf_counter()
+    with open(ruta_jsonl, encoding="utf-8") as fichero:
+        for linea, _ in zip(fichero, range(mensajes)):
+            registro = json.loads(linea)
+            fila_id = guardar_mensaje(cola, registro["rol"], registro["contenido"], registro["session_id"],
+                                      urgente=True).result()  # Como nodo_input de 06
+            if registro["rol"] == "usuario":
+                ejemplo.indexar_texto(modelo, memoria, fila_id, registro["contenido"], registro["session_id"])
+    cola.cerrar()
+    return mensajes / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta masiva vs un mensaje por turno")
+    parser.add_argument("--mensajes", type=int, default=50_000)
+    parser.add_argument("--procesos", default="0,2,4")
+    parser.add_argument("--lote-encode", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_jsonl = os.path.join(directorio, "conversaciones.jsonl")
+        escribir_jsonl(ruta_jsonl, args.mensajes)
+        print(f"{'método':>22} | {'mensajes/s':>10}")
+        # Uno a uno es lento: se mide con una muestra
+        muestra = min(args.mensajes, 500)
+        print(f"{'uno a uno':>22} | {uno_a_uno(os.path.join(directorio, 'uno.db'), ruta_jsonl, muestra):>10.0f}")
+        for procesos in (int(p) for p in args.procesos.split(",")):
+            ruta = os.path.join(directorio, f"ingesta_{procesos}")
+            estadisticas = ingerir(ruta_jsonl, ruta + ".db", ruta + ".faiss", procesos, lote_encode=args.lote_encode,
+                                   fabrica_modelo=fabrica, informe=lambda _: None)
+            nombre = f"ingesta, {procesos} procesos"
+            print(f"{nombre:>22} | {estadisticas['escritos'] / estadisticas['segundos']:>10.0f}")
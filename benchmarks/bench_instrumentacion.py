@@ -0,0 +1,109 @@
+# === Benchmark: sobrecoste de la instrumentación por nodo ===
+# Ejecuta un grafo con la forma del ejemplo 03 (input -> llm -> rama del
+# enrutador -> END) con nodos triviales, para que el sobrecoste de medir no
+# quede oculto por el trabajo de los nodos, en cuatro variantes:
+#
+# - sin instrumentar (lo que hace `instrumentar` sin METRICAS_GRAFO),
+# - instrumentado pero con `metricas.activa = False`,
+# - instrumentado y activo (tiempo real y de CPU),
+# - activo y con medida de memoria (tracemalloc).
+#
+# El tiempo por invoke de LangGraph (~1 ms) tiene mucho ruido frente a lo que
+# se mide, así que también se mide aislado el coste por llamada del envoltorio.
+# Al final imprime los percentiles que se han registrado por nodo y ruta.
+#
+# Uso: python benchmarks/bench_instrumentacion.py [--invokes 5000]
+
+import argparse
+import itertools
+import time
+import tracemalloc
+
+from comun import percentil
+from enrutador import ENRUTADOR
+from instrumentacion import Metricas, _medir, instrumentar
+from langgraph.graph import StateGraph, END
+
+PREGUNTAS = ["¿qué precio tiene BTC?", "¿cómo estará el clima?", "cuéntame algo"]
+
+
+def construir(metricas=None):
+    workflow = StateGraph(dict)
+    if metricas is not None:
+        workflow = instrumentar(workflow, metricas)
+    workflow.add_node("input", lambda state: state)
+    workflow.add_node("llm", lambda state: {**state, "ruta": ENRUTADOR.clasificar(state["ultimo_input"])})
+    for ruta in ENRUTADOR.destinos():
+        workflow.add_node(ruta, lambda state: state)
+        workflow.add_edge(ruta, END)
+    workflow.set_entry_point("input")
+    workflow.add_edge("input", "llm")
+    workflow.add_conditional_edges("llm", ENRUTADOR.condicion, ENRUTADOR.destinos())
+    return workflow.compile()
+
+
+def medir(grafo, invokes):
+    pregunta = itertools.cycle(PREGUNTAS)
+    for _ in range(100):  # Calentamiento
+        grafo.invoke({"ultimo_input": next(pregunta)})
+    tiempos = []
+    for _ in range(invokes):
+        inicio = time.perf_counter()
+        grafo.invoke({"ultimo_input": next(pregunta)})
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def coste_envoltorio(metricas, llamadas=200_000):
+    """ns por llamada de un nodo trivial envuelto (o sin envolver si `metricas` es None)."""
+    nodo = lambda state: state
+    funcion = nodo if metricas is None else _medir(metricas, "nodo", nodo)
+    estado = {}
+    inicio = time.perf_counter()
+    for _ in range(llamadas):
+        funcion(estado)
+    return 1e9 * (time.perf_counter() - inicio) / llamadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sobrecoste de la instrumentación por nodo")
+    parser.add_argument("--invokes", type=int, default=2000, help="Invokes por ronda y variante")
+    parser.add_argument("--rondas", type=int, default=5, help="Rondas alternando variantes (se queda la mejor)")
+    args = parser.parse_args()
+
+    inactiva = Metricas()
+    inactiva.activa = False
+    activa = Metricas()
+    variantes = {
+        "sin instrumentar": construir(),
+        "instrumentado, inactivo": construir(inactiva),
+        "instrumentado, activo": construir(activa),
+    }
+    # Las variantes se alternan por rondas para que el ruido del sistema les afecte por igual
+    mejores = {}
+    for _ in range(args.rondas):
+        for nombre, grafo in variantes.items():
+            tiempos = medir(grafo, args.invokes)
+            if nombre not in mejores or percentil(tiempos, 50) < percentil(mejores[nombre], 50):
+                mejores[nombre] = tiempos
+    # La memoria se mide al final: tracemalloc ralentiza todo el proceso mientras está activo
+    mejores["activo + memoria"] = medir(construir(Metricas(memoria=True)), args.invokes)
+    tracemalloc.stop()
+
+    print(f"{'variante':>25} | {'p50 µs':>7} | {'p99 µs':>7} | {'sobrecoste p50':>14}")
+    base = percentil(mejores["sin instrumentar"], 50)
+    for nombre, tiempos in mejores.items():
+        mediana = percentil(tiempos, 50)
+        print(f"{nombre:>25} | {1e6 * mediana:>7.1f} | {1e6 * percentil(tiempos, 99):>7.1f} | "
+              f"{mediana / base - 1:>+14.1%}")
+
+    print(f"\n{'envoltorio de un nodo':>25} | {'ns/llamada':>10}")
+    for nombre, metricas in (("sin envolver", None), ("inactivo", inactiva), ("activo", Metricas())):
+        print(f"{nombre:>25} | {min(coste_envoltorio(metricas) for _ in range(3)):>10.0f}")
+
+    print("\nPercentiles registrados (variante activa):")
+    for h in activa.a_json()["histogramas"]:
+        if h["nombre"] in ("langgraph_nodo_segundos", "langgraph_ruta_segundos"):
+            etiquetas = ",".join(f"{k}={v}" for k, v in h["etiquetas"].items())
+            print(f"  {h['nombre']}{{{etiquetas}}}: n={h['cuenta']} p50={1e6 * h['p50']:.1f}µs "
+                  f"p95={1e6 * h['p95']:.1f}µs p99={1e6 * h['p99']:.1f}µs")
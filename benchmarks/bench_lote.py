@@ -0,0 +1,80 @@
+# === Benchmark: ejecución por lotes con procesos calientes (lote.py) ===
+# Pasa un fichero de consultas de varias sesiones por el grafo del ejemplo 06
+# (con el modelo de embeddings simulado, cuyo coste es CPU real) y mide:
+#
+# - "en frío": lo que hacen hoy los scripts, un proceso nuevo por consulta que
+#   importa el ejemplo, compila el grafo y abre SQLite, FAISS y el modelo;
+# - lote.py en este proceso y con 1, 2, 4... procesos calientes, con la salida
+#   en orden y sin orden: consultas/s, escalado respecto a 1 proceso y arranque.
+#
+# El escalado depende de los núcleos disponibles (se imprimen): con más
+# procesos que núcleos ya no sube.
+#
+# Uso: python benchmarks/bench_lote.py [--consultas 2000] [--sesiones 64] [--procesos 0,1,2,4,8] [--frias 5]
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from multiprocessing import get_context
+
+from comun import ModeloSimulado
+from lote import ejecutar_lote
+
+TEMAS = ["¿qué precio tiene BTC?", "¿cómo estará el clima en Madrid?", "cuéntame algo", "precio del oro y clima"]
+
+
+def consultas(n, sesiones):
+    return [(i, f"{TEMAS[i % len(TEMAS)]} (consulta {i})", f"s{i % sesiones}") for i in range(n)]
+
+
+def una_en_frio(directorio, consulta):
+    """En un proceso nuevo: todo el arranque más una sola consulta."""
+    ejecutar_lote([consulta], io.StringIO(), 6, os.path.join(directorio, "frio.db"),
+                  os.path.join(directorio, "frio.faiss"), procesos=0, fabrica_modelo=ModeloSimulado,
+                  informe=lambda _: None)
+
+
+def medir_en_frio(directorio, lote, n):
+    contexto = get_context("spawn")
+    inicio = time.perf_counter()
+    for consulta in lote[:n]:
+        proceso = contexto.Process(target=una_en_frio, args=(directorio, consulta))
+        proceso.start()
+        proceso.join()
+    return n / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas/s de lote.py según el número de procesos")
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--sesiones", type=int, default=64)
+    parser.add_argument("--procesos", default="0,1,2,4,8", help="0: en este proceso, sin pool")
+    parser.add_argument("--frias", type=int, default=5, help="Consultas de la medida en frío")
+    args = parser.parse_args()
+
+    lote = consultas(args.consultas, args.sesiones)
+    print(f"{args.consultas} consultas en {args.sesiones} sesiones, {os.cpu_count()} núcleos\n")
+    print(f"{'procesos':>10} | {'salida':>9} | {'consultas/s':>11} | {'escalado':>8} | {'arranque s':>10}")
+    with tempfile.TemporaryDirectory() as directorio:
+        print(f"{'en frío':>10} | {'-':>9} | {medir_en_frio(directorio, lote, args.frias):>11.1f} | "
+              f"{'':>8} | {'':>10}")
+        base = {}
+        for procesos in (int(p) for p in args.procesos.split(",")):
+            for en_orden in (True, False):
+                # Base nueva en cada medida: el historial no crece de una a otra
+                ruta = os.path.join(directorio, f"lote_{procesos}_{en_orden}")
+                salida = io.StringIO()
+                e = ejecutar_lote(lote, salida, 6, ruta + ".db", ruta + ".faiss", procesos, en_orden,
+                                  fabrica_modelo=ModeloSimulado, informe=lambda _: None)
+                resultados = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+                assert len(resultados) == len(lote) and not e["errores"]
+                if en_orden:
+                    assert [r["id"] for r in resultados] == [c[0] for c in lote]
+                if procesos == 1:
+                    base[en_orden] = e["por_segundo"]
+                escalado = f"x{e['por_segundo'] / base[en_orden]:.2f}" if en_orden in base else "-"
+                print(f"{procesos:>10} | {'en orden' if en_orden else 'sin orden':>9} | "
+                      f"{e['por_segundo']:>11.1f} | {escalado:>8} | {e['arranque']:>10.2f}")
@@ -0,0 +1,56 @@
+# === Benchmark: micro-batching de embeddings ===
+# Simula muchas conversaciones concurrentes que codifican un texto cada vez y
+# compara llamar al modelo directamente (lotes de tamaño 1) con el
+# PlanificadorEmbeddings, midiendo textos/s y latencia p99 por petición.
+#
+# Uso: python benchmarks/bench_microbatch.py [--concurrencia 1,8,32,128] [--real]
+
+import argparse
+import threading
+import time
+
+from comun import ModeloSimulado, percentil
+from embeddings import ModeloPerezoso, PlanificadorEmbeddings
+
+
+def ejecutar(codificar, hilos, peticiones):
+    """Lanza `hilos` clientes que hacen `peticiones` encodes de un texto cada uno."""
+    latencias = [[] for _ in range(hilos)]
+
+    def cliente(n):
+        for i in range(peticiones):
+            inicio = time.perf_counter()
+            codificar(f"conversación {n}: mensaje número {i}")
+            latencias[n].append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    clientes = [threading.Thread(target=cliente, args=(n,)) for n in range(hilos)]
+    for c in clientes:
+        c.start()
+    for c in clientes:
+        c.join()
+    segundos = time.perf_counter() - inicio
+    todas = [l for lista in latencias for l in lista]
+    return len(todas) / segundos, 1000 * percentil(todas, 99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de micro-batching de embeddings")
+    parser.add_argument("--concurrencia", default="1,8,32,128")
+    parser.add_argument("--peticiones", type=int, default=50, help="Peticiones por cliente")
+    parser.add_argument("--max-lote", type=int, default=64)
+    parser.add_argument("--max-espera", type=float, default=0.005)
+    parser.add_argument("--real", action="store_true", help="Usa all-MiniLM-L6-v2 en lugar del modelo simulado")
+    args = parser.parse_args()
+
+    # El modelo simulado cuesta 2 ms por llamada + 0.05 ms por texto
+    modelo = ModeloPerezoso() if args.real else ModeloSimulado(fijo=0.002, por_texto=0.00005)
+    modelo.encode(["calentamiento"])
+
+    print(f"{'clientes':>8} | {'directo textos/s':>16} {'p99 ms':>8} | {'micro-batch textos/s':>20} {'p99 ms':>8}")
+    for hilos in (int(c) for c in args.concurrencia.split(",")):
+        directo = ejecutar(lambda t: modelo.encode([t]), hilos, args.peticiones)
+        planificador = PlanificadorEmbeddings(modelo, args.max_lote, args.max_espera)
+        agrupado = ejecutar(lambda t: planificador.enviar(t).result(), hilos, args.peticiones)
+        planificador.cerrar()
+        print(f"{hilos:>8} | {directo[0]:>16.0f} {directo[1]:>8.1f} | {agrupado[0]:>20.0f} {agrupado[1]:>8.1f}")
@@ -0,0 +1,109 @@
+# === Benchmark: preguntas con varias intenciones, en serie vs en paralelo ===
+# Un grafo como el de 03-06 (nodo de entrada que enruta + un nodo por dominio)
+# en el que cada rama simula la llamada a su herramienta con una espera fija
+# distinta (`--latencias`, ms). Para preguntas con 1, 2, 3 y 4 intenciones compara:
+#
+# - "en serie": lo que pasaba antes, una sola ruta por invoke, así que hay que
+#   invocar el grafo una vez por intención y las esperas se suman;
+# - "paralelo (invoke)" y "paralelo (ainvoke)": una única invocación con
+#   `condicion_varias`, que lanza todas las ramas a la vez y junta sus
+#   respuestas con el reducer de EstadoRutas.
+#
+# Con el despacho en paralelo la latencia debería ser la de la rama más lenta
+# (columna "máximo") y no la suma.
+#
+# Uso: python benchmarks/bench_multiruta.py [--latencias 50,80,120,200] [--repeticiones 20]
+
+import argparse
+import asyncio
+import time
+
+from langgraph.graph import StateGraph, END
+
+from comun import percentil
+from enrutador import Enrutador, EstadoRutas, Ruta, respuestas_en_orden
+
+RUTAS = [
+    Ruta("finanzas", palabras=["precio"]),
+    Ruta("clima", palabras=["clima"]),
+    Ruta("pedidos", palabras=["pedido"]),
+    Ruta("facturas", palabras=["factura"]),
+]
+PREGUNTAS = [
+    "¿qué precio tiene BTC?",
+    "¿qué precio tiene BTC y qué clima hará?",
+    "¿qué precio tiene BTC, qué clima hará y dónde está mi pedido?",
+    "¿qué precio tiene BTC, qué clima hará, dónde está mi pedido y cuánto es la factura?",
+]
+
+
+def crear_grafo(enrutador, latencias):
+    """Entrada que enruta y una rama por ruta que espera su latencia (síncrona y asíncrona)."""
+    def nodo_entrada(state):
+        # Con "rutas" ya en la entrada (modo en serie) se respetan
+        rutas = state.get("rutas") or enrutador.clasificar_todas(state["ultimo_input"])
+        return {"rutas": rutas, "respuestas": None}
+
+    def rama(ruta):
+        def nodo(state):
+            time.sleep(latencias[ruta])  # Llamada a la herramienta del dominio
+            return {"respuestas": {ruta: f"respuesta de {ruta}"}}
+
+        async def anodo(state):
+            await asyncio.sleep(latencias[ruta])
+            return {"respuestas": {ruta: f"respuesta de {ruta}"}}
+        return nodo, anodo
+
+    grafos = []
+    for asincrono in (False, True):
+        workflow = StateGraph(EstadoRutas)
+        workflow.add_node("entrada", nodo_entrada)
+        for ruta in enrutador.destinos():
+            workflow.add_node(ruta, rama(ruta)[asincrono])
+            workflow.add_edge(ruta, END)
+        workflow.set_entry_point("entrada")
+        workflow.add_conditional_edges("entrada", enrutador.condicion_varias, enrutador.destinos())
+        grafos.append(workflow.compile())
+    return grafos
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Despacho a varias rutas: en serie vs en paralelo")
+    parser.add_argument("--latencias", default="50,80,120,200", help="ms de la herramienta de cada ruta")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    latencias = dict(zip([r.nombre for r in RUTAS], (float(ms) / 1000 for ms in args.latencias.split(","))))
+    latencias["general"] = 0.0
+    enrutador = Enrutador(RUTAS)
+    grafo, grafo_async = crear_grafo(enrutador, latencias)
+
+    print(f"{'intenciones':>11} | {'suma ms':>7} | {'máximo ms':>9} | {'en serie ms':>11} | "
+          f"{'paralelo (invoke) ms':>20} | {'paralelo (ainvoke) ms':>21}")
+    for pregunta in PREGUNTAS:
+        rutas = enrutador.clasificar_todas(pregunta)
+        final = grafo.invoke({"ultimo_input": pregunta})
+        assert respuestas_en_orden(final) == [f"respuesta de {ruta}" for ruta in rutas], final
+
+        def en_serie():
+            # Una invocación por intención, cada una con una sola ruta
+            for ruta in rutas:
+                grafo.invoke({"ultimo_input": pregunta, "rutas": [ruta]})
+
+        serie = medir(en_serie, args.repeticiones)
+        paralelo = medir(lambda: grafo.invoke({"ultimo_input": pregunta}), args.repeticiones)
+        paralelo_async = medir(lambda: asyncio.run(grafo_async.ainvoke({"ultimo_input": pregunta})),
+                               args.repeticiones)
+        esperas = [1000 * latencias[ruta] for ruta in rutas]
+        print(f"{len(rutas):>11} | {sum(esperas):>7.0f} | {max(esperas):>9.0f} | "
+              f"{1000 * percentil(serie, 50):>11.1f} | {1000 * percentil(paralelo, 50):>20.1f} | "
+              f"{1000 * percentil(paralelo_async, 50):>21.1f}")
@@ -0,0 +1,55 @@
+# === Benchmark: lectura del historial de una sesión según crece la tabla ===
+# Rellena `historial` con muchas sesiones y mide cuánto cuesta leer el historial
+# de una sola sesión con el esquema indexado (session_id, id) frente a la misma
+# tabla sin índices secundarios (recorrido completo).
+#
+# Uso: python benchmarks/bench_sesiones.py [--tamanos 10000,100000,1000000] [--por-sesion 50]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import comun  # noqa: F401  (añade la raíz del proyecto al path)
+from memoria_sqlite import inicializar_db, obtener_historial
+
+
+def rellenar(ruta, filas, por_sesion):
+    """Inserta `filas` mensajes repartidos entre sesiones de `por_sesion` mensajes, intercalados."""
+    conn = inicializar_db(ruta)
+    sesiones = filas // por_sesion
+    ahora = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT INTO historial (rol, contenido, session_id, creado_en) VALUES (?, ?, ?, ?)",
+            ((("usuario", "agente")[i % 2], f"mensaje {i}", f"s{i % sesiones}", ahora + i) for i in range(filas)),
+        )
+    return conn, sesiones
+
+
+def medir(conn, sesiones, lecturas=200):
+    """Latencia media (ms) de leer el historial completo de una sesión al azar."""
+    azar = random.Random(0)
+    inicio = time.perf_counter()
+    for _ in range(lecturas):
+        obtener_historial(conn, f"s{azar.randrange(sesiones)}")
+    return 1000 * (time.perf_counter() - inicio) / lecturas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lectura por sesión vs tamaño de tabla")
+    parser.add_argument("--tamanos", default="10000,100000,1000000")
+    parser.add_argument("--por-sesion", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} | {'sin índice ms':>14} | {'índice (session_id, id) ms':>27}")
+    for filas in (int(t) for t in args.tamanos.split(",")):
+        with tempfile.TemporaryDirectory() as directorio:
+            conn, sesiones = rellenar(os.path.join(directorio, "sesiones.db"), filas, args.por_sesion)
+            indexado = medir(conn, sesiones)
+            conn.execute("DROP INDEX idx_historial_sesion_id")
+            conn.execute("DROP INDEX idx_historial_sesion_fecha")
+            sin_indice = medir(conn, sesiones, lecturas=20)
+            conn.close()
+        print(f"{filas:>10} | {sin_indice:>14.3f} | {indexado:>27.3f}")
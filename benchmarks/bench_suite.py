@@ -0,0 +1,233 @@
+# === Suite de benchmarks de los seis ejemplos ===
+# Importa los grafos 01–06 y los ejecuta de principio a fin con entradas
+# guionizadas (input() se sustituye) y el modelo de embeddings simulado, sin red
+# ni pesos que descargar. Mide:
+#
+# - latencia por invoke de cada ejemplo (media, p50 y p99),
+# - tiempo por nodo (intervalo entre eventos de `stream(stream_mode="updates")`),
+# - inserciones/s de `guardar_mensaje` en SQLite (cola de escritura + flush),
+# - latencia de `buscar_similar` en FAISS según el tamaño del corpus.
+#
+# Los resultados se escriben en JSON; con `--comparar anterior.json` se marcan
+# las métricas que han empeorado más de `--tolerancia` y el proceso sale con 1.
+#
+# Uso: python benchmarks/bench_suite.py [--salida resultados.json] [--comparar base.json] [--rapido]
+
+import argparse
+import builtins
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import wait
+
+from comun import RAIZ, ModeloSimulado, cargar_ejemplo, percentil
+from embeddings import CacheEmbeddings, PlanificadorEmbeddings
+from enrutador import ENRUTADOR, EJEMPLOS, EnrutadorSemantico
+from historial import HistorialAcotado
+from langgraph.checkpoint.memory import InMemorySaver
+from memoria_sqlite import inicializar_db, ColaEscritura, PoolConexiones, guardar_mensaje
+from memoria_vectorial import MemoriaVectorial
+from recursos import Recursos
+
+PREGUNTAS = ["¿qué precio tiene BTC?", "¿cómo estará el clima?", "cuéntame algo", "¿cuánto cuesta el oro?"]
+
+
+@contextlib.contextmanager
+def entradas(textos):
+    """Sustituye input() por una secuencia de textos y silencia los print de los nodos."""
+    siguiente = iter(textos).__next__
+    original = builtins.input
+    builtins.input = lambda _="": siguiente()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = original
+
+
+def ejecutar(grafo, estado, config, textos, nodos):
+    """Un invoke con `stream`: devuelve su duración y acumula el tiempo de cada nodo."""
+    with entradas(textos):
+        inicio = anterior = time.perf_counter()
+        for evento in grafo.stream(estado, config, stream_mode="updates"):
+            ahora = time.perf_counter()
+            for nodo in evento:
+                nodos[nodo].append(ahora - anterior)
+            anterior = ahora
+    return time.perf_counter() - inicio
+
+
+def preparar(numero, directorio):
+    """(grafo, fábrica de (estado, config, textos) por iteración, recursos) de cada ejemplo."""
+    ejemplo = cargar_ejemplo(numero)
+    pregunta = itertools.cycle(PREGUNTAS)
+    hilo = itertools.count()
+    if numero == 1:
+        return ejemplo.grafo, lambda: ({}, None, []), None
+    if numero in (3, 4):
+        def caso():
+            estado = {"ultimo_input": next(pregunta)}
+            if numero == 4:
+                estado["historial"] = HistorialAcotado(ejemplo.VENTANA_HISTORIAL)
+            return estado, None, []
+        return ejemplo.grafo, caso, None
+
+    ruta = os.path.join(directorio, f"{numero:02d}_suite.db")
+    inicializar_db(ruta).close()
+    recursos = Recursos(db=PoolConexiones(ruta), cola=ColaEscritura(ruta))
+    if numero == 2:
+        # Un turno y 'exit' por invoke, en un hilo con checkpoints que va creciendo
+        grafo = ejemplo.construir_grafo(InMemorySaver())
+        config = recursos.config("suite", recursion_limit=ejemplo.LIMITE_PASOS)
+        return grafo, lambda: ({}, config, [next(pregunta), "exit"]), recursos
+    if numero == 5:
+        def caso():
+            estado = {"session_id": f"s{next(hilo) % 10}", "ultimo_id_visto": None, "ultimo_input": next(pregunta)}
+            return estado, recursos.config(), []
+        return ejemplo.grafo, caso, recursos
+    # Ejemplo 06: modelo simulado con el coste de un modelo pequeño en CPU
+    modelo = ModeloSimulado(fijo=0.002, por_texto=0.00005)
+    recursos.model = CacheEmbeddings(PlanificadorEmbeddings(modelo))
+    recursos.memoria = MemoriaVectorial(modelo.get_sentence_embedding_dimension())
+    recursos.enrutador = EnrutadorSemantico(recursos.model, EJEMPLOS, respaldo=ENRUTADOR)
+
+    def caso():
+        estado = {"session_id": f"s{next(hilo) % 10}", "ultimo_id_visto": None, "ultimo_input": None, "ruta": None}
+        return estado, recursos.config(), [next(pregunta)]
+    return ejemplo.grafo, caso, recursos
+
+
+def medir_ejemplos(iteraciones, directorio):
+    metricas = {}
+    for numero in range(1, 7):
+        grafo, caso, recursos = preparar(numero, directorio)
+        nodos = defaultdict(list)
+        ejecutar(grafo, *caso(), defaultdict(list))  # Calentamiento (imports perezosos, cachés)
+        latencias = [ejecutar(grafo, *caso(), nodos) for _ in range(iteraciones)]
+        prefijo = f"ejemplo_{numero:02d}"
+        metricas[f"{prefijo}.invoke_ms.media"] = (1000 * sum(latencias) / len(latencias), "menor")
+        metricas[f"{prefijo}.invoke_ms.p50"] = (1000 * percentil(latencias, 50), "menor")
+        metricas[f"{prefijo}.invoke_ms.p99"] = (1000 * percentil(latencias, 99), "menor")
+        for nodo, tiempos in sorted(nodos.items()):
+            metricas[f"{prefijo}.nodo.{nodo}_ms"] = (1000 * sum(tiempos) / len(tiempos), "menor")
+        if recursos is not None:
+            recursos.cerrar()
+    return metricas
+
+
+def medir_inserciones(mensajes, directorio):
+    """Inserciones/s de guardar_mensaje hasta que todo está confirmado en disco."""
+    ruta = os.path.join(directorio, "inserciones.db")
+    inicializar_db(ruta).close()
+    cola = ColaEscritura(ruta)
+    inicio = time.perf_counter()
+    futuros = [guardar_mensaje(cola, "usuario", f"mensaje {i}", f"s{i % 100}") for i in range(mensajes)]
+    cola.flush()
+    wait(futuros)
+    segundos = time.perf_counter() - inicio
+    cola.cerrar()
+    return {"sqlite.guardar_mensaje_por_s": (mensajes / segundos, "mayor")}
+
+
+def medir_busqueda(tamanos, consultas, directorio):
+    """Latencia de buscar_similar (06, con los textos leídos de SQLite) con corpus de distintos tamaños."""
+    ejemplo = cargar_ejemplo(6)
+    modelo = ModeloSimulado()
+    metricas = {}
+    for tamano in tamanos:
+        conn = inicializar_db(os.path.join(directorio, f"busqueda_{tamano}.db"))
+        memoria = MemoriaVectorial(modelo.get_sentence_embedding_dimension(), umbral=50_000)
+        for inicio in range(0, tamano, 5000):
+            fin = min(tamano, inicio + 5000)
+            textos = [f"mensaje {i}: {PREGUNTAS[i % len(PREGUNTAS)]}" for i in range(inicio, fin)]
+            ids = list(range(inicio + 1, fin + 1))
+            sesiones = [f"s{i % 10}" for i in range(inicio, fin)]
+            with conn:
+                conn.executemany("INSERT INTO historial (id, rol, contenido, session_id) VALUES (?, 'usuario', ?, ?)",
+                                 zip(ids, textos, sesiones))
+            memoria.agregar(ids, modelo.encode(textos), sesiones)
+        vectores = modelo.encode([f"pregunta {i} sobre {PREGUNTAS[i % len(PREGUNTAS)]}" for i in range(consultas)])
+        tiempos = []
+        for i, vector in enumerate(vectores):
+            empiece = time.perf_counter()
+            ejemplo.buscar_similar(memoria, conn, vector.reshape(1, -1), f"s{i % 10}")
+            tiempos.append(time.perf_counter() - empiece)
+        metricas[f"faiss.buscar_similar_ms.{tamano}.media"] = (1000 * sum(tiempos) / len(tiempos), "menor")
+        metricas[f"faiss.buscar_similar_ms.{tamano}.p99"] = (1000 * percentil(tiempos, 99), "menor")
+        conn.close()
+    return metricas
+
+
+def version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocida"
+
+
+def comparar(actual, anterior, tolerancia):
+    """Lista de (métrica, antes, ahora, cambio) que han empeorado más de `tolerancia`."""
+    regresiones = []
+    for nombre, datos in actual["metricas"].items():
+        previo = anterior["metricas"].get(nombre)
+        if not previo or not previo["valor"]:
+            continue
+        cambio = datos["valor"] / previo["valor"] - 1
+        peor = cambio > tolerancia if datos["mejor"] == "menor" else cambio < -tolerancia
+        if peor:
+            regresiones.append((nombre, previo["valor"], datos["valor"], cambio))
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de los ejemplos 01–06")
+    parser.add_argument("--salida", default="resultados_benchmarks.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento relativo tolerado (0.2 = 20%%)")
+    parser.add_argument("--iteraciones", type=int, default=50, help="Invokes medidos por ejemplo")
+    parser.add_argument("--mensajes", type=int, default=20_000, help="Mensajes para medir inserciones/s")
+    parser.add_argument("--corpus", default="1000,10000,100000", help="Tamaños de corpus para buscar_similar")
+    parser.add_argument("--rapido", action="store_true", help="Pocas iteraciones y corpus pequeños (humo)")
+    args = parser.parse_args()
+    if args.rapido:
+        args.iteraciones, args.mensajes, args.corpus = 5, 2000, "1000,5000"
+
+    metricas = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        metricas.update(medir_ejemplos(args.iteraciones, directorio))
+        metricas.update(medir_inserciones(args.mensajes, directorio))
+        metricas.update(medir_busqueda([int(t) for t in args.corpus.split(",")], 200, directorio))
+
+    resultado = {
+        "version": version(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "parametros": {"iteraciones": args.iteraciones, "mensajes": args.mensajes, "corpus": args.corpus},
+        "metricas": {nombre: {"valor": round(valor, 4), "mejor": mejor} for nombre, (valor, mejor) in metricas.items()},
+    }
+    with open(args.salida, "w", encoding="utf-8") as fichero:
+        json.dump(resultado, fichero, indent=2, ensure_ascii=False)
+
+    for nombre, datos in resultado["metricas"].items():
+        print(f"{nombre:<45} {datos['valor']:>12.3f}")
+    print(f"📝 Resultados en {args.salida} (versión {resultado['version']})")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as fichero:
+            regresiones = comparar(resultado, json.load(fichero), args.tolerancia)
+        for nombre, antes, ahora, cambio in regresiones:
+            print(f"❌ {nombre}: {antes:.3f} -> {ahora:.3f} ({cambio:+.0%})")
+        if regresiones:
+            sys.exit(1)
+        print(f"✅ Sin regresiones por encima del {args.tolerancia:.0%}")
@@ -0,0 +1,65 @@
+# === Utilidades comunes de los benchmarks ===
+# Añade la raíz del proyecto al path e incluye un modelo de embeddings simulado,
+# determinista y sin pesos que descargar, para medir sin depender de la red.
+
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+class ModeloSimulado:
+    """
+    Modelo de embeddings determinista con la interfaz de SentenceTransformer.
+
+    Cada texto se representa como la bolsa normalizada de sus trigramas de
+    caracteres (textos parecidos dan vectores parecidos). El coste se simula
+    con `fijo` segundos por llamada más `por_texto` segundos por texto, bajo un
+    candado que representa un único dispositivo de cómputo: así una llamada con
+    lote grande sale mucho más barata que muchas de tamaño 1.
+    """
+
+    def __init__(self, dimension=384, fijo=0.0, por_texto=0.0):
+        self.dimension = dimension
+        self.fijo = fijo
+        self.por_texto = por_texto
+        self.llamadas = 0
+        self._candado = threading.Lock()
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _vector(self, texto):
+        vector = np.zeros(self.dimension, dtype="float32")
+        texto = f"  {texto.lower()}  "
+        for i in range(len(texto) - 2):
+            resumen = hashlib.blake2b(texto[i:i + 3].encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(resumen, "little") % self.dimension] += 1.0
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def encode(self, textos):
+        with self._candado:
+            self.llamadas += 1
+            if self.fijo or self.por_texto:
+                time.sleep(self.fijo + self.por_texto * len(textos))
+            return np.array([self._vector(t) for t in textos], dtype="float32").reshape(len(textos), self.dimension)
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) de una lista de valores."""
+    return float(np.percentile(valores, p)) if len(valores) else 0.0
+
+
+def cargar_ejemplo(numero):
+    """Importa un ejemplo numerado (p. ej. 5 -> 05_langgraph_memoria_largo_plazo.py) como módulo."""
+    import glob
+    import importlib
+
+    ruta = glob.glob(os.path.join(RAIZ, f"{numero:02d}_*.py"))[0]
+    return importlib.import_module(os.path.splitext(os.path.basename(ruta))[0])
@@ -0,0 +1,249 @@
+# === Caché semántica de respuestas de las ramas (herramientas del ejemplo 06) ===
+# Las ramas de dominio (finanzas, clima, general) envuelven llamadas lentas a
+# herramientas o a un LLM, y muchas preguntas son paráfrasis de otras recientes.
+# Antes de llamar a la herramienta se busca una respuesta guardada:
+#
+# 1. Acierto exacto: la pregunta normalizada (minúsculas, sin tildes, signos ni
+#    espacios repetidos) ya se respondió en esa ruta.
+# 2. Acierto semántico: la pregunta más parecida de esa ruta, con un índice FAISS
+#    de producto interno sobre vectores normalizados (similitud coseno) y el
+#    mismo modelo de embeddings que la memoria de 06, supera `umbral`. Además,
+#    las dos preguntas deben nombrar las mismas entidades (números, tickers y
+#    nombres propios): "precio de ETH" se parece mucho a "precio de BTC" pero
+#    no tiene la misma respuesta.
+#
+# Cada ruta tiene su TTL (el precio de BTC caduca antes que una respuesta
+# general; TTL 0 = no se guarda) y el total de entradas está acotado con
+# expulsión LRU. Las entradas caducadas o expulsadas se ocultan al momento y se
+# quitan del índice FAISS por lotes, como los borrados de MemoriaVectorial.
+# La caché es global, no por sesión: guarda respuestas de herramientas, no de
+# la conversación.
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+from instrumentacion import metricas_globales
+
+_NO_PALABRA = re.compile(r"[^\w]+")
+_PALABRA = re.compile(r"\w+")
+# Vecinos que se revisan en la búsqueda semántica, además de los ocultos
+CANDIDATOS = 16
+# Resultado de cada consulta, uno solo por consulta y contado por ruta. "caducado"
+# es un fallo en el que la pregunta sí estaba (exacta o parecida) pero había caducado
+RESULTADOS = ("exacto", "semantico", "fallo", "caducado")
+
+
+def normalizar_consulta(texto):
+    """Clave de los aciertos exactos: "¿Qué  precio tiene BTC?" -> "que precio tiene btc"."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _NO_PALABRA.sub(" ", texto).strip()
+
+
+def entidades(texto):
+    """
+    Palabras que identifican de qué se pregunta: con dígitos, con más de una
+    mayúscula (BTC) o con mayúscula inicial salvo la primera (Madrid).
+    """
+    palabras = _PALABRA.findall(texto)
+    return frozenset(
+        normalizar_consulta(p) for i, p in enumerate(palabras)
+        if any(c.isdigit() for c in p) or sum(c.isupper() for c in p) > 1 or (i > 0 and p[0].isupper())
+    )
+
+
+class _Entrada:
+    __slots__ = ("ruta", "clave", "entidades", "respuesta", "caduca")
+
+    def __init__(self, ruta, clave, entidades, respuesta, caduca):
+        self.ruta = ruta
+        self.clave = clave
+        self.entidades = entidades
+        self.respuesta = respuesta
+        self.caduca = caduca
+
+
+class CacheRespuestas:
+    """
+    Caché de respuestas por ruta con aciertos exactos y semánticos.
+
+    `ttl` es un dict ruta -> segundos (las rutas que no están usan
+    `ttl_por_defecto`); `capacidad` acota el total de entradas de todas las
+    rutas. `model` es el de la memoria (CacheEmbeddings en 06: la pregunta ya
+    se codificó en el turno, así que codificarla aquí es un acierto). Con
+    `obtener(ruta, pregunta, herramienta)` se responde desde la caché o se llama
+    a la herramienta y se guarda su respuesta. Con `mismas_entidades=False` un
+    acierto semántico solo depende de la similitud.
+    """
+
+    def __init__(self, model, ttl=None, ttl_por_defecto=300.0, capacidad=10_000, umbral=0.9,
+                 mismas_entidades=True, reloj=time.monotonic, metricas=None):
+        self.model = model
+        self.ttl = dict(ttl or {})
+        self.ttl_por_defecto = ttl_por_defecto
+        self.capacidad = capacidad
+        self.umbral = umbral
+        self.mismas_entidades = mismas_entidades
+        self.reloj = reloj
+        # Contadores también en las métricas del grafo (METRICAS_GRAFO), si están activas
+        self.metricas = metricas if metricas is not None else metricas_globales()
+        self._entradas = OrderedDict()     # id -> _Entrada, de la menos a la más usada
+        self._exactas = {}                 # (ruta, pregunta normalizada) -> id
+        self._indices = {}                 # ruta -> faiss.IndexIDMap sobre IndexFlatIP
+        self._borrados = defaultdict(set)  # ruta -> ids fuera de la caché que siguen en su índice
+        self._siguiente_id = 0
+        self._contadores = defaultdict(lambda: dict.fromkeys(RESULTADOS, 0))
+        self.expulsadas = 0
+        self._candado = threading.Lock()
+
+    def ttl_de(self, ruta):
+        return self.ttl.get(ruta, self.ttl_por_defecto)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    # --- Consulta ---
+    def buscar(self, ruta, pregunta, vector=None):
+        """Respuesta guardada para `pregunta` en `ruta` (exacta o parecida), o None."""
+        return self._buscar(ruta, pregunta, vector)[0]
+
+    def obtener(self, ruta, pregunta, herramienta, vector=None):
+        """Respuesta de la caché o, si no hay, `herramienta(pregunta)`, que se guarda."""
+        respuesta, vector = self._buscar(ruta, pregunta, vector)
+        if respuesta is None:
+            respuesta = herramienta(pregunta)  # Fuera del candado: las demás ramas siguen
+            self.guardar(ruta, pregunta, respuesta, vector)
+        return respuesta
+
+    def _buscar(self, ruta, pregunta, vector):
+        """(respuesta o None, vector de la pregunta si se ha calculado)."""
+        ahora = self.reloj()
+        caducada = False  # Si no hay acierto, se cuenta como "caducado" en lugar de "fallo"
+        with self._candado:
+            fila_id = self._exactas.get((ruta, normalizar_consulta(pregunta)))
+            if fila_id is not None:
+                entrada = self._entradas[fila_id]
+                if entrada.caduca > ahora:
+                    self._entradas.move_to_end(fila_id)
+                    self._contar(ruta, "exacto")
+                    return entrada.respuesta, vector
+                self._quitar(fila_id)
+                caducada = True
+            indice = self._indices.get(ruta)
+            if indice is None or indice.ntotal == len(self._borrados[ruta]):
+                self._contar(ruta, "caducado" if caducada else "fallo")
+                return None, vector
+        if vector is None:
+            vector = self.model.encode([pregunta])  # Sin el candado: puede tardar
+        vector = _normalizado(vector)
+        buscadas = entidades(pregunta) if self.mismas_entidades else None
+        with self._candado:
+            indice = self._indices[ruta]
+            borrados = self._borrados[ruta]
+            # Se piden de más para saltar los ocultos (aún en el índice) y los de otras entidades
+            k = min(indice.ntotal, len(borrados) + CANDIDATOS)
+            similitudes, ids = indice.search(vector, k) if k else ([[]], [[]])
+            for similitud, fila_id in zip(similitudes[0], map(int, ids[0])):
+                if fila_id < 0 or similitud < self.umbral:
+                    break
+                if fila_id in borrados:
+                    continue
+                entrada = self._entradas[fila_id]
+                if buscadas is not None and entrada.entidades != buscadas:
+                    continue
+                if entrada.caduca <= ahora:
+                    self._quitar(fila_id)
+                    caducada = True
+                    continue
+                self._entradas.move_to_end(fila_id)
+                self._contar(ruta, "semantico")
+                return entrada.respuesta, vector
+            self._contar(ruta, "caducado" if caducada else "fallo")
+        return None, vector
+
+    # --- Escritura ---
+    def guardar(self, ruta, pregunta, respuesta, vector=None):
+        """Guarda la respuesta de `ruta` durante su TTL (con TTL 0 no se guarda)."""
+        ttl = self.ttl_de(ruta)
+        if not ttl or ttl <= 0:
+            return
+        import faiss
+        if vector is None:
+            vector = self.model.encode([pregunta])
+        vector = _normalizado(vector)
+        clave = normalizar_consulta(pregunta)
+        with self._candado:
+            anterior = self._exactas.get((ruta, clave))
+            if anterior is not None:
+                self._quitar(anterior)
+            fila_id = self._siguiente_id
+            self._siguiente_id += 1
+            self._entradas[fila_id] = _Entrada(ruta, clave, entidades(pregunta), respuesta, self.reloj() + ttl)
+            self._exactas[(ruta, clave)] = fila_id
+            indice = self._indices.get(ruta)
+            if indice is None:
+                indice = self._indices[ruta] = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+            indice.add_with_ids(vector, _ids([fila_id]))
+            while len(self._entradas) > self.capacidad:
+                self._quitar(next(iter(self._entradas)))  # La menos usada
+                self.expulsadas += 1
+            self._compactar()
+
+    def purgar(self):
+        """Quita ya todas las entradas caducadas; devuelve cuántas."""
+        ahora = self.reloj()
+        with self._candado:
+            caducadas = [fila_id for fila_id, e in self._entradas.items() if e.caduca <= ahora]
+            for fila_id in caducadas:
+                self._quitar(fila_id)
+            self._compactar()
+        return len(caducadas)
+
+    def _quitar(self, fila_id):
+        """Saca una entrada de la caché; su vector queda oculto hasta compactar (con el candado)."""
+        entrada = self._entradas.pop(fila_id)
+        if self._exactas.get((entrada.ruta, entrada.clave)) == fila_id:
+            del self._exactas[(entrada.ruta, entrada.clave)]
+        self._borrados[entrada.ruta].add(fila_id)
+
+    def _compactar(self):
+        """Quita del índice los vectores ocultos cuando son muchos (con el candado)."""
+        for ruta, borrados in self._borrados.items():
+            indice = self._indices[ruta]
+            if len(borrados) >= max(64, indice.ntotal // 10):
+                indice.remove_ids(_ids(sorted(borrados)))
+                borrados.clear()
+
+    # --- Métricas ---
+    def _contar(self, ruta, resultado):
+        self._contadores[ruta][resultado] += 1
+        if self.metricas is not None:
+            self.metricas.contar("cache_respuestas_total", ruta=ruta, resultado=resultado)
+
+    def estadisticas(self):
+        """Aciertos exactos y semánticos, fallos y caducadas, en total y por ruta."""
+        with self._candado:
+            por_ruta = {ruta: _con_tasa(dict(c)) for ruta, c in self._contadores.items()}
+            total = _con_tasa({r: sum(c[r] for c in self._contadores.values()) for r in RESULTADOS})
+            return {**total, "entradas": len(self._entradas), "expulsadas": self.expulsadas, "por_ruta": por_ruta}
+
+
+def _con_tasa(contadores):
+    consultas = sum(contadores[r] for r in RESULTADOS)
+    aciertos = contadores["exacto"] + contadores["semantico"]
+    return {**contadores, "tasa_aciertos": aciertos / consultas if consultas else 0.0}
+
+
+def _normalizado(vector):
+    """Matriz (1, d) float32 de norma 1: el producto interno es la similitud coseno."""
+    import numpy as np
+    vector = np.array(vector, dtype="float32").reshape(1, -1)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def _ids(ids):
+    import numpy as np
+    return np.asarray(ids, dtype="int64")
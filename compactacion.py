@@ -0,0 +1,267 @@
+# === Compactación de las memorias persistentes (ejemplos 05 y 06) ===
+# `05_memoria.db`, `06_memoria.db` y el snapshot FAISS solo crecían. Una pasada
+# de compactación:
+#
+# 1. Retención por sesión: borra los mensajes con más de `max_dias` días y los
+#    que quedan fuera de los `max_mensajes` más recientes. `politicas` admite
+#    límites distintos por sesión.
+# 2. Plegado de casi duplicados: dentro de una sesión y un rol, los mensajes
+#    con el mismo texto normalizado (sin mayúsculas, tildes, puntuación ni
+#    espacios de más) se pliegan en el más reciente, que suma sus `repeticiones`.
+# 3. Índices: los vectores de las filas borradas se ocultan al momento y el
+#    índice FAISS se reconstruye sin ellos; FTS5 fusiona sus segmentos, se
+#    actualizan las estadísticas del planificador, se devuelven las páginas
+#    libres al sistema (auto_vacuum incremental) y se trunca el WAL.
+#
+# Todo va en transacciones cortas y con una conexión propia: en modo WAL los
+# lectores no se bloquean y la cola de escritura espera, como mucho, un lote.
+# `Compactador` ejecuta las pasadas en un hilo en segundo plano mientras el
+# grafo sigue atendiendo.
+#
+# Uso: python compactacion.py 06_memoria.db [--faiss 06_memoria.faiss] [--dias 90] [--max-mensajes 5000]
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from memoria_sqlite import inicializar_db
+
+
+def clave_texto(texto):
+    """Texto normalizado para detectar casi duplicados ("¡Hola,  qué tal!" -> "hola que tal")."""
+    sin_tildes = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    # Un mensaje sin palabras (solo emojis o signos) solo se pliega con otro idéntico
+    return " ".join(re.findall(r"\w+", sin_tildes.lower())) or texto.strip()
+
+
+def sesiones(conn):
+    return [fila[0] for fila in conn.execute("SELECT DISTINCT session_id FROM historial")]
+
+
+def filas_caducadas(conn, session_id, max_dias=None, max_mensajes=None, ahora=None):
+    """
+    {id: rol} de los mensajes de la sesión que descarta la retención: los
+    anteriores a `max_dias` días y los que no están entre los `max_mensajes`
+    más recientes. Los mensajes sin fecha (bases antiguas) solo caducan por número.
+    """
+    filas = {}
+    if max_dias is not None:
+        limite = (ahora or time.time()) - max_dias * 86400
+        filas.update(conn.execute(
+            "SELECT id, rol FROM historial WHERE session_id = ? AND creado_en < ?", (session_id, limite)))
+    if max_mensajes is not None:
+        filas.update(conn.execute(
+            "SELECT id, rol FROM historial WHERE session_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (session_id, max_mensajes)))
+    return filas
+
+
+def filas_duplicadas(conn, session_id):
+    """
+    Casi duplicados de la sesión: [(id, rol, id superviviente, repeticiones)]
+    de cada mensaje que se pliega en la copia más reciente de su mismo rol.
+    """
+    supervivientes, plegadas = {}, []
+    for fila_id, rol, contenido, repeticiones in conn.execute(
+        "SELECT id, rol, contenido, repeticiones FROM historial WHERE session_id = ? ORDER BY id DESC", (session_id,)
+    ):
+        superviviente = supervivientes.setdefault((rol, clave_texto(contenido or "")), fila_id)
+        if superviviente != fila_id:
+            plegadas.append((fila_id, rol, superviviente, repeticiones))
+    return plegadas
+
+
+def borrar_filas(conn, filas, lote=500):
+    """
+    Borra [(id, superviviente, repeticiones)] en transacciones de `lote` filas;
+    las repeticiones se suman al superviviente (si lo hay) en la misma
+    transacción. Los triggers mantienen el índice FTS5. Genera los ids de cada lote ya confirmado.
+    """
+    for inicio in range(0, len(filas), lote):
+        bloque = filas[inicio:inicio + lote]
+        sumas = {}
+        for _, superviviente, repeticiones in bloque:
+            if superviviente is not None:
+                sumas[superviviente] = sumas.get(superviviente, 0) + repeticiones
+        with conn:
+            conn.execute(f"DELETE FROM historial WHERE id IN ({','.join('?' * len(bloque))})",
+                         [fila_id for fila_id, _, _ in bloque])
+            conn.executemany("UPDATE historial SET repeticiones = repeticiones + ? WHERE id = ?",
+                             [(suma, fila_id) for fila_id, suma in sumas.items()])
+        yield [fila_id for fila_id, _, _ in bloque]
+
+
+def optimizar_indices(conn, paginas=1000, presupuesto_fts=500):
+    """
+    Mantenimiento incremental de SQLite, en pasos cortos que no bloquean a los
+    lectores: fusiona los segmentos de FTS5, actualiza las estadísticas del
+    planificador, libera páginas y trunca el WAL si ningún lector lo usa.
+    Devuelve las páginas liberadas.
+    """
+    try:
+        while True:
+            # Cada 'merge' escribe unas `presupuesto_fts` páginas (negativo: en cualquier nivel,
+            # hasta dejar un solo segmento); si cambia menos de 2 filas, ya no queda nada
+            antes = conn.total_changes
+            with conn:
+                conn.execute("INSERT INTO historial_fts (historial_fts, rank) VALUES ('merge', ?)", (-presupuesto_fts,))
+            if conn.total_changes - antes < 2:
+                break
+    except sqlite3.OperationalError:  # SQLite sin FTS5
+        pass
+    conn.execute("PRAGMA optimize")
+    liberadas = 0
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+        while (libres := conn.execute("PRAGMA freelist_count").fetchone()[0]) > 0:
+            # executescript ejecuta el pragma hasta el final (con execute libera una página por paso)
+            conn.executescript(f"PRAGMA incremental_vacuum({paginas})")
+            liberadas += libres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return liberadas
+
+
+def vacuum_completo(conn):
+    """
+    VACUUM que además activa auto_vacuum incremental en una base creada sin él.
+    Reescribe todo el fichero y bloquea a los escritores mientras dura: para
+    hacerlo una vez, sin el grafo en marcha.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def tamano(conn):
+    """Bytes del fichero de la base (incluidas las páginas libres que aún no se han devuelto)."""
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+class Compactador:
+    """
+    Pasadas de compactación sobre la base `ruta`, con su propia conexión.
+
+    `max_dias` y `max_mensajes` son los límites por defecto de cada sesión;
+    `politicas` los cambia para sesiones concretas: {"ana": {"max_mensajes": 100}}.
+    Con `memoria` (MemoriaVectorial) los vectores de los mensajes borrados se
+    ocultan al momento y el índice se reconstruye sin ellos. `ejecutar()` hace
+    una pasada; `iniciar()` las hace en un hilo, una vez o cada `intervalo` segundos.
+    """
+
+    def __init__(self, ruta, memoria=None, max_dias=None, max_mensajes=None, plegar=True, politicas=None,
+                 intervalo=None, lote=500, informe=print):
+        self.ruta = ruta
+        self.memoria = memoria
+        self.max_dias = max_dias
+        self.max_mensajes = max_mensajes
+        self.plegar = plegar
+        self.politicas = politicas or {}
+        self.intervalo = intervalo
+        self.lote = lote
+        self.informe = informe
+        self.ultima = None  # Estadísticas de la última pasada
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def ejecutar(self):
+        """Una pasada completa. Devuelve las estadísticas."""
+        inicio = time.monotonic()
+        estadisticas = {"caducados": 0, "plegados": 0, "vectores": 0, "paginas_liberadas": 0}
+        conn = sqlite3.connect(self.ruta, timeout=30)  # Espera su turno si la cola de escritura está escribiendo
+        try:
+            estadisticas["bytes_antes"] = tamano(conn)
+            for sesion in sesiones(conn):
+                if self._parar.is_set():
+                    break
+                politica = {"max_dias": self.max_dias, "max_mensajes": self.max_mensajes,
+                            **self.politicas.get(sesion, {})}
+                caducadas = filas_caducadas(conn, sesion, **politica)
+                estadisticas["caducados"] += self._borrar(conn, [(i, rol, None, 0) for i, rol in caducadas.items()])
+                if self.plegar:
+                    estadisticas["plegados"] += self._borrar(conn, filas_duplicadas(conn, sesion))
+            if self.memoria is not None and not self._parar.is_set() and (
+                self.memoria.eliminados or estadisticas["caducados"] or estadisticas["plegados"]
+            ):
+                estadisticas["vectores"] = self.memoria.reconstruir(conn)
+            if not self._parar.is_set():
+                estadisticas["paginas_liberadas"] = optimizar_indices(conn)
+            estadisticas["bytes_despues"] = tamano(conn)
+        finally:
+            conn.close()
+        estadisticas["segundos"] = time.monotonic() - inicio
+        self.ultima = estadisticas
+        return estadisticas
+
+    def _borrar(self, conn, filas):
+        """Borra [(id, rol, superviviente, repeticiones)] y oculta los vectores de los mensajes de usuario."""
+        usuario = {fila_id for fila_id, rol, _, _ in filas if rol == "usuario"}
+        borradas = 0
+        for ids in borrar_filas(conn, [(fila_id, s, r) for fila_id, _, s, r in filas], self.lote):
+            borradas += len(ids)
+            if self.memoria is not None:
+                self.memoria.eliminar([i for i in ids if i in usuario])
+        return borradas
+
+    # --- Hilo en segundo plano ---
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="compactacion", daemon=True)
+        self._hilo.start()
+        return self
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            try:
+                e = self.ejecutar()
+                self.informe(f"🧹 Compactación: {e['caducados']} caducados, {e['plegados']} plegados, "
+                             f"{e['vectores']} vectores descartados, {e['bytes_antes'] - e['bytes_despues']} bytes "
+                             f"liberados en {e['segundos']:.1f} s")
+            except Exception as error:  # Un fallo no detiene el grafo; se reintenta en la siguiente pasada
+                self.informe(f"⚠️ Compactación fallida: {error!r}")
+            if self.intervalo is None or self._parar.wait(self.intervalo):
+                return
+
+    def esperar(self, timeout=None):
+        """Espera a que termine la pasada en curso (si no hay intervalo, la única)."""
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def cerrar(self):
+        """Detiene el hilo al acabar el paso en curso (una pasada a medias se completa en la siguiente)."""
+        self._parar.set()
+        self.esperar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retención, plegado de duplicados y compactación de la memoria")
+    parser.add_argument("db", help="Base SQLite (05_memoria.db o 06_memoria.db)")
+    parser.add_argument("--faiss", help="Snapshot FAISS que se reconstruye sin los mensajes borrados (06)")
+    parser.add_argument("--codificacion", choices=("float32", "fp16", "sq8", "pq"), default="float32",
+                        help="Codificación del snapshot (la misma que en 06)")
+    parser.add_argument("--dias", type=float, help="Borra los mensajes con más de estos días")
+    parser.add_argument("--max-mensajes", type=int, help="Mensajes más recientes que se conservan por sesión")
+    parser.add_argument("--sin-plegar", action="store_true", help="No pliega los casi duplicados")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="VACUUM completo al final (activa auto_vacuum incremental en bases antiguas)")
+    args = parser.parse_args()
+
+    inicializar_db(args.db).close()  # Migra el esquema (columna repeticiones)
+    memoria = None
+    if args.faiss:
+        import faiss
+        from memoria_vectorial import cargar_memoria
+        if os.path.exists(args.faiss):
+            dimension = faiss.read_index(args.faiss, faiss.IO_FLAG_MMAP).d
+            memoria = cargar_memoria(args.faiss, dimension, args.codificacion)
+    compactador = Compactador(args.db, memoria, args.dias, args.max_mensajes, plegar=not args.sin_plegar)
+    e = compactador.ejecutar()
+    conn = sqlite3.connect(args.db)
+    if memoria is not None and not e["vectores"]:
+        e["vectores"] = memoria.reconstruir(conn)  # Vectores de filas borradas en pasadas anteriores
+    if args.vacuum:
+        vacuum_completo(conn)
+        e["bytes_despues"] = tamano(conn)
+    conn.close()
+    print(f"🧹 {e['caducados']} caducados, {e['plegados']} plegados, {e['vectores']} vectores descartados, "
+          f"{e['bytes_antes'] / 1e6:.1f} MB -> {e['bytes_despues'] / 1e6:.1f} MB en {e['segundos']:.1f} s")
@@ -0,0 +1,394 @@
+# === Embeddings compartidos por la indexación y la búsqueda del ejemplo 06 ===
+# La caché evita codificar dos veces el mismo texto: `nodo_input` lo indexa y
+# `nodo_llm` lo vuelve a usar como consulta en la misma vuelta del grafo.
+#
+# numpy y sentence_transformers se importan solo al codificar por primera vez,
+# para que arrancar un proceso no cueste varios segundos. Con
+# `python embeddings.py --servir` se lanza un proceso que mantiene el modelo
+# cargado y al que varios workers se conectan en lugar de cargar cada uno su copia.
+#
+# `multiprocessing.connection` deserializa con pickle lo que recibe, así que
+# conectarse al anfitrión equivale a poder ejecutar código en él: por defecto
+# escucha en un socket Unix con permisos 0600 y una clave aleatoria en un fichero
+# 0600 a su lado; por TCP hay que dar la clave en EMBEDDINGS_AUTHKEY.
+
+import argparse
+import hashlib
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Dimensiones conocidas: permiten preparar el índice sin cargar el modelo
+DIMENSIONES = {"all-MiniLM-L6-v2": 384}
+
+# Variables de entorno para usar el proceso con el modelo ya cargado
+VARIABLE_HOST = "EMBEDDINGS_HOST"          # p. ej. "embeddings.sock" o "127.0.0.1:6100"
+VARIABLE_CLAVE = "EMBEDDINGS_AUTHKEY"
+DIRECCION_POR_DEFECTO = "embeddings.sock"
+
+
+class ModeloPerezoso:
+    """
+    SentenceTransformer que se importa y carga en el primer `encode`.
+    Si se conoce la dimensión, consultarla no obliga a cargar el modelo.
+    """
+
+    def __init__(self, nombre="all-MiniLM-L6-v2", dimension=None):
+        self.nombre = nombre
+        self.dimension = dimension or DIMENSIONES.get(nombre)
+        self._modelo = None
+        self._candado = threading.Lock()
+
+    @property
+    def modelo(self):
+        if self._modelo is None:
+            with self._candado:
+                if self._modelo is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._modelo = SentenceTransformer(self.nombre)
+        return self._modelo
+
+    def get_sentence_embedding_dimension(self):
+        if self.dimension is None:
+            self.dimension = self.modelo.get_sentence_embedding_dimension()
+        return self.dimension
+
+    def encode(self, textos):
+        return self.modelo.encode(textos)
+
+
+def _direccion(texto):
+    """'host:puerto' -> tupla TCP; cualquier otra cosa es un socket Unix o una tubería."""
+    host, separador, puerto = texto.rpartition(":")
+    if separador and puerto.isdigit():
+        return (host, int(puerto))
+    return texto
+
+
+def _es_socket_unix(direccion):
+    return isinstance(direccion, str) and not direccion.startswith("\\\\")  # Tuberías de Windows: \\.\pipe\...
+
+
+def _ruta_clave(direccion):
+    """Fichero con la clave del anfitrión, junto al socket Unix."""
+    return direccion + ".key"
+
+
+def _clave_autenticacion(direccion, crear=False):
+    """
+    Clave compartida con el anfitrión: la de EMBEDDINGS_AUTHKEY o, con un socket
+    Unix, la del fichero 0600 que el anfitrión genera a su lado (`crear=True`).
+    Nunca hay una clave por defecto.
+    """
+    clave = os.environ.get(VARIABLE_CLAVE)
+    if clave:
+        return clave.encode("utf-8")
+    if not _es_socket_unix(direccion):
+        raise RuntimeError(
+            f"Para usar el anfitrión de embeddings en {direccion!r} define {VARIABLE_CLAVE} "
+            "(o usa un socket Unix, que genera su propia clave)"
+        )
+    ruta = _ruta_clave(direccion)
+    if crear:
+        clave = secrets.token_hex(32)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "w") as fichero:
+            fichero.write(clave)
+        os.replace(temporal, ruta)
+        return clave.encode("utf-8")
+    try:
+        with open(ruta, encoding="utf-8") as fichero:
+            return fichero.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        raise RuntimeError(f"No existe {ruta}: ¿está en marcha `python embeddings.py --servir`?") from None
+
+
+class ModeloRemoto:
+    """
+    Cliente del proceso anfitrión (`python embeddings.py --servir`).
+    Tiene la misma interfaz que SentenceTransformer; los vectores viajan como arrays numpy.
+    """
+
+    def __init__(self, direccion):
+        from multiprocessing.connection import Client
+        direccion = _direccion(direccion)
+        self._conexion = Client(direccion, authkey=_clave_autenticacion(direccion))
+        self._candado = threading.Lock()
+        self._dimension = None
+
+    def _pedir(self, *mensaje):
+        with self._candado:  # Una petición en vuelo por conexión
+            self._conexion.send(mensaje)
+            respuesta = self._conexion.recv()
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            self._dimension = self._pedir("dimension")
+        return self._dimension
+
+    def encode(self, textos):
+        return self._pedir("encode", list(textos))
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+def cargar_modelo(nombre="all-MiniLM-L6-v2"):
+    """
+    Devuelve el modelo del proceso anfitrión si EMBEDDINGS_HOST está definida
+    o, si no, un modelo local que se carga en el primer uso.
+    """
+    direccion = os.environ.get(VARIABLE_HOST)
+    if direccion:
+        return ModeloRemoto(direccion)
+    return ModeloPerezoso(nombre)
+
+
+class CacheEmbeddings:
+    """
+    Caché direccionada por contenido (hash del texto -> vector float32).
+
+    - Nivel 1: LRU en memoria con `capacidad` entradas.
+    - Nivel 2 (opcional): tabla SQLite con los vectores como BLOB, si se da `ruta`.
+
+    Expone la misma interfaz que SentenceTransformer (`encode` y
+    `get_sentence_embedding_dimension`), así que puede usarse en su lugar.
+    """
+
+    def __init__(self, model, nombre_modelo="all-MiniLM-L6-v2", capacidad=10_000, ruta=None):
+        self.model = model
+        self.nombre_modelo = nombre_modelo
+        self.capacidad = capacidad
+        self._lru = OrderedDict()
+        self._candado = threading.Lock()
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self._conn = None
+        if ruta is not None:
+            self._conn = sqlite3.connect(ruta, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (hash BLOB PRIMARY KEY, vector BLOB)"
+            )
+            self._conn.commit()
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _clave(self, texto):
+        # El nombre del modelo forma parte de la clave: otro modelo, otros vectores
+        return hashlib.sha1(f"{self.nombre_modelo}\0{texto}".encode("utf-8")).digest()
+
+    def encode(self, textos):
+        """Devuelve una matriz (n, dimensión) float32, codificando solo los fallos."""
+        import numpy as np
+        claves = [self._clave(t) for t in textos]
+        vectores = [None] * len(textos)
+        with self._candado:
+            for i, clave in enumerate(claves):
+                vector = self._lru.get(clave)
+                if vector is not None:
+                    self._lru.move_to_end(clave)
+                    self.aciertos_memoria += 1
+                    vectores[i] = vector
+        pendientes = [i for i, v in enumerate(vectores) if v is None]
+        if pendientes and self._conn is not None:
+            pendientes = self._leer_disco(claves, vectores, pendientes)
+        if pendientes:
+            nuevos = np.asarray(self.model.encode([textos[i] for i in pendientes]), dtype="float32")
+            for i, vector in zip(pendientes, nuevos):
+                vectores[i] = vector
+            with self._candado:
+                self.fallos += len(pendientes)
+            if self._conn is not None:
+                with self._candado, self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO embeddings (hash, vector) VALUES (?, ?)",
+                        [(claves[i], vectores[i].tobytes()) for i in pendientes],
+                    )
+        with self._candado:
+            for clave, vector in zip(claves, vectores):
+                self._lru[clave] = vector
+                self._lru.move_to_end(clave)
+            while len(self._lru) > self.capacidad:
+                self._lru.popitem(last=False)
+        if not vectores:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        return np.vstack(vectores)
+
+    def _leer_disco(self, claves, vectores, pendientes):
+        """Rellena desde SQLite los vectores que no estaban en memoria."""
+        import numpy as np
+        encontrados = {}
+        with self._candado:
+            # Consultas por bloques para no superar el límite de parámetros de SQLite
+            for inicio in range(0, len(pendientes), 500):
+                bloque = [claves[i] for i in pendientes[inicio:inicio + 500]]
+                marcadores = ",".join("?" * len(bloque))
+                filas = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({marcadores})", bloque
+                )
+                for clave, blob in filas:
+                    encontrados[clave] = np.frombuffer(blob, dtype="float32")
+            restantes = []
+            for i in pendientes:
+                vector = encontrados.get(claves[i])
+                if vector is None:
+                    restantes.append(i)
+                else:
+                    vectores[i] = vector
+                    self.aciertos_disco += 1
+        return restantes
+
+    def estadisticas(self):
+        """Contadores de aciertos y fallos de la caché."""
+        total = self.aciertos_memoria + self.aciertos_disco + self.fallos
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_disco": self.aciertos_disco,
+            "fallos": self.fallos,
+            "tasa_aciertos": (total - self.fallos) / total if total else 0.0,
+        }
+
+
+class PlanificadorEmbeddings:
+    """
+    Micro-batching de peticiones concurrentes.
+
+    Cada llamada a `enviar` devuelve un Future; un hilo en segundo plano junta
+    las peticiones de todas las conversaciones activas y las codifica con un
+    único `model.encode`, hasta `max_lote` textos o `max_espera` segundos desde
+    la primera petición del lote. Tiene la interfaz de SentenceTransformer.
+    """
+
+    def __init__(self, model, max_lote=64, max_espera=0.005):
+        self.model = model
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.lotes = 0
+        self.textos = 0
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name="planificador-embeddings", daemon=True)
+        self._hilo.start()
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def enviar(self, texto):
+        """Encola un texto y devuelve un Future que se resuelve con su vector."""
+        futuro = Future()
+        self._cola.put((texto, futuro))
+        return futuro
+
+    def encode(self, textos):
+        """Versión bloqueante: envía todos los textos y espera sus vectores."""
+        import numpy as np
+        futuros = [self.enviar(t) for t in textos]
+        if not futuros:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        return np.vstack([f.result() for f in futuros])
+
+    def cerrar(self):
+        self._cola.put((None, None))
+        self._hilo.join()
+
+    def _bucle(self):
+        import numpy as np
+        terminar = False
+        while not terminar:
+            lote = []
+            item = self._cola.get()  # Espera bloqueante a la primera petición
+            limite = time.monotonic() + self.max_espera
+            while True:
+                if item[1] is None:  # cerrar(): se atiende lo acumulado y se sale
+                    terminar = True
+                    break
+                lote.append(item)
+                restante = limite - time.monotonic()
+                if len(lote) >= self.max_lote or restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+            if not lote:
+                continue
+            try:
+                vectores = np.asarray(self.model.encode([t for t, _ in lote]), dtype="float32")
+            except Exception as error:
+                for _, futuro in lote:
+                    futuro.set_exception(error)
+                continue
+            self.lotes += 1
+            self.textos += len(lote)
+            for (_, futuro), vector in zip(lote, vectores):
+                futuro.set_result(vector)
+
+
+# --- Proceso anfitrión del modelo ---
+def servir(direccion=DIRECCION_POR_DEFECTO, nombre="all-MiniLM-L6-v2"):
+    """
+    Carga el modelo una sola vez y atiende peticiones de varios workers,
+    un hilo por conexión. Las peticiones simultáneas se agrupan en lotes.
+    En un socket Unix, el socket y su clave solo los puede abrir el mismo usuario.
+    """
+    from multiprocessing.connection import Listener
+
+    modelo = ModeloPerezoso(nombre)
+    modelo.encode(["calentamiento"])  # Carga los pesos antes de aceptar conexiones
+    planificador = PlanificadorEmbeddings(modelo)
+
+    def atender(conexion):
+        with conexion:
+            while True:
+                try:
+                    operacion, *argumentos = conexion.recv()
+                except EOFError:
+                    return
+                try:
+                    if operacion == "encode":
+                        respuesta = planificador.encode(argumentos[0])
+                    elif operacion == "dimension":
+                        respuesta = modelo.get_sentence_embedding_dimension()
+                    else:
+                        respuesta = ValueError(f"Operación desconocida: {operacion!r}")
+                except Exception as error:
+                    respuesta = error
+                conexion.send(respuesta)
+
+    direccion = _direccion(direccion)
+    clave = _clave_autenticacion(direccion, crear=True)
+    # Con umask 077 el socket se crea ya con permisos 0600, sin ventana abierta
+    mascara = os.umask(0o077) if _es_socket_unix(direccion) else None
+    try:
+        servidor = Listener(direccion, authkey=clave)
+    finally:
+        if mascara is not None:
+            os.umask(mascara)
+    with servidor:
+        print(f"🧠 Modelo {nombre} listo en {direccion}")
+        while True:
+            conexion = servidor.accept()
+            threading.Thread(target=atender, args=(conexion,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proceso anfitrión del modelo de embeddings")
+    parser.add_argument("--servir", action="store_true", help="Carga el modelo y atiende a los workers")
+    parser.add_argument("--direccion", default=DIRECCION_POR_DEFECTO,
+                        help="Ruta de un socket Unix o host:puerto (este con EMBEDDINGS_AUTHKEY)")
+    parser.add_argument("--modelo", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+    if args.servir:
+        servir(args.direccion, args.modelo)
+    else:
+        parser.print_help()
@@ -0,0 +1,319 @@
+# === Enrutador de intenciones compartido por los ejemplos 03–06 ===
+# Sustituye las cadenas if/elif de `nodo_llm` ("precio" in pregunta.lower(), ...)
+# por una tabla de rutas que se compila una sola vez en dos expresiones regulares:
+# un trie con todas las palabras clave y una alternancia con los patrones regex.
+# Clasificar un texto es una sola pasada en C, sin importar cuántas rutas haya.
+#
+# `EnrutadorSemantico` añade un modo por embeddings (ejemplo 06): compara el
+# vector de la pregunta, que ya se calcula para la búsqueda en FAISS, con el
+# centroide de unas frases de ejemplo por ruta, y si no hay suficiente
+# confianza recurre a las palabras clave.
+#
+# Un mensaje puede tener varias intenciones ("precio del paraguas si hace mal
+# clima"): `clasificar_todas` devuelve todas sus rutas y `condicion_varias`
+# las pasa a `add_conditional_edges`, que ejecuta sus nodos en paralelo. Las
+# respuestas de las ramas se unen en el canal `respuestas` de `EstadoRutas`.
+
+import re
+from typing import Annotated, TypedDict
+
+
+class Ruta:
+    """
+    Una intención: nombre de la ruta, palabras clave (se buscan como subcadenas,
+    sin distinguir mayúsculas) y patrones regex opcionales.
+    Gana la ruta con menor `prioridad`; a igual prioridad, la que va antes en la tabla.
+    """
+
+    def __init__(self, nombre, palabras=(), patrones=(), prioridad=0):
+        self.nombre = nombre
+        self.palabras = [p.lower() for p in palabras]
+        self.patrones = list(patrones)
+        self.prioridad = prioridad
+
+
+def regex_trie(palabras):
+    """
+    Convierte una lista de palabras en una regex con forma de trie, p. ej.
+    ["precio", "precios", "presupuesto"] -> "pre(?:cio(?:s)?|supuesto)".
+    """
+    trie = {}
+    for palabra in palabras:
+        nodo = trie
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[""] = {}  # Fin de palabra
+
+    def convertir(nodo):
+        ramas = [re.escape(c) + convertir(hijo) for c, hijo in sorted(nodo.items()) if c]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        return f"(?:{cuerpo})?" if "" in nodo else cuerpo
+
+    return convertir(trie)
+
+
+class Enrutador:
+    """
+    Motor de rutas compilado a partir de una tabla de `Ruta`.
+
+    - `clasificar(texto)` devuelve el nombre de la ruta (o `por_defecto`).
+    - `condicion` y `destinos()` se pasan directamente a `add_conditional_edges`.
+    """
+
+    def __init__(self, rutas, por_defecto="general", campo="ultimo_input"):
+        self.rutas = list(rutas)
+        self.por_defecto = por_defecto
+        self.campo = campo
+        # Rango de cada ruta: (prioridad, posición en la tabla); menor gana
+        rango = {r.nombre: (r.prioridad, i) for i, r in enumerate(self.rutas)}
+
+        # Palabra clave -> mejor rango entre las rutas que la usan, incluidas las
+        # palabras clave que son prefijo suyo (el trie devuelve la coincidencia más
+        # larga en cada posición, así no se pierde "pre" si también existe "precio")
+        mejor = {}
+        for ruta in self.rutas:
+            for palabra in ruta.palabras:
+                mejor[palabra] = min(mejor.get(palabra, rango[ruta.nombre]), rango[ruta.nombre])
+        self._rango_palabra = {
+            palabra: min(mejor[palabra[:i]] for i in range(1, len(palabra) + 1) if palabra[:i] in mejor)
+            for palabra in mejor
+        }
+        # Para clasificar_todas: los rangos de todas las rutas de la palabra y de sus prefijos
+        todas = {}
+        for ruta in self.rutas:
+            for palabra in ruta.palabras:
+                todas.setdefault(palabra, set()).add(rango[ruta.nombre])
+        self._rangos_palabra = {
+            palabra: frozenset().union(*(todas[palabra[:i]] for i in range(1, len(palabra) + 1) if palabra[:i] in todas))
+            for palabra in todas
+        }
+        self._nombre = {r: nombre for nombre, r in rango.items()}
+        # Búsqueda anticipada (?=...) para encontrar coincidencias solapadas en cada posición
+        self._palabras = re.compile(f"(?=({regex_trie(mejor)}))") if mejor else None
+
+        grupos, self._rango_grupo = [], {}
+        for ruta in sorted(self.rutas, key=lambda r: rango[r.nombre]):
+            for patron in ruta.patrones:
+                grupo = f"g{len(grupos)}"
+                grupos.append(f"(?P<{grupo}>{patron})")
+                self._rango_grupo[grupo] = rango[ruta.nombre]
+        self._patrones = re.compile("(?=" + "|".join(grupos) + ")", re.IGNORECASE) if grupos else None
+
+    def clasificar(self, texto):
+        """Devuelve la ruta de mayor precedencia que coincide con el texto."""
+        texto = (texto or "").lower()  # Una sola vez, no una por rama
+        ganador = None
+        if self._palabras is not None:
+            for coincidencia in self._palabras.finditer(texto):
+                r = self._rango_palabra[coincidencia.group(1)]
+                if ganador is None or r < ganador:
+                    ganador = r
+        if self._patrones is not None:
+            for coincidencia in self._patrones.finditer(texto):
+                r = self._rango_grupo[coincidencia.lastgroup]
+                if ganador is None or r < ganador:
+                    ganador = r
+        return self.por_defecto if ganador is None else self._nombre[ganador]
+
+    def clasificar_todas(self, texto):
+        """
+        Todas las rutas que coinciden con el texto, de mayor a menor precedencia
+        (["finanzas", "clima"] para "precio del paraguas si hace mal clima"), o
+        [por_defecto] si no coincide ninguna. Es la misma pasada que `clasificar`.
+        """
+        texto = (texto or "").lower()
+        rangos = set()
+        if self._palabras is not None:
+            for coincidencia in self._palabras.finditer(texto):
+                rangos |= self._rangos_palabra[coincidencia.group(1)]
+        if self._patrones is not None:
+            for coincidencia in self._patrones.finditer(texto):
+                rangos.add(self._rango_grupo[coincidencia.lastgroup])
+        return [self._nombre[r] for r in sorted(rangos)] or [self.por_defecto]
+
+    def condicion(self, state):
+        """Para add_conditional_edges: la ruta ya decidida por el nodo o, si no hay, la clasificada."""
+        return state.get("ruta") or self.clasificar(state.get(self.campo, ""))
+
+    def condicion_varias(self, state):
+        """
+        Para add_conditional_edges con varias intenciones: las rutas ya decididas
+        por el nodo (state["rutas"]) o, si no hay, las clasificadas. LangGraph
+        ejecuta en paralelo los nodos de todas ellas.
+        """
+        return state.get("rutas") or self.clasificar_todas(state.get(self.campo, ""))
+
+    def destinos(self):
+        """Mapa ruta -> nodo para add_conditional_edges (cada ruta va al nodo del mismo nombre)."""
+        nombres = [r.nombre for r in self.rutas] + [self.por_defecto]
+        return {nombre: nombre for nombre in dict.fromkeys(nombres)}
+
+
+# Tabla de rutas de los ejemplos: añadir una intención es añadir una línea aquí
+# (y el nodo con el mismo nombre en el grafo)
+RUTAS = [
+    Ruta("finanzas", palabras=["precio"]),
+    Ruta("clima", palabras=["clima"]),
+]
+
+ENRUTADOR = Enrutador(RUTAS, por_defecto="general")
+
+
+class EnrutadorSemantico:
+    """
+    Enrutador por similitud con centroides de frases de ejemplo.
+
+    - `ejemplos`: ruta -> frases de ejemplo. Sus vectores se calculan con un
+      único `model.encode` la primera vez que se clasifica y se promedian en un
+      centroide normalizado por ruta (una matriz rutas × dimensión).
+    - `clasificar(texto, vector)` usa el vector ya calculado de la pregunta: un
+      producto matricial y un argmax. Si la similitud coseno máxima no llega a
+      `umbral`, decide el enrutador de palabras clave `respaldo`.
+    - `clasificar_todas(texto, vector)` reparte la pregunta entre varias rutas
+      solo si, además de llegar a `umbral`, quedan a menos de `margen` de la
+      mejor: una pregunta de una intención suele parecerse algo a todas.
+    """
+
+    def __init__(self, model, ejemplos, umbral=0.5, respaldo=None, margen=0.1):
+        self.model = model
+        self.ejemplos = {ruta: list(frases) for ruta, frases in ejemplos.items()}
+        self.umbral = umbral
+        self.margen = margen
+        self.respaldo = respaldo or ENRUTADOR
+        self.nombres = list(self.ejemplos)
+        self._centroides = None
+        self.semanticas = 0  # Decisiones tomadas por similitud
+        self.respaldos = 0   # Decisiones tomadas por palabras clave
+
+    @property
+    def centroides(self):
+        if self._centroides is None:
+            import numpy as np
+            frases = [f for ruta in self.nombres for f in self.ejemplos[ruta]]
+            vectores = _normalizar(np.asarray(self.model.encode(frases), dtype="float32"))
+            centroides, inicio = [], 0
+            for ruta in self.nombres:
+                fin = inicio + len(self.ejemplos[ruta])
+                centroides.append(vectores[inicio:fin].mean(axis=0))
+                inicio = fin
+            self._centroides = _normalizar(np.vstack(centroides))
+        return self._centroides
+
+    def puntuar(self, vectores):
+        """Similitud coseno (n, rutas) de n vectores con cada centroide."""
+        import numpy as np
+        vectores = _normalizar(np.asarray(vectores, dtype="float32").reshape(-1, self.centroides.shape[1]))
+        return vectores @ self.centroides.T
+
+    def clasificar_lote(self, textos, vectores):
+        """Clasifica n textos con sus n vectores en una sola multiplicación."""
+        similitudes = self.puntuar(vectores)
+        mejores = similitudes.argmax(axis=1)
+        rutas = []
+        for texto, fila, mejor in zip(textos, similitudes, mejores):
+            if fila[mejor] >= self.umbral:
+                self.semanticas += 1
+                rutas.append(self.nombres[mejor])
+            else:
+                self.respaldos += 1
+                rutas.append(self.respaldo.clasificar(texto))
+        return rutas
+
+    def clasificar(self, texto, vector=None):
+        """Ruta del texto; sin vector solo se usan las palabras clave."""
+        if vector is None:
+            self.respaldos += 1
+            return self.respaldo.clasificar(texto)
+        return self.clasificar_lote([texto], vector)[0]
+
+    def clasificar_todas(self, texto, vector=None):
+        """
+        Rutas cuya similitud llega a `umbral` y a la de la mejor menos `margen`
+        (de mayor a menor), más las que encuentran las palabras clave; sin
+        ninguna, la ruta por defecto.
+        """
+        palabras = self.respaldo.clasificar_todas(texto)
+        if vector is None:
+            self.respaldos += 1
+            return palabras
+        import numpy as np
+        similitudes = self.puntuar(vector)[0]
+        minima = max(self.umbral, float(similitudes.max()) - self.margen)
+        semanticas = [self.nombres[i] for i in np.argsort(-similitudes) if similitudes[i] >= minima]
+        if semanticas:
+            self.semanticas += 1
+        else:
+            self.respaldos += 1
+        por_defecto = self.respaldo.por_defecto
+        rutas = list(dict.fromkeys(semanticas + [r for r in palabras if r != por_defecto]))
+        return rutas or [por_defecto]
+
+    def condicion(self, state):
+        return self.respaldo.condicion(state)
+
+    def condicion_varias(self, state):
+        return self.respaldo.condicion_varias(state)
+
+    def destinos(self):
+        return {**{nombre: nombre for nombre in self.nombres}, **self.respaldo.destinos()}
+
+
+# --- Despacho a varias rutas ---
+def fusionar_respuestas(actuales, nuevas):
+    """
+    Reducer del canal `respuestas` (ruta -> respuesta): une lo que devuelven las
+    ramas que se ejecutan en paralelo. Es idempotente, así que un nodo que
+    devuelve el estado completo no duplica nada, y `None` lo vacía (nuevo turno).
+    """
+    if nuevas is None:
+        return {}
+    return {**(actuales or {}), **nuevas}
+
+
+class EstadoRutas(TypedDict, total=False):
+    """
+    Canales comunes de los grafos 03–06. LangGraph solo conserva las claves
+    declaradas: cada ejemplo hereda de esta clase y añade las suyas.
+    """
+    ultimo_input: str
+    ruta: str    # Ruta principal (la de mayor precedencia)
+    rutas: list  # Todas las rutas del mensaje: sus nodos se ejecutan en paralelo
+    respuestas: Annotated[dict, fusionar_respuestas]
+
+
+def respuestas_en_orden(state):
+    """Respuestas de las ramas en el orden de state["rutas"], no en el que terminaron."""
+    respuestas = state.get("respuestas") or {}
+    return [respuestas[ruta] for ruta in state.get("rutas") or () if ruta in respuestas]
+
+
+def _normalizar(matriz):
+    import numpy as np
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+
+# Frases de ejemplo de cada ruta para el modo semántico: cubren las formas de
+# preguntar que no contienen la palabra clave ("¿cuánto cuesta BTC?")
+EJEMPLOS = {
+    "finanzas": [
+        "¿cuánto cuesta BTC?",
+        "¿cuánto vale un bitcoin hoy?",
+        "cotización del dólar frente al euro",
+        "¿a cuánto está el oro?",
+        "¿cómo van las acciones de Apple en bolsa?",
+        "¿ha subido el ethereum esta semana?",
+        "quiero invertir en criptomonedas",
+    ],
+    "clima": [
+        "¿va a llover mañana?",
+        "¿qué tiempo hace hoy?",
+        "temperatura en Madrid ahora",
+        "¿hace frío fuera?",
+        "previsión meteorológica para el fin de semana",
+        "¿necesito paraguas esta tarde?",
+        "¿hará sol el sábado?",
+    ],
+}
@@ -0,0 +1,34 @@
+# === Herramientas simuladas de las ramas del ejemplo 06 ===
+# En producción, finanzas, clima y general llaman a APIs externas o a un LLM.
+# Aquí cada herramienta devuelve una respuesta de ejemplo tras una espera artificial
+# (`latencia`, en segundos), suficiente para medir la caché de respuestas y el
+# despacho en paralelo sin depender de la red.
+
+import time
+
+
+class HerramientaSimulada:
+    """
+    Herramienta local: `herramienta(pregunta)` espera `latencia` s y devuelve
+    `respuesta` (o `respuesta(pregunta)` si es una función).
+    """
+
+    def __init__(self, respuesta, latencia=0.0):
+        self.respuesta = respuesta
+        self.latencia = latencia
+        self.llamadas = 0
+
+    def __call__(self, pregunta):
+        self.llamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        return self.respuesta(pregunta) if callable(self.respuesta) else self.respuesta
+
+
+def herramientas_simuladas(latencia=0.0):
+    """Una herramienta por ruta del enrutador, con las respuestas de ejemplo de 06."""
+    return {
+        "finanzas": HerramientaSimulada("📊 Precio BTC: 42k (ejemplo).", latencia),
+        "clima": HerramientaSimulada("☀️ Hoy soleado con 25°C (ejemplo).", latencia),
+        "general": HerramientaSimulada("🤖 Gracias por tu consulta.", latencia),
+    }
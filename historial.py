@@ -0,0 +1,161 @@
+# === Historial de conversación acotado (ejemplos 02 y 04) ===
+# Sustituye la lista de diccionarios de state["historial"], que crece sin
+# límite, por un contenedor compacto:
+#
+# - Cada mensaje es un `Mensaje` con __slots__ (sin diccionario por instancia).
+# - Solo los `ventana` mensajes más recientes viven en memoria, en un búfer
+#   circular: añadir y leer los últimos turnos es O(1).
+# - Los mensajes que salen de la ventana se desbordan a SQLite (un fichero
+#   temporal, o `ruta` si se quiere conservar) y se pueden seguir leyendo. Al
+#   abrir otra vez la misma `ruta`, lo desbordado antes sigue ahí y los mensajes
+#   nuevos van a continuación.
+
+import sqlite3
+
+
+class Mensaje:
+    """Un mensaje del historial: rol y contenido."""
+
+    __slots__ = ("rol", "contenido")
+
+    def __init__(self, rol, contenido):
+        self.rol = rol
+        self.contenido = contenido
+
+    def __repr__(self):
+        return f"Mensaje({self.rol!r}, {self.contenido!r})"
+
+    def __eq__(self, otro):
+        return isinstance(otro, Mensaje) and (self.rol, self.contenido) == (otro.rol, otro.contenido)
+
+
+class HistorialAcotado:
+    """
+    Historial con ventana deslizante de `ventana` mensajes en memoria.
+
+    `len()` cuenta todos los mensajes de la conversación, y los índices son los
+    de una lista con todos ellos: los de la ventana se leen del búfer y los
+    anteriores de SQLite. Con `desbordar=False` los antiguos se descartan.
+    Con `ruta`, los mensajes ya desbordados en ese fichero son los primeros de
+    la conversación.
+    """
+
+    def __init__(self, ventana=50, ruta=None, desbordar=True, lote=64):
+        if ventana < 1:
+            raise ValueError("La ventana debe tener al menos un mensaje")
+        self.ventana = ventana
+        self.ruta = ruta
+        self.desbordar = desbordar
+        self.lote = lote
+        self._bufer = [None] * ventana  # Búfer circular
+        self._inicio = 0                # Posición del mensaje más antiguo de la ventana
+        self._en_ventana = 0
+        self._total = 0                 # Mensajes añadidos desde el principio
+        self._pendientes = []           # Desbordados aún sin escribir
+        self._conn = None               # Se abre en el primer desbordamiento
+        if ruta is not None and desbordar:
+            # Se continúa a partir de lo que ya se desbordó en el fichero
+            ultima = self._conexion().execute("SELECT MAX(posicion) FROM desbordado").fetchone()[0]
+            self._total = 0 if ultima is None else ultima + 1
+
+    def __len__(self):
+        return self._total
+
+    @property
+    def desbordados(self):
+        """Número de mensajes que ya no están en la ventana."""
+        return self._total - self._en_ventana
+
+    def append(self, rol, contenido=None):
+        """Añade un mensaje (`append(rol, contenido)` o `append(Mensaje(...))`)."""
+        mensaje = rol if isinstance(rol, Mensaje) else Mensaje(rol, contenido)
+        if self._en_ventana == self.ventana:
+            # Ventana llena: el más antiguo sale y su hueco lo ocupa el nuevo
+            if self.desbordar:
+                self._pendientes.append((self._total - self._en_ventana, self._bufer[self._inicio]))
+                if len(self._pendientes) >= self.lote:
+                    self.volcar()
+            self._bufer[self._inicio] = mensaje
+            self._inicio = (self._inicio + 1) % self.ventana
+        else:
+            self._bufer[(self._inicio + self._en_ventana) % self.ventana] = mensaje
+            self._en_ventana += 1
+        self._total += 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._total
+        if not 0 <= i < self._total:
+            raise IndexError("Índice fuera del historial")
+        primero_en_ventana = self._total - self._en_ventana
+        if i >= primero_en_ventana:
+            return self._bufer[(self._inicio + i - primero_en_ventana) % self.ventana]
+        if not self.desbordar:
+            raise IndexError(f"El mensaje {i} ya salió de la ventana y no se guardó")
+        self.volcar()
+        rol, contenido = self._conexion().execute(
+            "SELECT rol, contenido FROM desbordado WHERE posicion = ?", (i,)
+        ).fetchone()
+        return Mensaje(rol, contenido)
+
+    def recientes(self, n=None):
+        """Los `n` mensajes más recientes de la ventana (todos si n es None), del más antiguo al más nuevo."""
+        n = self._en_ventana if n is None else min(n, self._en_ventana)
+        fin = self._inicio + self._en_ventana
+        return [self._bufer[j % self.ventana] for j in range(fin - n, fin)]
+
+    def __iter__(self):
+        """Recorre toda la conversación: primero lo desbordado (por páginas) y después la ventana."""
+        if self.desbordar and self.desbordados:
+            self.volcar()
+            desde = -1
+            while True:
+                filas = self._conexion().execute(
+                    "SELECT posicion, rol, contenido FROM desbordado WHERE posicion > ? ORDER BY posicion LIMIT 500",
+                    (desde,),
+                ).fetchall()
+                for _, rol, contenido in filas:
+                    yield Mensaje(rol, contenido)
+                if len(filas) < 500:
+                    break
+                desde = filas[-1][0]
+        yield from self.recientes()
+
+    def __repr__(self):
+        return f"HistorialAcotado({self._total} mensajes, {self._en_ventana} en memoria: {self.recientes()!r})"
+
+    # --- Desbordamiento a disco ---
+    def _conexion(self):
+        if self._conn is None:
+            # "" crea una base temporal en disco que SQLite borra al cerrarla
+            self._conn = sqlite3.connect(self.ruta or "", check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS desbordado (posicion INTEGER PRIMARY KEY, rol TEXT, contenido TEXT)"
+            )
+        return self._conn
+
+    def volcar(self):
+        """Escribe en SQLite los mensajes desbordados pendientes, en una transacción."""
+        if not self._pendientes:
+            return
+        conn = self._conexion()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO desbordado (posicion, rol, contenido) VALUES (?, ?, ?)",
+                [(posicion, m.rol, m.contenido) for posicion, m in self._pendientes],
+            )
+        self._pendientes.clear()
+
+    def cerrar(self):
+        """
+        Escribe lo pendiente y cierra la base de desbordamiento. Con `ruta`
+        también se escribe la ventana, para retomar la conversación completa.
+        """
+        if self.ruta is not None and self.desbordar:
+            primero = self._total - self._en_ventana
+            self._pendientes.extend(enumerate(self.recientes(), primero))
+            self._conexion()
+        if self._conn is not None:
+            self.volcar()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,244 @@
+# === Ingesta masiva de conversaciones (SQLite + FAISS del ejemplo 06) ===
+# Importa historiales en JSONL, una línea por mensaje:
+#
+#   {"rol": "usuario", "contenido": "¿qué precio tiene BTC?", "session_id": "ana", "creado_en": 1700000000.0}
+#
+# (`session_id` y `creado_en` son opcionales). Los mensajes se escriben en
+# `historial` por lotes, con un `executemany` y un commit por lote, y los de
+# usuario se codifican en lotes grandes repartidos entre un pool de procesos,
+# cada uno con su copia del modelo. El resultado es el mismo que si se hubieran
+# escrito en 06: las filas en SQLite (y en su índice FTS5) y los vectores en el
+# snapshot FAISS.
+#
+# Se puede interrumpir y volver a lanzar:
+# - SQLite: el desplazamiento en el fichero se guarda en la tabla `ingesta` en
+#   la misma transacción que cada lote, así nunca se duplica ni se pierde una línea.
+# - FAISS: los vectores se añaden en el orden de los ids, así que el snapshot
+#   cubre siempre todas las filas hasta su `ultimo_id`. Al arrancar se codifican
+#   primero las filas de SQLite posteriores a él.
+# - Una última línea sin salto de línea (un fichero que aún se está escribiendo)
+#   no se ingiere ni se cuenta: el punto de control queda antes de ella y se lee
+#   en la siguiente ejecución, ya completa.
+#
+# Uso: python ingesta.py conversaciones.jsonl [--db 06_memoria.db] [--faiss 06_memoria.faiss] [--procesos 4]
+
+import argparse
+import functools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from embeddings import cargar_modelo
+from memoria_sqlite import SESION_POR_DEFECTO, inicializar_db
+
+# Modelo de cada proceso del pool (se carga una vez, en el inicializador)
+_modelo = None
+
+
+def _iniciar_proceso(fabrica_modelo):
+    global _modelo
+    _modelo = fabrica_modelo()
+
+
+def _codificar(textos):
+    import numpy as np
+    return np.asarray(_modelo.encode(textos), dtype="float32")
+
+
+def _tabla_ingesta(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingesta (
+            fichero TEXT PRIMARY KEY,
+            desplazamiento INTEGER NOT NULL,  -- Bytes del fichero ya escritos en historial
+            lineas INTEGER NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def punto_de_control(conn, fichero):
+    """(desplazamiento en bytes, líneas) ya ingeridos de `fichero`, o (0, 0)."""
+    fila = conn.execute("SELECT desplazamiento, lineas FROM ingesta WHERE fichero = ?", (fichero,)).fetchone()
+    return fila or (0, 0)
+
+
+def leer_registros(lineas):
+    """Convierte líneas JSONL en filas (rol, contenido, session_id, creado_en); devuelve (filas, descartadas)."""
+    filas, descartadas = [], 0
+    ahora = time.time()
+    for linea in lineas:
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+            filas.append((
+                registro["rol"], registro["contenido"],
+                registro.get("session_id") or SESION_POR_DEFECTO, registro.get("creado_en") or ahora,
+            ))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            descartadas += 1
+    return filas, descartadas
+
+
+class Codificador:
+    """
+    Encola lotes de (ids, textos, sesiones) para codificar y añade los vectores
+    a la memoria en el mismo orden en que se enviaron, con como mucho
+    `en_vuelo` lotes pendientes (el lector no se adelanta sin límite).
+    """
+
+    def __init__(self, memoria, modelo, pool=None, lote=512, en_vuelo=8):
+        self.memoria = memoria
+        self.modelo = modelo
+        self.pool = pool
+        self.lote = lote
+        self.en_vuelo = en_vuelo
+        self.codificados = 0
+        self._pendientes = deque()
+
+    def enviar(self, ids, textos, sesiones):
+        for inicio in range(0, len(ids), self.lote):
+            bloque = textos[inicio:inicio + self.lote]
+            if self.pool is not None:
+                futuro = self.pool.submit(_codificar, bloque)
+            else:
+                futuro = Future()
+                futuro.set_result(self.modelo.encode(bloque))
+            self._pendientes.append((ids[inicio:inicio + self.lote], sesiones[inicio:inicio + self.lote], futuro))
+            while len(self._pendientes) > self.en_vuelo:
+                self._recoger()
+
+    def _recoger(self):
+        ids, sesiones, futuro = self._pendientes.popleft()
+        self.memoria.agregar(ids, futuro.result(), sesiones)
+        self.codificados += len(ids)
+
+    def terminar(self):
+        while self._pendientes:
+            self._recoger()
+
+    def cancelar(self):
+        for _, _, futuro in self._pendientes:
+            futuro.cancel()
+        self._pendientes.clear()
+
+
+def ingerir(ruta_jsonl, ruta_db="06_memoria.db", ruta_faiss="06_memoria.faiss", procesos=None, lote=5000,
+            lote_encode=512, fabrica_modelo=None, codificacion="float32", guardar_cada=200_000, informe=print):
+    """
+    Ingiere `ruta_jsonl` en SQLite y FAISS, retomando desde el último punto de
+    control. `fabrica_modelo` (sin argumentos y serializable con pickle) crea el
+    modelo en cada proceso; por defecto, `cargar_modelo("all-MiniLM-L6-v2")`.
+    Con `procesos=0` se codifica en este mismo proceso. Devuelve las estadísticas.
+    """
+    from memoria_vectorial import cargar_memoria  # Importa faiss y numpy
+
+    fabrica_modelo = fabrica_modelo or functools.partial(cargar_modelo, "all-MiniLM-L6-v2")
+    procesos = os.cpu_count() if procesos is None else procesos
+    fichero = os.path.abspath(ruta_jsonl)
+    conn = inicializar_db(ruta_db)
+    conn.execute("PRAGMA synchronous=NORMAL")  # En WAL es seguro; el punto de control va en cada transacción
+    _tabla_ingesta(conn)
+    desplazamiento, lineas_hechas = punto_de_control(conn, fichero)
+    if desplazamiento > os.path.getsize(ruta_jsonl):
+        raise ValueError(f"{ruta_jsonl} es más corto que su punto de control ({desplazamiento} bytes)")
+
+    modelo = fabrica_modelo()  # Para la dimensión (y para codificar si procesos=0)
+    memoria = cargar_memoria(ruta_faiss, modelo.get_sentence_embedding_dimension(), codificacion)
+    pool = ProcessPoolExecutor(procesos, initializer=_iniciar_proceso, initargs=(fabrica_modelo,)) \
+        if procesos else None
+    codificador = Codificador(memoria, modelo, pool, lote_encode, en_vuelo=2 * max(1, procesos))
+    estadisticas = {"escritos": 0, "descartados": 0, "retomados": 0, "bytes_pendientes": 0}
+    inicio = ultimo_informe = time.monotonic()
+    guardados_hasta = 0
+
+    def informar(final=False):
+        segundos = time.monotonic() - inicio
+        informe(f"{'✅' if final else '📥'} {estadisticas['escritos']} mensajes escritos "
+                f"({estadisticas['escritos'] / segundos:.0f}/s), {codificador.codificados} codificados "
+                f"({codificador.codificados / segundos:.0f}/s), {estadisticas['descartados']} descartados, "
+                f"{segundos:.1f} s")
+        if final and estadisticas["bytes_pendientes"]:
+            informe(f"⏸️ Última línea incompleta ({estadisticas['bytes_pendientes']} bytes): "
+                    "se ingerirá en la próxima ejecución")
+
+    try:
+        # 1. Filas que ya están en SQLite pero no en el snapshot (una ingesta interrumpida)
+        cursor = conn.execute(
+            "SELECT id, contenido, session_id FROM historial WHERE rol = 'usuario' AND id > ? ORDER BY id",
+            (memoria.ultimo_id,),
+        )
+        while filas := cursor.fetchmany(lote):
+            ids, textos, sesiones = zip(*filas)
+            codificador.enviar(list(ids), list(textos), list(sesiones))
+            estadisticas["retomados"] += len(filas)
+
+        # 2. El fichero, desde el punto de control
+        with open(ruta_jsonl, "rb") as entrada:
+            entrada.seek(desplazamiento)
+            while True:
+                lineas = [linea for _, linea in zip(range(lote), entrada)]
+                if lineas and not lineas[-1].endswith(b"\n"):
+                    # Línea a medio escribir: el desplazamiento no la pasa, se lee en la próxima ejecución
+                    estadisticas["bytes_pendientes"] = len(lineas.pop())
+                if not lineas:
+                    break
+                filas, descartadas = leer_registros(lineas)
+                desplazamiento += sum(len(linea) for linea in lineas)
+                lineas_hechas += len(lineas)
+                with conn:  # Lote y punto de control en una sola transacción
+                    if filas:
+                        conn.executemany(
+                            "INSERT INTO historial (rol, contenido, session_id, creado_en) VALUES (?, ?, ?, ?)", filas
+                        )
+                        ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    conn.execute(
+                        "INSERT INTO ingesta (fichero, desplazamiento, lineas) VALUES (?, ?, ?) "
+                        "ON CONFLICT (fichero) DO UPDATE SET desplazamiento = excluded.desplazamiento, "
+                        "lineas = excluded.lineas",
+                        (fichero, desplazamiento, lineas_hechas),
+                    )
+                estadisticas["escritos"] += len(filas)
+                estadisticas["descartados"] += descartadas
+                if filas:
+                    # Dentro de una transacción nadie más escribe: los ids son consecutivos
+                    primer_id = ultimo_id - len(filas) + 1
+                    usuario = [(primer_id + i, fila[1], fila[2]) for i, fila in enumerate(filas) if fila[0] == "usuario"]
+                    if usuario:
+                        ids, textos, sesiones = map(list, zip(*usuario))
+                        codificador.enviar(ids, textos, sesiones)
+                if codificador.codificados - guardados_hasta >= guardar_cada:
+                    memoria.guardar()  # Snapshot intermedio: lo codificado no se repite al retomar
+                    guardados_hasta = codificador.codificados
+                if time.monotonic() - ultimo_informe >= 2:
+                    informar()
+                    ultimo_informe = time.monotonic()
+        codificador.terminar()
+    except BaseException:
+        codificador.cancelar()  # Lo ya añadido al índice se guarda igualmente
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        memoria.guardar()
+        conn.close()
+    informar(final=True)
+    estadisticas.update(codificados=codificador.codificados, segundos=time.monotonic() - inicio, lineas=lineas_hechas)
+    return estadisticas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta masiva de conversaciones en SQLite + FAISS")
+    parser.add_argument("jsonl", help="Fichero con un mensaje JSON por línea")
+    parser.add_argument("--db", default="06_memoria.db")
+    parser.add_argument("--faiss", default="06_memoria.faiss")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="Procesos que codifican (0: ninguno)")
+    parser.add_argument("--lote", type=int, default=5000, help="Líneas por transacción de SQLite")
+    parser.add_argument("--lote-encode", type=int, default=512, help="Textos por llamada al modelo")
+    parser.add_argument("--codificacion", choices=("float32", "fp16", "sq8", "pq"), default="float32")
+    args = parser.parse_args()
+
+    ingerir(args.jsonl, args.db, args.faiss, args.procesos, args.lote, args.lote_encode,
+            codificacion=args.codificacion)
@@ -0,0 +1,268 @@
+# === Instrumentación por nodo de los grafos compilados ===
+# `instrumentar(workflow)` envuelve cada función registrada con `add_node` (y
+# cada función de decisión de `add_conditional_edges`) para medir, por nodo,
+# el tiempo real, el tiempo de CPU y, opcionalmente, la memoria asignada, y
+# contar qué ruta se toma en cada rama. Las medidas van a histogramas de
+# cubetas logarítmicas (registrar es una búsqueda binaria y una suma).
+#
+# Se activa con la variable de entorno METRICAS_GRAFO=<fichero>: al terminar el
+# proceso se escribe en formato de texto de Prometheus o, si el fichero acaba
+# en .json, en JSON. Sin la variable, `instrumentar` devuelve el workflow sin
+# tocar y el coste es nulo.
+
+import atexit
+import bisect
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+
+VARIABLE_FICHERO = "METRICAS_GRAFO"
+VARIABLE_MEMORIA = "METRICAS_GRAFO_MEMORIA"  # "1" para medir también la memoria asignada (tracemalloc)
+
+# Cubetas de 1 µs a ~134 s, cuatro por cada potencia de 2 (error relativo < 19 %)
+_LIMITES = [2 ** (i / 4) * 1e-6 for i in range(4 * 27 + 1)]
+# Cubetas de 1 KB a ~1 GB para la memoria asignada
+_LIMITES_BYTES = [2.0 ** i for i in range(10, 31)]
+
+
+class Histograma:
+    """Histograma de cubetas fijas con suma, mínimo y máximo; seguro entre hilos."""
+
+    def __init__(self, limites=_LIMITES):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)  # La última recoge lo que supera el último límite
+        self.cuenta = 0
+        self.suma = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        self._candado = threading.Lock()
+
+    def registrar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._candado:
+            self.cubetas[i] += 1
+            self.cuenta += 1
+            self.suma += valor
+            if valor < self.minimo:
+                self.minimo = valor
+            if valor > self.maximo:
+                self.maximo = valor
+
+    def percentil(self, p):
+        """Percentil aproximado, interpolando dentro de la cubeta."""
+        if not self.cuenta:
+            return 0.0
+        objetivo = p / 100 * self.cuenta
+        acumulado = 0
+        for i, n in enumerate(self.cubetas):
+            if n and acumulado + n >= objetivo:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.maximo
+                valor = inferior + (superior - inferior) * (objetivo - acumulado) / n
+                return min(max(valor, self.minimo), self.maximo)
+            acumulado += n
+        return self.maximo
+
+    def resumen(self):
+        return {
+            "cuenta": self.cuenta,
+            "suma": self.suma,
+            "min": self.minimo if self.cuenta else 0.0,
+            "max": self.maximo if self.cuenta else 0.0,
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "p99": self.percentil(99),
+        }
+
+
+class Metricas:
+    """
+    Registro de histogramas y contadores con etiquetas.
+    `activa=False` deja los envoltorios en su sitio pero sin medir.
+    """
+
+    def __init__(self, memoria=False):
+        self.activa = True
+        self.memoria = memoria
+        self.histogramas = {}  # (nombre, etiquetas) -> Histograma
+        self.contadores = {}   # (nombre, etiquetas) -> int
+        self._candado = threading.Lock()
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def histograma(self, nombre, limites=_LIMITES, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        histograma = self.histogramas.get(clave)
+        if histograma is None:
+            with self._candado:
+                histograma = self.histogramas.setdefault(clave, Histograma(limites))
+        return histograma
+
+    def contar(self, nombre, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._candado:
+            self.contadores[clave] = self.contadores.get(clave, 0) + 1
+
+    # --- Exportación ---
+    def a_json(self):
+        return {
+            "histogramas": [
+                {"nombre": nombre, "etiquetas": dict(etiquetas), **h.resumen()}
+                for (nombre, etiquetas), h in sorted(self.histogramas.items())
+            ],
+            "contadores": [
+                {"nombre": nombre, "etiquetas": dict(etiquetas), "valor": valor}
+                for (nombre, etiquetas), valor in sorted(self.contadores.items())
+            ],
+        }
+
+    def a_prometheus(self):
+        """Formato de texto de Prometheus (histogramas con una cubeta por potencia de 2)."""
+        lineas, tipos = [], set()
+        for (nombre, etiquetas), h in sorted(self.histogramas.items()):
+            if nombre not in tipos:
+                tipos.add(nombre)
+                lineas.append(f"# TYPE {nombre} histogram")
+            acumulado = 0
+            paso = 4 if h.limites is _LIMITES else 1
+            for i, n in enumerate(h.cubetas[:-1]):
+                acumulado += n
+                if i % paso == 0:
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, le=f'{h.limites[i]:.6g}')} {acumulado}")
+            lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, le='+Inf')} {h.cuenta}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {h.suma:.9g}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {h.cuenta}")
+        for (nombre, etiquetas), valor in sorted(self.contadores.items()):
+            if nombre not in tipos:
+                tipos.add(nombre)
+                lineas.append(f"# TYPE {nombre} counter")
+            lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta):
+        """Escribe las métricas de forma atómica: JSON si la ruta acaba en .json, Prometheus si no."""
+        contenido = json.dumps(self.a_json(), indent=2, ensure_ascii=False) if ruta.endswith(".json") \
+            else self.a_prometheus()
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as fichero:
+            fichero.write(contenido)
+        os.replace(temporal, ruta)
+
+
+def _etiquetas(etiquetas, **extra):
+    pares = list(etiquetas) + list(extra.items())
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+
+
+# --- Envoltorios ---
+def _medir(metricas, nombre, funcion):
+    """Envuelve un nodo (síncrono o async) conservando su firma (LangGraph la inspecciona)."""
+    # Los histogramas se resuelven una vez: en cada llamada solo se registra
+    real = metricas.histograma("langgraph_nodo_segundos", nodo=nombre)
+    cpu = metricas.histograma("langgraph_nodo_cpu_segundos", nodo=nombre)
+    asignada = metricas.histograma("langgraph_nodo_bytes_asignados", _LIMITES_BYTES, nodo=nombre) \
+        if metricas.memoria else None
+    reloj, reloj_cpu = time.perf_counter, time.thread_time
+
+    def registrar(inicio, inicio_cpu, memoria):
+        real.registrar(reloj() - inicio)
+        cpu.registrar(reloj_cpu() - inicio_cpu)
+        if memoria is not None:
+            asignada.registrar(max(0, tracemalloc.get_traced_memory()[0] - memoria))
+
+    def memoria_actual():
+        return tracemalloc.get_traced_memory()[0] if asignada is not None else None
+
+    if inspect.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltorio_async(*args, **kwargs):
+            if not metricas.activa:
+                return await funcion(*args, **kwargs)
+            # En un nodo async el tiempo de CPU incluye el de otras tareas del bucle
+            inicio, inicio_cpu, memoria = reloj(), reloj_cpu(), memoria_actual()
+            try:
+                return await funcion(*args, **kwargs)
+            finally:
+                registrar(inicio, inicio_cpu, memoria)
+        return envoltorio_async
+
+    @functools.wraps(funcion)
+    def envoltorio(*args, **kwargs):
+        if not metricas.activa:
+            return funcion(*args, **kwargs)
+        inicio, inicio_cpu, memoria = reloj(), reloj_cpu(), memoria_actual()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            registrar(inicio, inicio_cpu, memoria)
+    return envoltorio
+
+
+def _medir_ruta(metricas, origen, decidir):
+    """Envuelve la función de decisión de una rama y cuenta la ruta elegida."""
+
+    @functools.wraps(decidir)
+    def envoltorio(*args, **kwargs):
+        if not metricas.activa:
+            return decidir(*args, **kwargs)
+        inicio = time.perf_counter()
+        ruta = decidir(*args, **kwargs)
+        etiqueta = ruta if isinstance(ruta, str) else "+".join(map(str, ruta))
+        metricas.histograma("langgraph_ruta_segundos", origen=origen, ruta=etiqueta).registrar(
+            time.perf_counter() - inicio)
+        metricas.contar("langgraph_ruta_total", origen=origen, ruta=etiqueta)
+        return ruta
+    return envoltorio
+
+
+def instrumentar(workflow, metricas=None):
+    """
+    Instrumenta un StateGraph antes de añadirle nodos: los `add_node` y
+    `add_conditional_edges` posteriores registran funciones envueltas.
+    Sin `metricas` se usa el registro global (METRICAS_GRAFO); si tampoco
+    existe, el workflow se devuelve tal cual.
+    """
+    metricas = metricas or metricas_globales()
+    if metricas is None:
+        return workflow
+    add_node, add_conditional_edges = workflow.add_node, workflow.add_conditional_edges
+
+    def add_node_medido(nodo, accion=None, **opciones):
+        if accion is None and callable(nodo):  # add_node(funcion): el nombre es el de la función
+            nodo, accion = nodo.__name__, nodo
+        if callable(accion):
+            accion = _medir(metricas, nodo, accion)
+        return add_node(nodo, accion, **opciones)
+
+    def add_conditional_edges_medido(origen, decidir, destinos=None):
+        if callable(decidir) and not inspect.iscoroutinefunction(decidir):
+            decidir = _medir_ruta(metricas, origen, decidir)
+        return add_conditional_edges(origen, decidir, destinos)
+
+    workflow.add_node = add_node_medido
+    workflow.add_conditional_edges = add_conditional_edges_medido
+    return workflow
+
+
+_GLOBALES = None
+_CANDADO_GLOBALES = threading.Lock()
+
+
+def metricas_globales():
+    """Registro del proceso si METRICAS_GRAFO está definida (se exporta al salir)."""
+    global _GLOBALES
+    ruta = os.environ.get(VARIABLE_FICHERO)
+    if not ruta:
+        return None
+    with _CANDADO_GLOBALES:
+        if _GLOBALES is None:
+            _GLOBALES = Metricas(memoria=os.environ.get(VARIABLE_MEMORIA) == "1")
+            atexit.register(_GLOBALES.exportar, ruta)
+    return _GLOBALES
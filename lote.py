@@ -0,0 +1,244 @@
+# === Ejecución por lotes de los grafos 05 y 06 (evaluación offline y replay) ===
+# Lee consultas en JSONL (de un fichero o de stdin), una por línea:
+#
+#   {"id": "q1", "pregunta": "¿qué precio tiene BTC?", "session_id": "ana"}
+#
+# (`id` y `session_id` son opcionales; una línea que no es JSON es la pregunta).
+# Las reparte entre un pool de procesos "calientes": cada uno importa el
+# ejemplo, compila el grafo y abre SQLite, el modelo de embeddings y el índice
+# FAISS una sola vez, y después solo ejecuta `grafo.invoke` con la pregunta en
+# lugar de `input()`. Los resultados se escriben en JSONL a medida que salen,
+# en el orden de la entrada (`--en-orden`) o en el que terminan.
+#
+# Todas las consultas de una sesión van al mismo proceso, en orden: su
+# historial, su cursor y sus vectores nuevos (que FAISS busca por sesión) están
+# en ese proceso. El snapshot FAISS se pone al día antes de arrancar el pool y
+# los procesos lo abren con mmap, así que no lo codifica cada uno; los vectores
+# del lote no se guardan en él: los mensajes están en SQLite y el siguiente
+# arranque de 06 (o de este script) los codifica.
+#
+# Uso: python lote.py consultas.jsonl [--ejemplo 6] [--procesos 4] [--en-orden] [--salida resultados.jsonl]
+#      cat consultas.jsonl | python lote.py - > resultados.jsonl
+
+import argparse
+import builtins
+import contextlib
+import functools
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+from embeddings import CacheEmbeddings, cargar_modelo
+from memoria_sqlite import SESION_POR_DEFECTO, ColaEscritura, PoolConexiones, inicializar_db
+
+MODULOS = {5: "05_langgraph_memoria_largo_plazo", 6: "06_langgraph_memoria_hibrida"}
+BASES = {5: "05_memoria.db", 6: "06_memoria.db"}
+
+# Estado de cada proceso del pool (se crea una vez, en el inicializador)
+_worker = None
+
+
+def leer_consultas(lineas):
+    """(id, pregunta, session_id) por cada línea no vacía; el id por defecto es el número de línea."""
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError:
+            registro = linea
+        if not isinstance(registro, dict):
+            registro = {"pregunta": registro if isinstance(registro, str) else linea}
+        yield (registro.get("id", numero), registro.get("pregunta"),
+               registro.get("session_id") or SESION_POR_DEFECTO)
+
+
+def _iniciar_worker(numero, ruta_db, ruta_faiss, fabrica_modelo, umbral, margen, codificacion, espera_commit):
+    """
+    Importa el ejemplo y crea sus recursos una sola vez por proceso. Cada proceso
+    ejecuta un turno a la vez, así que la ventana del commit agrupado
+    (`espera_commit`) solo añadiría latencia: por defecto es 0.
+    """
+    global _worker
+    from enrutador import ENRUTADOR, EJEMPLOS, EnrutadorSemantico
+    from recursos import Recursos
+
+    ejemplo = importlib.import_module(MODULOS[numero])
+    recursos = Recursos(db=PoolConexiones(ruta_db), cola=ColaEscritura(ruta_db, max_espera=espera_commit))
+    if numero == 6:
+        from memoria_vectorial import cargar_memoria
+        recursos.model = CacheEmbeddings(fabrica_modelo())
+        recursos.memoria = cargar_memoria(ruta_faiss, recursos.model.get_sentence_embedding_dimension(),
+                                          codificacion)
+        recursos.memoria.sincronizar(recursos.db.conexion(), recursos.model)  # Solo las sesiones: está al día
+        recursos.enrutador = EnrutadorSemantico(recursos.model, EJEMPLOS, umbral=umbral, respaldo=ENRUTADOR,
+                                                margen=margen)
+    _worker = {"ejemplo": ejemplo, "recursos": recursos, "cursores": {}, "pid": os.getpid()}
+
+
+def _responder(consulta_id, pregunta, session_id):
+    """Un turno del grafo con `pregunta` como input; devuelve el resultado como dict."""
+    from enrutador import respuestas_en_orden
+
+    inicio = time.perf_counter()
+    resultado = {"id": consulta_id, "session_id": session_id, "pregunta": pregunta}
+    if not isinstance(pregunta, str):
+        return {**resultado, "error": "falta 'pregunta'", "worker": _worker["pid"]}
+    recursos, cursores = _worker["recursos"], _worker["cursores"]
+    estado = {"session_id": session_id, "ultimo_id_visto": cursores.get(session_id), "ultimo_input": pregunta,
+              "ruta": None}
+    original = builtins.input
+    builtins.input = lambda _="": pregunta  # nodo_input de 06 lee la pregunta de aquí
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # Los print de los nodos no van a la salida
+            final = _worker["ejemplo"].grafo.invoke(estado, recursos.config())
+    except Exception as error:
+        return {**resultado, "error": repr(error), "worker": _worker["pid"]}
+    finally:
+        builtins.input = original
+    cursores[session_id] = final.get("ultimo_id_visto")
+    return {**resultado, "rutas": final.get("rutas"), "respuestas": respuestas_en_orden(final),
+            "worker": _worker["pid"], "ms": round(1000 * (time.perf_counter() - inicio), 3)}
+
+
+def _cerrar_worker():
+    if _worker is not None:
+        _worker["recursos"].cerrar()  # Escribe lo que quede en la cola
+
+
+def _preparar_faiss(ruta_db, ruta_faiss, fabrica_modelo, codificacion):
+    """Codifica una vez, antes del pool, los mensajes que faltan en el snapshot."""
+    from memoria_vectorial import cargar_memoria
+    model = CacheEmbeddings(fabrica_modelo())
+    memoria = cargar_memoria(ruta_faiss, model.get_sentence_embedding_dimension(), codificacion)
+    conn = inicializar_db(ruta_db)
+    if memoria.sincronizar(conn, model) or not os.path.exists(ruta_faiss):
+        memoria.guardar()
+    conn.close()
+
+
+class _EnProceso:
+    """Sustituto del pool con `procesos=0`: ejecuta cada consulta al enviarla, en este proceso."""
+
+    def __init__(self, initializer, initargs):
+        initializer(*initargs)
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+    def shutdown(self, **_):
+        _cerrar_worker()
+
+
+def ejecutar_lote(consultas, salida, numero=6, ruta_db=None, ruta_faiss="06_memoria.faiss", procesos=None,
+                  en_orden=False, en_vuelo=None, fabrica_modelo=None, umbral=0.5, margen=0.1,
+                  codificacion="float32", espera_commit=0.0, informe=print):
+    """
+    Ejecuta `consultas` ((id, pregunta, session_id)) en el grafo del ejemplo
+    `numero` y escribe un JSON por línea en `salida`. `fabrica_modelo` (sin
+    argumentos y serializable con pickle) crea el modelo en cada proceso; por
+    defecto, `cargar_modelo("all-MiniLM-L6-v2")`. Con `procesos=0` se ejecuta en
+    este mismo proceso. Devuelve las estadísticas.
+    """
+    fabrica_modelo = fabrica_modelo or functools.partial(cargar_modelo, "all-MiniLM-L6-v2")
+    procesos = os.cpu_count() if procesos is None else procesos
+    ruta_db = ruta_db or BASES[numero]
+    en_vuelo = en_vuelo or 8 * max(1, procesos)
+    inicializar_db(ruta_db).close()  # Crea (o migra) el esquema una vez, no en cada proceso
+    if numero == 6:
+        _preparar_faiss(ruta_db, ruta_faiss, fabrica_modelo, codificacion)
+
+    inicio = time.monotonic()
+    argumentos = (numero, ruta_db, ruta_faiss, fabrica_modelo, umbral, margen, codificacion, espera_commit)
+    if procesos:
+        # Un pool de un proceso por worker: así cada sesión va siempre al mismo, y en orden.
+        # "spawn": los procesos no heredan hilos ni el estado de OpenMP de FAISS
+        contexto = get_context("spawn")
+        workers = [ProcessPoolExecutor(1, mp_context=contexto, initializer=_iniciar_worker, initargs=argumentos)
+                   for _ in range(procesos)]
+        for worker in workers:
+            worker.submit(int).result()  # Espera a que todos estén listos antes de medir
+    else:
+        workers = [_EnProceso(_iniciar_worker, argumentos)]
+    arranque = time.monotonic() - inicio
+    estadisticas = {"consultas": 0, "errores": 0, "arranque": arranque}
+    pendientes = deque() if en_orden else set()
+
+    def escribir(futuro):
+        resultado = futuro.result()
+        salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        estadisticas["consultas"] += 1
+        estadisticas["errores"] += "error" in resultado
+
+    try:
+        for consulta_id, pregunta, session_id in consultas:
+            worker = workers[zlib.crc32(session_id.encode("utf-8")) % len(workers)]
+            futuro = worker.submit(_responder, consulta_id, pregunta, session_id)
+            if en_orden:
+                pendientes.append(futuro)
+                while len(pendientes) > en_vuelo or (pendientes and pendientes[0].done()):
+                    escribir(pendientes.popleft())  # Solo sale la más antigua: se espera a ella
+            else:
+                pendientes.add(futuro)
+                # Sale todo lo terminado; con la ventana llena, se espera a la primera que acabe
+                hechos, pendientes = wait(pendientes, timeout=None if len(pendientes) > en_vuelo else 0,
+                                          return_when=FIRST_COMPLETED)
+                for hecho in hechos:
+                    escribir(hecho)
+            salida.flush()
+        while pendientes:
+            if en_orden:
+                escribir(pendientes.popleft())
+            else:
+                hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for hecho in hechos:
+                    escribir(hecho)
+        salida.flush()
+    finally:
+        for worker in workers:
+            if procesos:
+                worker.submit(_cerrar_worker).result()
+            worker.shutdown(cancel_futures=True)
+    segundos = time.monotonic() - inicio - arranque
+    estadisticas.update(segundos=segundos, por_segundo=estadisticas["consultas"] / segundos if segundos else 0.0)
+    informe(f"✅ {estadisticas['consultas']} consultas ({estadisticas['errores']} con error) en {segundos:.1f} s: "
+            f"{estadisticas['por_segundo']:.1f} consultas/s con {procesos} procesos (arranque {arranque:.1f} s)")
+    return estadisticas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejecuta un fichero de consultas en los grafos 05 o 06")
+    parser.add_argument("entrada", help="Fichero JSONL con una consulta por línea, o '-' para stdin")
+    parser.add_argument("--ejemplo", type=int, choices=sorted(MODULOS), default=6)
+    parser.add_argument("--db", help="Base SQLite (por defecto, la del ejemplo)")
+    parser.add_argument("--faiss", default="06_memoria.faiss")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count(), help="Procesos del pool (0: ninguno)")
+    parser.add_argument("--en-orden", action="store_true", help="Resultados en el orden de la entrada")
+    parser.add_argument("--salida", help="Fichero de resultados JSONL (por defecto, stdout)")
+    parser.add_argument("--umbral", type=float, default=0.5, help="Similitud mínima del enrutado semántico")
+    parser.add_argument("--margen", type=float, default=0.1,
+                        help="Distancia máxima a la mejor ruta para repartir la pregunta entre varias")
+    parser.add_argument("--codificacion", choices=("float32", "fp16", "sq8", "pq"), default="float32")
+    parser.add_argument("--espera-commit", type=float, default=0.0,
+                        help="Ventana del commit agrupado de cada proceso, en segundos (06 usa 0.05)")
+    args = parser.parse_args()
+
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    with contextlib.ExitStack() as pila:
+        for fichero in {entrada, salida} - {sys.stdin, sys.stdout}:
+            pila.enter_context(fichero)
+        # El informe va a stderr: stdout puede ser la salida de resultados
+        ejecutar_lote(leer_consultas(entrada), salida, args.ejemplo, args.db, args.faiss, args.procesos,
+                      args.en_orden, umbral=args.umbral, margen=args.margen, codificacion=args.codificacion,
+                      espera_commit=args.espera_commit, informe=functools.partial(print, file=sys.stderr))
@@ -0,0 +1,415 @@
+# === Memoria persistente en SQLite (compartida por los ejemplos 02, 05 y 06) ===
+# Reúne la inicialización de la base de datos y una cola de escritura diferida
+# (write-behind): en lugar de hacer un commit por cada INSERT, un hilo en segundo
+# plano agrupa los mensajes pendientes y los escribe en una sola transacción.
+# Cada mensaje pertenece a una sesión (`session_id`), de modo que varios usuarios
+# comparten la base sin mezclar sus historiales. El índice de texto completo
+# `historial_fts` (FTS5) se mantiene sincronizado con triggers y permite buscar
+# términos exactos (tickers, ids) con BM25.
+
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Marca interna para pedir al hilo escritor que termine
+_FIN = object()
+
+# Sesión usada cuando no se indica ninguna (y para las filas anteriores al esquema con sesiones)
+SESION_POR_DEFECTO = "default"
+
+
+def inicializar_db(ruta):
+    """
+    Inicializa la base de datos y la tabla de historial si no existen.
+    Activa el modo WAL para que las lecturas no bloqueen al escritor.
+    Las bases creadas con el esquema antiguo (id, rol, contenido) se migran
+    añadiendo las columnas de sesión, fecha y repeticiones.
+    Devuelve la conexión SQLite.
+    """
+    conn = sqlite3.connect(ruta)
+    # Solo tiene efecto en una base nueva: las páginas libres se devuelven con incremental_vacuum
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")  # El modo WAL queda guardado en el fichero
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS historial (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rol TEXT,
+            contenido TEXT,
+            session_id TEXT NOT NULL DEFAULT '{SESION_POR_DEFECTO}',
+            creado_en REAL,
+            repeticiones INTEGER NOT NULL DEFAULT 1  -- Casi duplicados plegados en esta fila
+        )
+    """)
+    columnas = {fila[1] for fila in cursor.execute("PRAGMA table_info(historial)")}
+    if "session_id" not in columnas:
+        cursor.execute(f"ALTER TABLE historial ADD COLUMN session_id TEXT NOT NULL DEFAULT '{SESION_POR_DEFECTO}'")
+    if "creado_en" not in columnas:
+        cursor.execute("ALTER TABLE historial ADD COLUMN creado_en REAL")
+    if "repeticiones" not in columnas:
+        cursor.execute("ALTER TABLE historial ADD COLUMN repeticiones INTEGER NOT NULL DEFAULT 1")
+    # Índices compuestos: historial de una sesión por orden de llegada o por rango de fechas
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_sesion_id ON historial (session_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_sesion_fecha ON historial (session_id, creado_en)")
+    crear_indice_texto(conn)
+    conn.commit()
+    return conn
+
+
+def crear_indice_texto(conn):
+    """
+    Crea el índice FTS5 `historial_fts` sobre `historial.contenido` (tabla de
+    contenido externo: no duplica los textos) y los triggers que lo mantienen al
+    día en cada INSERT, UPDATE o DELETE. La sesión también se indexa, para que
+    FTS5 filtre por ella antes de puntuar en lugar de puntuar toda la tabla. Si el índice es nuevo y ya había
+    mensajes, se indexan todos. Devuelve False si SQLite no tiene FTS5.
+    """
+    existia = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'historial_fts'").fetchone()
+    try:
+        # remove_diacritics: "qué" y "que" son el mismo término
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS historial_fts USING fts5(
+                contenido, session_id, content='historial', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError:  # SQLite compilado sin FTS5
+        return False
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS historial_fts_insertar AFTER INSERT ON historial BEGIN
+            INSERT INTO historial_fts (rowid, contenido, session_id) VALUES (new.id, new.contenido, new.session_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS historial_fts_borrar AFTER DELETE ON historial BEGIN
+            INSERT INTO historial_fts (historial_fts, rowid, contenido, session_id)
+            VALUES ('delete', old.id, old.contenido, old.session_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS historial_fts_actualizar AFTER UPDATE OF contenido, session_id ON historial BEGIN
+            INSERT INTO historial_fts (historial_fts, rowid, contenido, session_id)
+            VALUES ('delete', old.id, old.contenido, old.session_id);
+            INSERT INTO historial_fts (rowid, contenido, session_id) VALUES (new.id, new.contenido, new.session_id);
+        END;
+    """)
+    if not existia:
+        conn.execute("INSERT INTO historial_fts (historial_fts) VALUES ('rebuild')")
+    return True
+
+
+class PoolConexiones:
+    """
+    Una conexión SQLite por hilo, abierta en su primer uso.
+    Una conexión no puede usarse desde varios hilos; el pool permite que los
+    nodos la pidan con `conexion()` desde cualquier hilo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._todas = []
+        self._candado = threading.Lock()
+
+    def conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False solo para poder cerrarlas todas desde cerrar()
+            conn = sqlite3.connect(self.ruta, check_same_thread=False)
+            self._local.conn = conn
+            with self._candado:
+                self._todas.append(conn)
+        return conn
+
+    def cerrar(self):
+        with self._candado:
+            for conn in self._todas:
+                conn.close()
+            self._todas.clear()
+        self._local = threading.local()
+
+
+class ColaEscritura:
+    """
+    Escritor en segundo plano con commit agrupado (group commit).
+
+    Un único hilo es dueño de su propia conexión y vuelca los mensajes pendientes
+    con un `executemany` y un único commit por ventana: cuando se juntan `max_lote`
+    mensajes o pasan `max_espera` segundos desde el primero, lo que ocurra antes.
+    Un mensaje urgente (alguien espera ya su id) cierra la ventana al llegar y
+    se escribe enseguida junto con lo que ya estaba encolado.
+
+    Si un lote falla, sus futures y la siguiente marca (flush, marcar, cerrar)
+    reciben la excepción; si el hilo escritor muere, fallan todos los pendientes.
+    """
+
+    def __init__(self, ruta, max_lote=256, max_espera=0.05):
+        self.ruta = ruta
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self._cola = queue.Queue()
+        self._cerrada = False
+        self._error = None  # Primer fallo de un lote desde la última marca
+        self._caida = None  # Excepción con la que murió el hilo escritor
+        self._tomados = []  # Futures ya sacados de la cola y aún sin resolver
+        self._hilo = threading.Thread(target=self._bucle, name="cola-escritura", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, rol, contenido, session_id=SESION_POR_DEFECTO, urgente=False):
+        """
+        Añade un mensaje a la cola sin esperar a la base de datos.
+        Devuelve un Future que se resuelve con el id de la fila una vez confirmada.
+        Con `urgente=True` no se espera a que termine la ventana del commit agrupado.
+        """
+        if self._cerrada:
+            raise RuntimeError("La cola de escritura está cerrada")
+        futuro = Future()
+        self._poner(((rol, contenido, session_id, time.time()), futuro, urgente))
+        return futuro
+
+    def flush(self, timeout=None):
+        """
+        Fuerza la escritura de todo lo pendiente y espera a que esté confirmado
+        en disco. Se llama al final de cada turno.
+        """
+        self.marcar().result(timeout)
+
+    def marcar(self):
+        """
+        Versión no bloqueante de flush(): devuelve un Future que se resuelve
+        cuando todo lo encolado hasta ahora está en disco (útil con asyncio).
+        """
+        marca = Future()
+        self._poner((None, marca, True))
+        return marca
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene el hilo escritor (lanza el error si algo no se escribió)."""
+        if self._cerrada:
+            return
+        try:
+            self.flush()
+        finally:
+            self._cerrada = True
+            self._cola.put((_FIN, None, True))
+            self._hilo.join()
+
+    def _poner(self, item):
+        self._cola.put(item)
+        if self._caida is not None:  # Sin hilo escritor nadie la resolvería: flush() no se cuelga
+            self._fallar_pendientes(self._caida)
+
+    def _fallar_pendientes(self, error):
+        while True:
+            try:
+                _, futuro, _ = self._cola.get_nowait()
+            except queue.Empty:
+                return
+            if futuro is not None and not futuro.done():
+                futuro.set_exception(error)
+
+    # --- Hilo escritor ---
+    def _bucle(self):
+        try:
+            self._escribir_lotes()
+        except BaseException as error:
+            self._caida = RuntimeError(f"El hilo escritor de {self.ruta} ha terminado con un error: {error!r}")
+            self._caida.__cause__ = error
+            for futuro in self._tomados:
+                if not futuro.done():
+                    futuro.set_exception(self._caida)
+            self._fallar_pendientes(self._caida)
+            raise
+
+    def _escribir_lotes(self):
+        conn = sqlite3.connect(self.ruta)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # Cada commit es durable (fsync del WAL)
+        terminar = False
+        while not terminar:
+            lote, marcas = [], []
+            item = self._cola.get()  # Espera bloqueante al primer mensaje de la ventana
+            limite = time.monotonic() + self.max_espera
+            while True:
+                filas, futuro, urgente = item
+                if futuro is not None:
+                    self._tomados.append(futuro)
+                if filas is _FIN:
+                    terminar = True
+                    break
+                if filas is None:  # flush(): se escribe ya lo acumulado
+                    marcas.append(futuro)
+                    break
+                lote.append((filas, futuro))
+                if urgente or len(lote) >= self.max_lote:
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+            self._escribir(conn, lote)
+            if marcas:
+                # Una marca solo se confirma si todo lo anterior a ella está en disco
+                error, self._error = self._error, None
+                for marca in marcas:
+                    if error is None:
+                        marca.set_result(None)
+                    else:
+                        marca.set_exception(error)
+            self._tomados.clear()
+        conn.close()
+
+    def _escribir(self, conn, lote):
+        """Escribe un lote completo en una única transacción y resuelve sus futures."""
+        if not lote:
+            return
+        try:
+            with conn:  # Una transacción (y un commit) por lote
+                conn.executemany(
+                    "INSERT INTO historial (rol, contenido, session_id, creado_en) VALUES (?, ?, ?, ?)",
+                    [filas for filas, _ in lote],
+                )
+                ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        except Exception as error:
+            for _, futuro in lote:
+                futuro.set_exception(error)
+            if self._error is None:
+                self._error = error
+            return
+        # Dentro de una transacción nadie más puede escribir: los ids son consecutivos
+        primer_id = ultimo_id - len(lote) + 1
+        for i, (_, futuro) in enumerate(lote):
+            futuro.set_result(primer_id + i)
+
+
+class LectorSQLite:
+    """
+    Ejecutor acotado para lecturas desde código asíncrono: cada hilo usa su
+    propia conexión del PoolConexiones.
+    """
+
+    def __init__(self, ruta, max_hilos=4):
+        self.pool = PoolConexiones(ruta)
+        self._ejecutor = ThreadPoolExecutor(max_hilos, thread_name_prefix="lectura-sqlite")
+
+    def enviar(self, funcion, *args):
+        """Ejecuta `funcion(conn, *args)` en un hilo lector y devuelve un Future."""
+        return self._ejecutor.submit(lambda: funcion(self.pool.conexion(), *args))
+
+    def cerrar(self):
+        self._ejecutor.shutdown()
+        self.pool.cerrar()
+
+
+def guardar_mensaje(cola, rol, contenido, session_id=SESION_POR_DEFECTO, urgente=False):
+    """
+    Guarda un mensaje de la sesión en la base de datos a través de la cola de escritura.
+    Devuelve un Future con el id de la fila. Si se va a esperar a ese id (p. ej.
+    para indexarlo en FAISS), `urgente=True` lo escribe sin esperar a la ventana.
+    """
+    return cola.encolar(rol, contenido, session_id, urgente)
+
+
+def iterar_historial(conn, session_id=SESION_POR_DEFECTO, desde_id=0, lote=500):
+    """
+    Genera (id, rol, contenido) de la sesión con id > desde_id, en orden.
+    Pagina por clave (keyset: `id > último id de la página`), así cada página
+    cuesta lo mismo aunque la tabla crezca y nunca hay más de `lote` filas en memoria.
+    """
+    cursor = conn.cursor()
+    while True:
+        cursor.execute(
+            "SELECT id, rol, contenido FROM historial WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT ?",
+            (session_id, desde_id, lote),
+        )
+        filas = cursor.fetchall()
+        yield from filas
+        if len(filas) < lote:
+            return
+        desde_id = filas[-1][0]
+
+
+def obtener_ventana(conn, session_id=SESION_POR_DEFECTO, n=20):
+    """Devuelve los `n` mensajes más recientes de la sesión, del más antiguo al más nuevo."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, rol, contenido FROM historial WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+        (session_id, n),
+    )
+    return cursor.fetchall()[::-1]
+
+
+def historial_nuevo(conn, session_id=SESION_POR_DEFECTO, ultimo_id_visto=None, ventana=20):
+    """
+    Mensajes que el grafo aún no ha visto: los posteriores al cursor
+    `ultimo_id_visto` o, si todavía no hay cursor, solo la ventana más reciente.
+    """
+    if ultimo_id_visto is None:
+        yield from obtener_ventana(conn, session_id, ventana)
+    else:
+        yield from iterar_historial(conn, session_id, ultimo_id_visto)
+
+
+def obtener_historial(conn, session_id=SESION_POR_DEFECTO):
+    """
+    Recupera el historial completo de una sesión (usa el índice (session_id, id)).
+    Para recorrer historiales largos es mejor `iterar_historial`.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT rol, contenido FROM historial WHERE session_id = ? ORDER BY id ASC", (session_id,)
+    )
+    return cursor.fetchall()
+
+
+def obtener_textos(conn, ids):
+    """
+    Devuelve {id: contenido} de las filas pedidas (las que no existan no aparecen).
+    La memoria vectorial solo guarda ids: el texto de los k resultados se lee aquí.
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    marcas = ",".join("?" * len(ids))
+    return dict(conn.execute(f"SELECT id, contenido FROM historial WHERE id IN ({marcas})", ids))
+
+
+def consulta_fts(texto, session_id=None):
+    """
+    Convierte texto libre en una consulta FTS5 sobre `contenido`: cada palabra
+    entre comillas (sin operadores ni sintaxis especial) y unidas con OR, para
+    que BM25 ordene por los términos que coincidan. Con `session_id` se añade
+    el filtro por sesión. Devuelve None si no hay palabras.
+    """
+    palabras = re.findall(r"\w+", texto.lower())
+    if not palabras:
+        return None
+    consulta = "contenido : (" + " OR ".join(f'"{palabra}"' for palabra in dict.fromkeys(palabras)) + ")"
+    if session_id is not None:
+        sesion = session_id.replace('"', '""')
+        consulta = f'session_id : "{sesion}" AND {consulta}'
+    return consulta
+
+
+def buscar_lexico(conn, texto, session_id=SESION_POR_DEFECTO, k=10, rol=None):
+    """
+    Devuelve [(id, contenido)] de los `k` mensajes de la sesión más relevantes
+    para `texto` según BM25 (el mejor primero). Con `rol` solo se buscan los
+    mensajes de ese rol. Sin índice FTS5 devuelve una lista vacía.
+    """
+    consulta = consulta_fts(texto, session_id)
+    if consulta is None:
+        return []
+    filtro_rol = "AND h.rol = ?" if rol is not None else ""
+    parametros = (consulta, session_id, rol, k) if rol is not None else (consulta, session_id, k)
+    try:
+        return conn.execute(f"""
+            SELECT h.id, h.contenido FROM historial_fts
+            JOIN historial h ON h.id = historial_fts.rowid
+            WHERE historial_fts MATCH ? AND h.session_id = ? {filtro_rol}
+            ORDER BY bm25(historial_fts, 1.0, 0.0) LIMIT ?
+        """, parametros).fetchall()
+    except sqlite3.OperationalError:  # Base sin índice de texto (SQLite sin FTS5)
+        return []
@@ -0,0 +1,470 @@
+# === Memoria vectorial persistente (FAISS) del ejemplo 06 ===
+# El índice usa como ids los ids de fila de la tabla `historial` de SQLite, así
+# las dos memorias se mantienen sincronizadas. Los textos no se duplican en RAM:
+# el índice solo guarda ids y vectores, y el texto de los k resultados se lee de
+# SQLite. Los vectores pueden guardarse en float16, cuantizados a 8 bits (SQ8)
+# o con cuantización de producto (PQ). El snapshot en disco se abre con mmap
+# (solo lectura) y los vectores nuevos van a un índice "delta" en memoria;
+# `guardar()` fusiona ambos en un snapshot nuevo. Los vectores de filas borradas
+# se ocultan al momento (`eliminar`) y desaparecen del snapshot al reconstruirlo
+# (`reconstruir`), mientras se sigue buscando; hasta entonces sus ids se guardan
+# junto al snapshot (`<ruta>.eliminados`) para que no reaparezcan al reiniciar. Igual que la reconstrucción, la
+# promoción del delta de búsqueda exacta a IVF/HNSW se hace en segundo plano.
+
+import os
+import threading
+from array import array
+from collections import defaultdict
+
+import faiss
+import numpy as np
+
+# Con mmap el snapshot no se copia entero a RAM al arrancar (faiss >= 1.8)
+_FLAGS_LECTURA = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+# Bytes por dimensión: float32 4, fp16 2, sq8 1; pq usa `pq_m` bytes por vector
+CODIFICACIONES = ("float32", "fp16", "sq8", "pq")
+_CUANTIZADORES_SQ = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+# Índice de la memoria del ejemplo 06 y de las herramientas que abren su snapshot
+# (ingesta, compactación, lotes): búsqueda exacta hasta 50k mensajes y, a partir
+# de ahí, HNSW. Todas deben usar las mismas opciones que el grafo
+OPCIONES_INDICE = {"tipo": "hnsw", "umbral": 50_000, "ef_search": 64}
+
+
+def ajustar_busqueda(indice, nprobe=None, ef_search=None):
+    """Fija nprobe (IVF) y efSearch (HNSW) en un índice, ignorando los que no aplican."""
+    parametros = faiss.ParameterSpace()
+    interno = faiss.downcast_index(indice.index) if hasattr(indice, "id_map") else indice
+    if nprobe is not None and hasattr(interno, "nprobe"):
+        parametros.set_index_parameter(indice, "nprobe", nprobe)
+    if ef_search is not None and hasattr(interno, "hnsw"):
+        parametros.set_index_parameter(indice, "efSearch", ef_search)
+
+
+def parametros_filtro(indice, ids):
+    """
+    SearchParameters que limitan la búsqueda a `ids`, conservando el nprobe /
+    efSearch configurados en el índice interno.
+    """
+    selector = faiss.IDSelectorBatch(np.asarray(ids, dtype="int64"))
+    interno = faiss.downcast_index(indice.index)
+    if hasattr(interno, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=interno.hnsw.efSearch), selector
+    if hasattr(interno, "nprobe"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=interno.nprobe), selector
+    return faiss.SearchParameters(sel=selector), selector
+
+
+def extraer_vectores(indice):
+    """Devuelve (vectores, ids) de un índice IndexIDMap, sea Flat, SQ, IVF o HNSW."""
+    interno = faiss.downcast_index(indice.index)
+    if hasattr(interno, "make_direct_map"):
+        interno.make_direct_map()  # IVF: necesario para reconstruir por posición
+    vectores = interno.reconstruct_n(0, indice.ntotal)
+    return vectores, faiss.vector_to_array(indice.id_map)
+
+
+def es_exacto(indice):
+    """True si el índice (con ids) aún no se ha promocionado: Flat o SQ float16."""
+    interno = faiss.downcast_index(indice.index)
+    return isinstance(interno, faiss.IndexFlat) or (
+        isinstance(interno, faiss.IndexScalarQuantizer) and interno.sq.qtype == _CUANTIZADORES_SQ["fp16"])
+
+
+class IndiceAdaptativo:
+    """
+    Índice con ids que empieza como búsqueda exacta y, al superar `umbral`
+    vectores, se promociona automáticamente al índice definitivo:
+
+    - "ivf": IVF entrenado con los vectores existentes (nlist ≈ 4·√n), ajustable con `nprobe`.
+    - "hnsw": grafo HNSW con `m` vecinos por nodo, ajustable con `ef_search`.
+    - "exacto": sigue siendo una búsqueda exhaustiva (solo cambia la codificación).
+
+    `codificacion` fija cómo se guardan los vectores: "float32" (Flat), "fp16",
+    "sq8" o "pq" (`pq_m` subvectores de 8 bits; por defecto dimensión / 8).
+    Hasta la promoción, con cualquier codificación distinta de float32 los
+    vectores se guardan en float16, que no necesita entrenamiento; SQ8 y PQ se
+    entrenan al promocionar, con todos los vectores acumulados.
+
+    Con `add_with_ids(..., promocionar=False)` la promoción queda a cargo de
+    quien llama (`por_promocionar` y `indice_promocionado()`), p. ej. en otro hilo.
+    """
+
+    def __init__(self, dimension, tipo="hnsw", umbral=50_000, nprobe=16, m=32, ef_search=64,
+                 codificacion="float32", pq_m=None):
+        if tipo not in ("ivf", "hnsw", "exacto"):
+            raise ValueError(f"Tipo de índice desconocido: {tipo!r} (usa 'ivf', 'hnsw' o 'exacto')")
+        if codificacion not in CODIFICACIONES:
+            raise ValueError(f"Codificación desconocida: {codificacion!r} (usa {', '.join(CODIFICACIONES)})")
+        self.pq_m = pq_m or dimension // 8
+        if codificacion == "pq" and dimension % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} no divide la dimensión {dimension}")
+        self.dimension = dimension
+        self.tipo = tipo
+        self.umbral = umbral
+        self.nprobe = nprobe
+        self.m = m
+        self.ef_search = ef_search
+        self.codificacion = codificacion
+        if codificacion == "float32":
+            interno = faiss.IndexFlatL2(dimension)
+        else:
+            interno = faiss.IndexScalarQuantizer(dimension, _CUANTIZADORES_SQ["fp16"])
+        self.indice = faiss.IndexIDMap(interno)  # Solo ids de fila (sin mapa inverso)
+        # Un índice exacto en float32 o float16 ya es el definitivo
+        self.promocionado = tipo == "exacto" and codificacion in ("float32", "fp16")
+
+    @property
+    def ntotal(self):
+        return self.indice.ntotal
+
+    @property
+    def por_promocionar(self):
+        return not self.promocionado and self.indice.ntotal >= self.umbral
+
+    def add_with_ids(self, vectores, ids, promocionar=True):
+        self.indice.add_with_ids(vectores, ids)
+        if promocionar and self.por_promocionar:
+            self._promocionar()
+
+    def search(self, consulta, k, params=None):
+        return self.indice.search(consulta, k, params=params)
+
+    def indice_promocionado(self):
+        """
+        Índice nuevo con el tipo y la codificación definitivos y los mismos ids
+        y vectores. Solo lee el índice exacto, que sigue sirviendo búsquedas.
+        """
+        vectores, ids = extraer_vectores(self.indice)
+        interno = self._construir(len(vectores))
+        if not interno.is_trained:
+            interno.train(vectores)
+        nuevo = faiss.IndexIDMap(interno)
+        nuevo.add_with_ids(vectores, ids)
+        ajustar_busqueda(nuevo, self.nprobe, self.ef_search)
+        return nuevo
+
+    def _promocionar(self):
+        self.indice = self.indice_promocionado()
+        self.promocionado = True
+
+    def _construir(self, n):
+        d, codificacion = self.dimension, self.codificacion
+        sq = _CUANTIZADORES_SQ.get(codificacion)
+        if self.tipo == "ivf":
+            # nlist ≈ 4·√n, con al menos ~39 vectores de entrenamiento por centroide
+            nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+            cuantizador = faiss.IndexFlatL2(d)
+            if codificacion == "pq":
+                return faiss.IndexIVFPQ(cuantizador, d, nlist, self.pq_m, 8)
+            if sq is not None:
+                return faiss.IndexIVFScalarQuantizer(cuantizador, d, nlist, sq)
+            return faiss.IndexIVFFlat(cuantizador, d, nlist)
+        if self.tipo == "hnsw":
+            if codificacion == "pq":
+                return faiss.IndexHNSWPQ(d, self.pq_m, self.m)
+            if sq is not None:
+                return faiss.IndexHNSWSQ(d, sq, self.m)
+            return faiss.IndexHNSWFlat(d, self.m)
+        if codificacion == "pq":
+            # IndexPQ no admite filtrar por ids: un IVF de una sola lista recorre
+            # todos los códigos PQ igual, pero acepta el selector de la sesión
+            return faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, 1, self.pq_m, 8)
+        return faiss.IndexScalarQuantizer(d, sq)
+
+
+class MemoriaVectorial:
+    """
+    Índice FAISS indexado por id de fila de SQLite, con snapshot en disco.
+    Solo guarda ids y vectores: el texto de los resultados se lee de SQLite
+    (`memoria_sqlite.obtener_textos`). `opciones_indice` se pasa a
+    IndiceAdaptativo (tipo, umbral, nprobe, ef_search, codificacion...).
+    """
+
+    def __init__(self, dimension, ruta=None, **opciones_indice):
+        self.dimension = dimension
+        self.ruta = ruta
+        self.opciones_indice = opciones_indice
+        self.base = None        # Snapshot cargado con mmap (nunca se modifica)
+        self.delta = self._indice_vacio()  # Vectores añadidos desde el último snapshot
+        self.ultimo_id = 0      # Mayor id de fila ya indexado
+        self.ids_por_sesion = defaultdict(lambda: array("q"))  # session_id -> ids de fila (8 bytes cada uno)
+        self.eliminados = set()  # Ids ocultos en las búsquedas hasta la próxima reconstrucción
+        self.congelado = None   # Delta que se está reconstruyendo o promocionando (se sigue buscando en él)
+        self.error_promocion = None  # Si la promoción en segundo plano falla, el delta sigue exacto
+        self._candado = threading.Lock()  # FAISS no admite añadir y buscar a la vez
+        self._candado_snapshot = threading.Lock()  # Solo un guardar(), reconstruir() o promoción a la vez
+
+    def _indice_vacio(self):
+        return IndiceAdaptativo(self.dimension, **self.opciones_indice)
+
+    def __len__(self):
+        base = self.base.ntotal if self.base is not None else 0
+        congelado = self.congelado.ntotal if self.congelado is not None else 0
+        return base + congelado + self.delta.ntotal
+
+    @classmethod
+    def cargar(cls, ruta, dimension, **opciones_indice):
+        """
+        Abre el snapshot de `ruta` si existe (con mmap) o crea una memoria vacía.
+        """
+        memoria = cls(dimension, ruta, **opciones_indice)
+        if os.path.exists(ruta):
+            memoria.base = memoria._abrir_snapshot()
+            if memoria.base.d != dimension:
+                raise ValueError(
+                    f"El índice {ruta} tiene dimensión {memoria.base.d} y el modelo {dimension}"
+                )
+            if memoria.base.ntotal:
+                memoria.ultimo_id = int(faiss.vector_to_array(memoria.base.id_map).max())
+            if os.path.exists(memoria._ruta_eliminados()):
+                memoria.eliminados = set(np.fromfile(memoria._ruta_eliminados(), dtype="int64").tolist())
+        return memoria
+
+    def _ruta_eliminados(self):
+        return self.ruta + ".eliminados"
+
+    def _guardar_eliminados(self, eliminados):
+        """Escribe de forma atómica los ids ocultos que aún pueden estar en el snapshot."""
+        temporal = self._ruta_eliminados() + ".tmp"
+        np.fromiter(eliminados, "int64", len(eliminados)).tofile(temporal)
+        os.replace(temporal, self._ruta_eliminados())
+
+    def _abrir_snapshot(self):
+        base = faiss.read_index(self.ruta, _FLAGS_LECTURA)
+        opciones = self.opciones_indice
+        ajustar_busqueda(base, opciones.get("nprobe", 16), opciones.get("ef_search", 64))
+        return base
+
+    def agregar(self, ids, vectores, sesiones=None):
+        """
+        Añade vectores asociados a sus ids de fila (y a la sesión de cada fila).
+        Si el delta llega al umbral, se promociona en segundo plano.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        with self._candado:
+            self.delta.add_with_ids(np.asarray(vectores, dtype="float32"), ids, promocionar=False)
+            if len(ids):
+                self.ultimo_id = max(self.ultimo_id, int(ids.max()))
+            if sesiones is not None:
+                for fila_id, sesion in zip(ids.tolist(), sesiones):
+                    self.ids_por_sesion[sesion].append(fila_id)
+            # Si hay un guardar() o reconstruir() en marcha, se promociona en el siguiente agregar()
+            if (self.delta.por_promocionar and self.error_promocion is None
+                    and self._candado_snapshot.acquire(blocking=False)):
+                adaptativo = self.delta
+                self.congelado, self.delta = adaptativo.indice, self._indice_vacio()
+                threading.Thread(target=self._promocionar, args=(adaptativo,),
+                                 name="promocion-faiss", daemon=True).start()
+
+    def _promocionar(self, adaptativo):
+        """
+        Construye el índice promocionado del delta congelado sin el candado de
+        búsqueda (se sigue buscando en el congelado y escribiendo en un delta
+        nuevo) y lo pone como delta, con lo añadido mientras tanto. Se ejecuta
+        con `_candado_snapshot`, tomado en agregar(), y lo suelta al terminar.
+        """
+        try:
+            try:
+                nuevo = adaptativo.indice_promocionado()
+            except BaseException as error:
+                with self._candado:  # Los vectores congelados vuelven al delta, sin promocionar
+                    self.delta.add_with_ids(*extraer_vectores(adaptativo.indice), promocionar=False)
+                    self.congelado = None
+                    self.error_promocion = error
+                raise
+            with self._candado:
+                if self.delta.ntotal:
+                    nuevo.add_with_ids(*extraer_vectores(self.delta.indice))
+                adaptativo.indice, adaptativo.promocionado = nuevo, True
+                self.delta, self.congelado = adaptativo, None
+        finally:
+            self._candado_snapshot.release()
+
+    def buscar(self, vector, k, session_id=None):
+        """
+        Devuelve los ids de las k filas más cercanas, de más a menos similar.
+        Con `session_id` solo se consideran los mensajes de esa sesión.
+        """
+        consulta = np.asarray(vector, dtype="float32").reshape(1, -1)
+        candidatos = []
+        with self._candado:
+            if session_id is not None and not self.ids_por_sesion.get(session_id):
+                return []
+            # Los ids de una sesión ya excluyen los eliminados; sin sesión se filtran después
+            k_indice = k if session_id is not None else k + len(self.eliminados)
+            for indice in (self.base, self.congelado, self.delta.indice):
+                if indice is None or indice.ntotal == 0:
+                    continue
+                params = selector = None
+                if session_id is not None:
+                    # El selector debe seguir vivo mientras dure la búsqueda
+                    params, selector = parametros_filtro(indice, self.ids_por_sesion[session_id])
+                D, I = indice.search(consulta, min(k_indice, indice.ntotal), params=params)
+                candidatos.extend((d, i) for d, i in zip(D[0], I[0]) if i != -1 and i not in self.eliminados)
+        candidatos.sort()
+        return [int(i) for _, i in candidatos[:k]]
+
+    def sincronizar(self, conn, model, lote=1000):
+        """
+        Recupera la sesión de los mensajes del snapshot y codifica, por lotes,
+        solo los mensajes de usuario añadidos a SQLite después de él.
+        """
+        for fila_id, sesion in conn.execute(
+            "SELECT id, session_id FROM historial WHERE rol = 'usuario' AND id <= ? ORDER BY id ASC",
+            (self.ultimo_id,),
+        ):
+            self.ids_por_sesion[sesion].append(fila_id)
+        cursor = conn.execute(
+            "SELECT id, contenido, session_id FROM historial WHERE rol = 'usuario' AND id > ? ORDER BY id ASC",
+            (self.ultimo_id,),
+        )
+        total = 0
+        while filas := cursor.fetchmany(lote):
+            ids, textos, sesiones = zip(*filas)
+            self.agregar(ids, model.encode(list(textos)), sesiones)
+            total += len(filas)
+        return total
+
+    def eliminar(self, ids):
+        """
+        Oculta en las búsquedas los vectores de filas borradas de SQLite. Siguen
+        ocupando sitio en el índice hasta la próxima `reconstruir()`.
+        """
+        borrar = np.unique(np.asarray(ids, dtype="int64"))
+        if not len(borrar):
+            return
+        with self._candado:
+            self.eliminados.update(borrar.tolist())
+            for sesion, ids_sesion in self.ids_por_sesion.items():
+                actuales = np.frombuffer(ids_sesion, dtype="int64") if len(ids_sesion) else None
+                if actuales is not None and (fuera := np.isin(actuales, borrar, assume_unique=True)).any():
+                    restantes = array("q")
+                    restantes.frombytes(actuales[~fuera].tobytes())
+                    self.ids_por_sesion[sesion] = restantes
+
+    def reconstruir(self, conn=None):
+        """
+        Reescribe el snapshot sin los vectores eliminados y, con `conn`, sin los
+        de filas que ya no están en SQLite (p. ej. borradas por otro proceso).
+        El trabajo pesado (extraer, entrenar y construir el índice nuevo) se hace
+        sin el candado de búsqueda: mientras dura se sigue buscando en el
+        snapshot anterior y en el delta congelado, y los vectores nuevos van a
+        un delta vacío. Devuelve el número de vectores descartados.
+        """
+        with self._candado_snapshot:
+            return self._reconstruir(conn)
+
+    def _reconstruir(self, conn=None):
+        """reconstruir() con `_candado_snapshot` ya tomado."""
+        with self._candado:
+            # Del delta actual se encarga la reconstrucción; lo que llegue después, a uno nuevo
+            self.congelado, self.delta = self.delta.indice, self._indice_vacio()
+            base, congelado, corte = self.base, self.congelado, self.ultimo_id
+            eliminados = set(self.eliminados)
+            if base is not None and self.ruta is None:
+                base = faiss.clone_index(base)  # Sin fichero: copia privada para leerla sin candado
+        try:
+            fuentes = [congelado] if congelado.ntotal else []
+            if base is not None and base.ntotal:
+                # Copia modificable: el snapshot abierto con mmap no se toca mientras se busca en él
+                fuentes.append(faiss.read_index(self.ruta) if self.ruta is not None else base)
+            partes = [extraer_vectores(indice) for indice in fuentes]
+            vectores = np.vstack([v for v, _ in partes]) if partes else np.empty((0, self.dimension), "float32")
+            ids = np.concatenate([i for _, i in partes]) if partes else np.empty(0, "int64")
+            conservar = ~np.isin(ids, np.fromiter(eliminados, "int64", len(eliminados)))
+            if conn is not None:
+                # Solo se comparan las filas ya indexadas (id <= corte): las posteriores se conservan
+                existentes = np.fromiter(
+                    (fila[0] for fila in conn.execute(
+                        "SELECT id FROM historial WHERE rol = 'usuario' AND id <= ?", (corte,))), "int64")
+                conservar &= (ids > corte) | np.isin(ids, existentes)
+            adaptativo = self._indice_vacio()
+            if conservar.any():
+                adaptativo.add_with_ids(vectores[conservar], ids[conservar])  # Se promociona si supera el umbral
+            if self.ruta is not None:
+                temporal = self.ruta + ".tmp"
+                faiss.write_index(adaptativo.indice, temporal)
+                os.replace(temporal, self.ruta)
+        except BaseException:
+            with self._candado:  # Los vectores del delta congelado vuelven al delta
+                if congelado.ntotal:
+                    self.delta.add_with_ids(*extraer_vectores(congelado), promocionar=False)
+                self.congelado = None
+            raise
+        with self._candado:
+            self.base = self._abrir_snapshot() if self.ruta is not None else adaptativo.indice
+            self.congelado = None
+            # Los eliminados durante la reconstrucción pueden seguir en el índice nuevo
+            self.eliminados -= eliminados
+            if self.ruta is not None:
+                self._guardar_eliminados(self.eliminados)
+        return int((~conservar).sum())
+
+    def guardar(self):
+        """
+        Fusiona el snapshot y el delta en un índice nuevo y lo escribe de forma
+        atómica (fichero temporal + rename). Espera a la promoción en curso, si
+        la hay; si el snapshot nuevo es exacto y supera el umbral, se promociona
+        después con `reconstruir()`, sin bloquear las búsquedas.
+        """
+        with self._candado_snapshot:
+            with self._candado:
+                promocionar = self._guardar()
+            if promocionar:
+                self._reconstruir()
+
+    def _guardar(self):
+        """
+        Con los dos candados. Los vectores eliminados no se copian al snapshot
+        nuevo salvo los que ya están dentro de un índice promocionado (HNSW no
+        admite quitar vectores); esos siguen ocultos con `<ruta>.eliminados`,
+        que se escribe antes que el snapshot. Devuelve True si el snapshot
+        escrito está por promocionar.
+        """
+        if self.ruta is None:
+            return False
+        self._guardar_eliminados(self.eliminados)
+        if self.delta.ntotal == 0:
+            return False
+        promocionar = False
+        if self.base is not None and not es_exacto(self.base):
+            # Snapshot ya promocionado (IVF/HNSW/SQ8/PQ): se lee una copia modificable
+            # y se añade el delta, sin volver a entrenar ni reconstruir el grafo
+            fusion = faiss.read_index(self.ruta)
+            fusion.add_with_ids(*self._sin_eliminados(self.delta.indice))
+        elif not es_exacto(self.delta.indice):
+            # Delta ya promocionado en segundo plano: se le añade el snapshot exacto
+            fusion = self.delta.indice
+            if self.base is not None and self.base.ntotal:
+                fusion.add_with_ids(*self._sin_eliminados(self.base))
+        else:
+            # Los dos exactos: se juntan sin promocionar, que es caro y se hace sin el candado
+            vectores, ids = self._sin_eliminados(self.delta.indice)
+            if self.base is not None and self.base.ntotal:
+                vectores_base, ids_base = self._sin_eliminados(self.base)
+                vectores, ids = np.vstack([vectores_base, vectores]), np.concatenate([ids_base, ids])
+            adaptativo = self._indice_vacio()
+            adaptativo.add_with_ids(vectores, ids, promocionar=False)
+            fusion = adaptativo.indice
+            promocionar = adaptativo.por_promocionar
+        temporal = self.ruta + ".tmp"
+        faiss.write_index(fusion, temporal)
+        os.replace(temporal, self.ruta)
+        self.base = self._abrir_snapshot()
+        self.delta = self._indice_vacio()
+        return promocionar
+
+    def _sin_eliminados(self, indice):
+        """(vectores, ids) de `indice` sin los eliminados."""
+        vectores, ids = extraer_vectores(indice)
+        if self.eliminados:
+            conservar = ~np.isin(ids, np.fromiter(self.eliminados, "int64", len(self.eliminados)))
+            vectores, ids = vectores[conservar], ids[conservar]
+        return vectores, ids
+
+
+def cargar_memoria(ruta, dimension, codificacion="float32"):
+    """MemoriaVectorial.cargar con las opciones de índice del ejemplo 06 (OPCIONES_INDICE)."""
+    return MemoriaVectorial.cargar(ruta, dimension, codificacion=codificacion, **OPCIONES_INDICE)
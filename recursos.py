@@ -0,0 +1,90 @@
+# === Registro de recursos pesados (ejemplos 02, 05 y 06) ===
+# Las conexiones SQLite, la cola de escritura, el modelo de embeddings, el
+# índice FAISS o los ejecutores no forman parte del estado del grafo: se
+# registran aquí y los nodos los reciben por inyección de dependencias, en
+# config["configurable"]["recursos"]. El estado solo guarda datos pequeños y
+# serializables de la conversación (sesión, cursor, último input, ruta), así
+# que se copia barato y puede guardarse con un checkpointer.
+
+import threading
+
+# Clave del registro dentro de config["configurable"]
+CLAVE = "recursos"
+
+
+class Recursos:
+    """
+    Registro de recursos con acceso por atributo (`recursos.cola`).
+
+    Se pueden dar ya creados (`Recursos(cola=...)`) o registrar una fábrica con
+    `registrar(nombre, fabrica)`, que se llama en el primer acceso. `derivar()`
+    crea un registro hijo con recursos propios de una conversación que busca
+    el resto en el padre.
+    """
+
+    def __init__(self, **recursos):
+        self._valores = dict(recursos)
+        self._fabricas = {}
+        self._candado = threading.Lock()
+        self._padre = None
+
+    def registrar(self, nombre, fabrica):
+        """Registra una fábrica sin argumentos que crea el recurso en su primer uso."""
+        self._fabricas[nombre] = fabrica
+        return self
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        try:
+            return self._valores[nombre]
+        except KeyError:
+            pass
+        with self._candado:
+            if nombre not in self._valores:
+                if nombre not in self._fabricas:
+                    if self._padre is not None:
+                        return getattr(self._padre, nombre)
+                    raise AttributeError(f"Recurso no registrado: {nombre!r}")
+                self._valores[nombre] = self._fabricas[nombre]()
+            return self._valores[nombre]
+
+    def __setattr__(self, nombre, valor):
+        if nombre.startswith("_"):
+            super().__setattr__(nombre, valor)
+        else:
+            self._valores[nombre] = valor
+
+    def __contains__(self, nombre):
+        return nombre in self._valores or nombre in self._fabricas or (
+            self._padre is not None and nombre in self._padre)
+
+    def get(self, nombre, defecto=None):
+        return getattr(self, nombre) if nombre in self else defecto
+
+    def derivar(self, **recursos):
+        """Registro hijo (p. ej. la fuente de entrada de una conversación) sobre este."""
+        hijo = Recursos(**recursos)
+        hijo._padre = self
+        return hijo
+
+    def config(self, thread_id=None, **opciones):
+        """Config de invoke/ainvoke con el registro inyectado (y el hilo, si lo hay)."""
+        configurable = {CLAVE: self}
+        if thread_id is not None:
+            configurable["thread_id"] = thread_id
+        return {"configurable": configurable, **opciones}
+
+    def cerrar(self):
+        """Cierra los recursos ya creados, en orden inverso al de creación (no los del padre)."""
+        for valor in reversed(list(self._valores.values())):
+            for metodo in ("cerrar", "close", "shutdown"):
+                if callable(getattr(valor, metodo, None)):
+                    getattr(valor, metodo)()
+                    break
+        self._valores.clear()
+
+
+def recursos_de(config):
+    """El registro inyectado en la config que LangGraph pasa a cada nodo."""
+    return config["configurable"][CLAVE]